@@ -0,0 +1,122 @@
+"""
+Benchmark: per-call ad history lookup vs AdTracker
+Commands from a mix of regular and one-off users, each followed by the
+ad decision. The per-call version reads and writes the user's row for
+every command, as a database-backed maybe_send_ad would.
+
+    python -m benchmarks.bench_ads
+"""
+
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+from benchmarks.fakes import FakeSQLiteConnection
+from cogs.utils.ads import AdTracker, _AdState
+from cogs.utils.db import create_tables
+
+COMMANDS = 20000
+USERS = 5000
+LATENCY = 0.0005
+EVERY_COMMANDS = 5
+COOLDOWN = 1800
+
+
+def user_ids():
+    rng = random.Random(1)
+    # A few hundred regulars run most commands
+    return [
+        rng.randrange(300) if rng.random() < 0.7 else rng.randrange(USERS)
+        for _ in range(COMMANDS)
+    ]
+
+
+async def per_call(connection, user_id, now):
+    cursor = await connection.execute(
+        "SELECT last_shown, commands_since, shown_count FROM ad_state WHERE user_id = ?",
+        (user_id,)
+    )
+    row = await cursor.fetchone()
+    last_shown, commands_since, shown_count = row or (0, 0, 0)
+
+    commands_since += 1
+    show = commands_since >= EVERY_COMMANDS and now - last_shown >= COOLDOWN
+    if show:
+        last_shown, commands_since, shown_count = now, 0, shown_count + 1
+
+    await connection.execute(
+        "INSERT OR REPLACE INTO ad_state (user_id, last_shown, commands_since, shown_count, last_seen) "
+        "VALUES (?, ?, ?, ?, ?)",
+        (user_id, last_shown, commands_since, shown_count, now)
+    )
+    return show
+
+
+async def main():
+    ids = user_ids()
+    now = int(time.time())
+
+    with tempfile.TemporaryDirectory() as tmp:
+        connection = FakeSQLiteConnection(os.path.join(tmp, "per_call.db"), LATENCY)
+        await create_tables(connection)
+        start = time.perf_counter()
+        shown = 0
+        for user_id in ids:
+            shown += await per_call(connection, user_id, now)
+        elapsed = time.perf_counter() - start
+        print(
+            f"per-call lookup : {elapsed / COMMANDS * 1e6:8.1f} us/decision, "
+            f"{connection.statements} statements, {shown} ads"
+        )
+
+        connection = FakeSQLiteConnection(os.path.join(tmp, "tracker.db"), LATENCY)
+        await create_tables(connection)
+        statements = connection.statements
+        tracker = AdTracker(connection, every_commands=EVERY_COMMANDS, cooldown=COOLDOWN)
+        start = time.perf_counter()
+        for user_id in ids:
+            tracker.should_show(user_id, now)
+        elapsed = time.perf_counter() - start
+        await tracker.close()
+        stats = tracker.stats()
+        print(
+            f"AdTracker       : {elapsed / COMMANDS * 1e6:8.1f} us/decision, "
+            f"{connection.statements - statements} statements (one batched flush), {stats['shown']} ads"
+        )
+
+        state = _AdState(now, 3, 12, now)
+        print(f"memory          : ~{sys.getsizeof(state)} bytes of state per user + LRU entry")
+
+        reloaded = await AdTracker(connection).load()
+        print(f"warm load       : {len(reloaded)} users restored")
+
+        repeated, total = await eviction_check(os.path.join(tmp, "eviction.db"), now)
+        print(
+            f"eviction        : second ad within the cooldown after eviction: {repeated}; "
+            f"stored total after two ads (before eviction, after the cooldown): {total}"
+        )
+
+
+async def eviction_check(path, now):
+    """A user evicted right after an ad comes back: no ad within the cooldown, and no lost total."""
+    connection = FakeSQLiteConnection(path)
+    await create_tables(connection)
+    tracker = AdTracker(connection, every_commands=1, cooldown=COOLDOWN, max_size=1)
+    tracker.should_show(1, now)
+    await tracker.flush()
+    tracker.should_show(2, now + 1)  # evicts user 1
+    await tracker.flush()
+    repeated = tracker.should_show(1, now + 60)  # back within the cooldown, evicts user 2
+    tracker.should_show(2, now + 61)  # evicts user 1 again
+    tracker.should_show(1, now + COOLDOWN + 60)
+    await tracker.flush()
+    cursor = await connection.execute("SELECT shown_count FROM ad_state WHERE user_id = 1")
+    total = (await cursor.fetchone())[0]
+    await connection.close()
+    return repeated, total
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,114 @@
+"""
+Benchmark: AFK checks against the database vs AfkIndex
+Replays a message stream (some messages mention users, a few authors are
+AFK) through both on_message implementations, then restarts from the
+stored statuses.
+
+    python -m benchmarks.bench_afk
+"""
+
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.fakes import FakeSQLiteConnection
+from cogs.utils.afk import AfkIndex
+from cogs.utils.db import create_tables
+
+MESSAGES = 20000
+GUILDS = 50
+MEMBERS = 2000
+AFK_USERS = 500
+LATENCY = 0.0005
+
+
+def message_stream():
+    rng = random.Random(1)
+    messages = []
+    for _ in range(MESSAGES):
+        mentions = [rng.randrange(MEMBERS) for _ in range(rng.choice((0, 0, 0, 1, 1, 2)))]
+        messages.append((rng.randrange(GUILDS), rng.randrange(MEMBERS), mentions))
+    return messages
+
+
+def afk_users():
+    rng = random.Random(2)
+    return {(rng.randrange(GUILDS), rng.randrange(MEMBERS)) for _ in range(AFK_USERS)}
+
+
+async def per_message(connection, guild_id, author_id, mentions):
+    cursor = await connection.execute(
+        "SELECT reason FROM afk WHERE guild_id = ? AND user_id = ?", (guild_id, author_id)
+    )
+    returned = await cursor.fetchone()
+    if returned:
+        await connection.execute("DELETE FROM afk WHERE guild_id = ? AND user_id = ?", (guild_id, author_id))
+        await connection.commit()
+
+    afk = []
+    for user_id in mentions:
+        cursor = await connection.execute(
+            "SELECT reason, since FROM afk WHERE guild_id = ? AND user_id = ?", (guild_id, user_id)
+        )
+        row = await cursor.fetchone()
+        if row:
+            afk.append((user_id, tuple(row)))
+    return returned is not None, afk
+
+
+async def main():
+    messages = message_stream()
+    initial = afk_users()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        connection = FakeSQLiteConnection(os.path.join(tmp, "direct.db"), LATENCY)
+        await create_tables(connection)
+        await connection.executemany(
+            "INSERT INTO afk (guild_id, user_id, reason, since) VALUES (?, ?, 'away', 0)", list(initial)
+        )
+        statements = connection.statements
+        start = time.perf_counter()
+        direct_hits = 0
+        for message in messages:
+            _, afk = await per_message(connection, *message)
+            direct_hits += len(afk)
+        elapsed = time.perf_counter() - start
+        print(
+            f"database per message : {elapsed / MESSAGES * 1e6:8.1f} us/message, "
+            f"{connection.statements - statements} statements, {direct_hits} AFK mentions"
+        )
+
+        path = os.path.join(tmp, "index.db")
+        connection = FakeSQLiteConnection(path, LATENCY)
+        await create_tables(connection)
+        index = AfkIndex(connection)
+        for guild_id, user_id in initial:
+            index.set(guild_id, user_id, "away")
+        await index.flush()
+        statements = connection.statements
+
+        start = time.perf_counter()
+        for message in messages:
+            index.process_message(*message)
+        elapsed = time.perf_counter() - start
+        await index.close()
+        stats = index.stats()
+        print(
+            f"AfkIndex             : {elapsed / MESSAGES * 1e6:8.1f} us/message, "
+            f"{connection.statements - statements} statements (one flush), {stats['mention_hits']} AFK mentions, "
+            f"{stats['auto_cleared']} auto-cleared"
+        )
+        await connection.close()
+
+        connection = FakeSQLiteConnection(path)
+        start = time.perf_counter()
+        restored = await AfkIndex(connection).load()
+        print(f"warm load            : {len(restored)} statuses in {(time.perf_counter() - start) * 1000:.1f}ms "
+              f"(expected {len(index)})")
+        await connection.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,102 @@
+"""
+Benchmark: blacklist dict vs BlacklistStore
+Per-check cost and memory with 1M blacklisted users.
+
+    python -m benchmarks.bench_blacklist
+"""
+
+import random
+import time
+import timeit
+import tracemalloc
+from array import array
+
+from cogs.utils.blacklist import BlacklistStore
+
+BLACKLISTED = 1_000_000
+CHECKS = 1_000_000
+
+# Discord snowflakes: ms timestamp since 2015 << 22 | worker/process/increment
+SNOWFLAKE_MIN = (1 << 22) * 100_000_000_000 // 1000
+SNOWFLAKE_MAX = (1 << 22) * 320_000_000_000 // 1000
+
+
+def random_snowflakes(count, rng):
+    return [rng.randrange(SNOWFLAKE_MIN, SNOWFLAKE_MAX) for _ in range(count)]
+
+
+def measure(build):
+    tracemalloc.start()
+    obj = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return obj, size
+
+
+def per_check_ns(check, user_ids):
+    start = time.perf_counter_ns()
+    for user_id in user_ids:
+        check(user_id)
+    return (time.perf_counter_ns() - start) / len(user_ids)
+
+
+def main():
+    rng = random.Random(42)
+    blacklisted = random_snowflakes(BLACKLISTED, rng)
+    hits = rng.sample(blacklisted, CHECKS)
+    misses = random_snowflakes(CHECKS, rng)
+
+    # Build both from a compact source so the int objects each one
+    # allocates are counted, as they would be when loading from the database
+    source = array("q", blacklisted)
+    legacy, legacy_size = measure(lambda: {user_id: "Spam" for user_id in source})
+    store, store_size = measure(lambda: BlacklistStore.from_ids(source))
+
+    class Bot:
+        blacklist = legacy
+
+    bot = Bot()
+
+    def legacy_check(user_id):
+        if hasattr(bot, 'blacklist') and user_id in bot.blacklist:
+            return True, bot.blacklist[user_id]
+        return False, None
+
+    def store_check(user_id):
+        if user_id in store:
+            return True, None  # reason is loaded lazily, only on a hit
+        return False, None
+
+    print(f"{BLACKLISTED:,} blacklisted users, {CHECKS:,} checks per row\n")
+    print(f"{'':24}{'memory':>12}{'miss':>12}{'hit':>12}")
+    for name, size, check in (
+        ("dict (hasattr + lookup)", legacy_size, legacy_check),
+        ("BlacklistStore", store_size, store_check),
+    ):
+        miss = per_check_ns(check, misses)
+        hit = per_check_ns(check, hits)
+        print(f"{name:24}{size / 2**20:>10.1f}MB{miss:>10.0f}ns{hit:>10.0f}ns")
+
+    # The bare membership test, as the @require pipeline and the shard
+    # workers use it
+    print(f"\n{'`in` only':24}{'':>12}{'miss':>12}{'hit':>12}")
+    for name, container in (("dict", legacy), ("BlacklistStore", store)):
+        miss = per_check_ns(container.__contains__, misses)
+        hit = per_check_ns(container.__contains__, hits)
+        print(f"{name:24}{'':>12}{miss:>10.0f}ns{hit:>10.0f}ns")
+
+    # Old-style sync lookup through the dict-compatible API
+    for user_id in hits[:1000]:
+        store._cache_reason(user_id, "Spam")
+    legacy_style = per_check_ns(lambda user_id: user_id in store and store[user_id], hits[:1000] * 100)
+    print(f"{'store[user_id] on a hit':24}{'':>12}{'':>12}{legacy_style:>10.0f}ns")
+
+    # Incremental refresh cost: apply 1000 changes, then a full compaction
+    changes = random_snowflakes(1000, rng)
+    apply_us = timeit.timeit(lambda: [store.add(user_id) for user_id in changes], number=1) * 1e6 / len(changes)
+    compact_ms = timeit.timeit(store.compact, number=1) * 1000
+    print(f"\ndelta apply: {apply_us:.1f}us/change, compaction of {len(store):,} IDs: {compact_ms:.0f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+"""
+Benchmark: pre-command checks
+The moderation template's checks written inline (as every command used to
+do) vs the same checks declared with `@require`, on a traffic mix where
+most invocations pass and the rest fail one check each. Reports time per
+invocation, how often member permissions and top roles were resolved,
+whether both answered the same, and the pipeline's rejection counts.
+Needs nextcord.
+
+    python -m benchmarks.bench_checks
+"""
+
+import asyncio
+import random
+import time
+
+import nextcord
+
+from benchmarks.fakes import FakeGuild, FakeInteraction
+from cogs.utils.blacklist import BlacklistStore
+from cogs.utils.checks import (
+    above_target,
+    bot_above_target,
+    bot_has_permissions,
+    has_permissions,
+    not_blacklisted,
+    not_bot,
+    not_self,
+    require,
+)
+
+INVOCATIONS = 100_000
+ROLES_PER_MEMBER = 20
+BLACKLISTED = 10_000
+BOT_ID = 1
+
+# (outcome, share of traffic)
+MIX = (
+    ("pass", 0.70),
+    ("blacklisted", 0.08),
+    ("self", 0.07),
+    ("no_permission", 0.08),
+    ("hierarchy", 0.07),
+)
+
+MANAGE_MESSAGES = nextcord.Permissions(manage_messages=True).value
+
+
+class RoleGuild(FakeGuild):
+    """Guild with real nextcord roles, positions 0 (@everyone) to `size`."""
+
+    def __init__(self, guild_id, me, size=200):
+        super().__init__(guild_id, me)
+        self.owner_id = 0
+        self._roles = {}
+        for position in range(size + 1):
+            role_id = guild_id if position == 0 else guild_id * 1000 + position
+            self._roles[role_id] = nextcord.Role(
+                guild=self, state=None, data={"id": role_id, "name": f"role{position}", "position": position}
+            )
+        self.default_role = self._roles[guild_id]
+
+    def get_role(self, role_id):
+        return self._roles.get(role_id)
+
+    def role_at(self, position, permissions=0):
+        role = self._roles[self.id * 1000 + position]
+        role._permissions = permissions
+        return role
+
+
+class RoleMember:
+    """
+    Member with nextcord's own `roles`, `top_role` and `guild_permissions`
+    properties, so each access resolves roles the way a real Member does.
+    `resolutions` counts the accesses.
+    """
+
+    resolutions = 0
+
+    def __init__(self, guild, user_id, top_position, permissions=0):
+        self.guild = guild
+        self.id = user_id
+        guild.role_at(top_position, permissions)
+        self._roles = [
+            guild.id * 1000 + position
+            for position in range(top_position - ROLES_PER_MEMBER + 1, top_position + 1)
+        ]
+
+    roles = nextcord.Member.roles
+
+    @property
+    def top_role(self):
+        RoleMember.resolutions += 1
+        return nextcord.Member.top_role.fget(self)
+
+    @property
+    def guild_permissions(self):
+        RoleMember.resolutions += 1
+        return nextcord.Member.guild_permissions.fget(self)
+
+
+class FakeUser:
+    def __init__(self, user_id):
+        self.id = user_id
+
+
+class FakeBot:
+    def __init__(self, blacklist):
+        self.blacklist = blacklist
+        self.user = FakeUser(BOT_ID)
+
+
+class InlineCog:
+    """The checks as moderate_user had them before `@require`."""
+
+    def __init__(self, bot):
+        self.bot = bot
+
+    async def check_blacklist(self, user_id):
+        if user_id in self.bot.blacklist:
+            return True, await self.bot.blacklist.get_reason(user_id)
+        return False, None
+
+    def create_blacklist_embed(self, reason):
+        return f"blacklisted: {reason}"
+
+    async def moderate_user(self, interaction, user, reason=None):
+        user_id = interaction.user.id
+        is_blacklisted, blacklist_reason = await self.check_blacklist(user_id)
+        if is_blacklisted:
+            await interaction.send(embed=self.create_blacklist_embed(blacklist_reason), ephemeral=True)
+            return
+        if not interaction.user.guild_permissions.manage_messages:
+            await interaction.send("❌ You don't have permission to use this command.", ephemeral=True)
+            return
+        if not interaction.guild.me.guild_permissions.manage_messages:
+            await interaction.send("❌ I don't have permission to use this command.", ephemeral=True)
+            return
+        if user.top_role >= interaction.user.top_role:
+            await interaction.send("❌ You can't moderate this user due to role hierarchy.", ephemeral=True)
+            return
+        if user.top_role >= interaction.guild.me.top_role:
+            await interaction.send("❌ I can't moderate this user due to role hierarchy.", ephemeral=True)
+            return
+        if user.id == interaction.user.id:
+            await interaction.send("❌ You can't moderate yourself.", ephemeral=True)
+            return
+        if user.id == self.bot.user.id:
+            await interaction.send("❌ You can't moderate the bot.", ephemeral=True)
+            return
+        await interaction.send("ok")
+
+
+class PipelineCog(InlineCog):
+    @require(
+        not_blacklisted(),
+        has_permissions(manage_messages=True),
+        bot_has_permissions(manage_messages=True),
+        above_target("user"),
+        bot_above_target("user"),
+        not_self("user"),
+        not_bot("user")
+    )
+    async def moderate_user(self, interaction, user, reason=None):
+        await interaction.send("ok")
+
+
+def traffic(guild):
+    rng = random.Random(20)
+    outcomes, weights = zip(*MIX)
+    moderator = RoleMember(guild, 1000, 120, MANAGE_MESSAGES)
+    requests = []
+    for _ in range(INVOCATIONS):
+        outcome = rng.choices(outcomes, weights)[0]
+        user = moderator
+        target = RoleMember(guild, 100_000 + rng.randrange(5000), 40)
+        if outcome == "blacklisted":
+            user = RoleMember(guild, 2000 + rng.randrange(BLACKLISTED), 120, MANAGE_MESSAGES)
+        elif outcome == "self":
+            # The moderator's ID with a lower role, so only the self check fails
+            target = RoleMember(guild, moderator.id, 40)
+        elif outcome == "no_permission":
+            user = RoleMember(guild, 3_000_000 + rng.randrange(5000), 100)
+        elif outcome == "hierarchy":
+            target = RoleMember(guild, 100_000 + rng.randrange(5000), 140)
+        requests.append((FakeInteraction(user, guild, "moderate_user"), target))
+    return requests
+
+
+async def run(cog, requests):
+    RoleMember.resolutions = 0
+    start = time.perf_counter()
+    for interaction, target in requests:
+        await cog.moderate_user(interaction, user=target)
+    elapsed = time.perf_counter() - start
+    return elapsed, RoleMember.resolutions
+
+
+async def main():
+    blacklist = BlacklistStore.from_ids(range(2000, 2000 + BLACKLISTED), reasons={2000: "spam"})
+    bot = FakeBot(blacklist)
+    guild = RoleGuild(1, None)
+    guild.me = RoleMember(guild, BOT_ID, 180, MANAGE_MESSAGES)
+
+    inline_requests = traffic(guild)
+    pipeline_requests = traffic(guild)
+    inline = await run(InlineCog(bot), inline_requests)
+    pipeline = await run(PipelineCog(bot), pipeline_requests)
+
+    mismatches = sum(
+        1 for (a, _), (b, _) in zip(inline_requests, pipeline_requests) if a.sent != b.sent
+    )
+
+    print(f"{INVOCATIONS} invocations of moderate_user, {ROLES_PER_MEMBER} roles per member\n")
+    print(f"{'checks':<10} {'total':>8} {'per call':>9} {'resolutions/call':>16}")
+    for name, (elapsed, resolutions) in (("inline", inline), ("@require", pipeline)):
+        print(
+            f"{name:<10} {elapsed:7.2f}s {elapsed / INVOCATIONS * 1e6:7.2f}us "
+            f"{resolutions / INVOCATIONS:16.2f}"
+        )
+    print(f"\n{inline[0] / pipeline[0]:.2f}x faster; answers that differ: {mismatches}")
+
+    stats = PipelineCog.moderate_user.pipeline.stats()
+    print(f"\nrejections ({stats['runs']} runs):")
+    for check, count in stats["rejections"].items():
+        print(f"  {check:<14} {count:7} ({count / stats['runs']:.1%})")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,190 @@
+"""
+Benchmark: command cooldowns
+Cost per check and memory per bucket of `Cooldown` with 1M distinct
+users, eviction of idle buckets, nextcord's `CooldownMapping` (which scans
+every bucket on every check) for comparison, and how much of a flooding
+script's traffic reaches the database while regular users are unaffected.
+Needs nextcord for the comparison only.
+
+    python -m benchmarks.bench_cooldowns
+"""
+
+import gc
+import random
+import time
+import tracemalloc
+
+from cogs.utils.cooldowns import Cooldown
+from cogs.utils.metrics import MetricsRegistry
+
+USERS = 1_000_000
+GUILDS = 5000
+LIMITS = {"user": (5, 10), "guild": (60, 10), "total": (500, 1)}
+CHECK_RATE = 400  # simulated checks/s, under the total limit
+NEXTCORD_USERS = (1000, 10_000, 50_000)
+
+# Flood: one script at 50 commands/s next to 200 regular users in 20
+# guilds (one of them the script's) for 60 seconds
+FLOOD_SECONDS = 60
+FLOOD_RATE = 50
+REGULAR_USERS = 200
+REGULAR_GUILDS = 20
+REGULAR_RATE = 1 / 20  # commands/s per regular user
+
+
+def make(**limits):
+    return Cooldown(registry=MetricsRegistry(), **limits)
+
+
+def per_check(cooldown, users, guilds, clock):
+    """
+    Seconds per `hit`, loop overhead included. With `clock` the cooldown
+    reads time.monotonic() itself; otherwise time advances at CHECK_RATE
+    checks per second, so idle buckets are evicted as they would be live.
+    """
+    hit = cooldown.hit
+    start = time.perf_counter()
+    if clock:
+        for user_id, guild_id in zip(users, guilds):
+            hit(user_id, guild_id)
+    else:
+        now = 1000.0
+        step = 1 / CHECK_RATE
+        for user_id, guild_id in zip(users, guilds):
+            now += step
+            hit(user_id, guild_id, now)
+    return (time.perf_counter() - start) / len(users)
+
+
+def loop_overhead(users, guilds):
+    def hit(user_id, guild_id, now=None):
+        return None
+
+    start = time.perf_counter()
+    now = 1000.0
+    step = 1 / CHECK_RATE
+    for user_id, guild_id in zip(users, guilds):
+        now += step
+        hit(user_id, guild_id, now)
+    return (time.perf_counter() - start) / len(users)
+
+
+def memory_per_bucket(users):
+    cooldown = make(user=LIMITS["user"])
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for user_id in users:
+        cooldown.hit(user_id, None, 1000.0)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return (after - before) / len(users), cooldown
+
+
+def eviction(cooldown, users):
+    """Every bucket goes idle at once; time the checks that evict them."""
+    limit = cooldown.limits[0][1]
+    buckets = len(limit)
+    slowest = 0.0
+    checks = 0
+    now = 1011.0  # every bucket is full again
+    start = time.perf_counter()
+    while len(limit) > 1:
+        check = time.perf_counter()
+        cooldown.hit(-1, None, now)
+        slowest = max(slowest, time.perf_counter() - check)
+        checks += 1
+    return buckets, checks, time.perf_counter() - start, slowest
+
+
+def nextcord_per_check(count):
+    from nextcord.ext import commands
+
+    class Author:
+        __slots__ = ("id",)
+
+    class Message:
+        __slots__ = ("author",)
+
+    messages = []
+    for user_id in range(count):
+        message = Message()
+        message.author = Author()
+        message.author.id = user_id
+        messages.append(message)
+    mapping = commands.CooldownMapping.from_cooldown(*LIMITS["user"], commands.BucketType.user)
+
+    checks = max(count, 2000)
+    start = time.perf_counter()
+    for i in range(checks):
+        mapping.update_rate_limit(messages[i % count], 1000.0)
+    return (time.perf_counter() - start) / checks
+
+
+def flood():
+    cooldown = make(**LIMITS)
+    rng = random.Random(21)
+    events = [(t / FLOOD_RATE, 0) for t in range(FLOOD_SECONDS * FLOOD_RATE)]
+    for user_id in range(1, REGULAR_USERS + 1):
+        t = rng.expovariate(REGULAR_RATE)
+        while t < FLOOD_SECONDS:
+            events.append((t, user_id))
+            t += rng.expovariate(REGULAR_RATE)
+    events.sort()
+
+    sent = {"script": 0, "regular": 0}
+    allowed = {"script": 0, "regular": 0}
+    for t, user_id in events:
+        who = "script" if user_id == 0 else "regular"
+        sent[who] += 1
+        if cooldown.hit(user_id, user_id % REGULAR_GUILDS, t) is None:
+            allowed[who] += 1
+    return sent, allowed, cooldown.stats()
+
+
+def main():
+    rng = random.Random(1)
+    users = list(range(10**12, 10**12 + USERS))
+    rng.shuffle(users)
+    guilds = [rng.randrange(GUILDS) for _ in range(USERS)]
+
+    overhead = loop_overhead(users, guilds)
+    print(f"{USERS:,} distinct users, {GUILDS} guilds; limits {LIMITS}\n")
+    print(f"{'limits':<22} {'clock':<10} {'per check':>10} {'minus loop':>11}")
+    for name, limits, clock in (
+        ("user", {"user": LIMITS["user"]}, False),
+        ("user", {"user": LIMITS["user"]}, True),
+        ("user + guild + total", LIMITS, False),
+    ):
+        seconds = per_check(make(**limits), users, guilds, clock)
+        print(
+            f"{name:<22} {'monotonic' if clock else 'simulated':<10} "
+            f"{seconds * 1e9:8.0f}ns {(seconds - overhead) * 1e9:9.0f}ns"
+        )
+    print(f"(loop and call overhead alone: {overhead * 1e9:.0f}ns)")
+
+    per_bucket, cooldown = memory_per_bucket(users)
+    print(f"\nmemory: {per_bucket:.0f} bytes per bucket, {per_bucket * USERS / 2**20:.0f} MiB for {USERS:,} users")
+
+    buckets, checks, seconds, slowest = eviction(cooldown, users)
+    print(
+        f"eviction: {buckets:,} idle buckets gone after {checks:,} checks "
+        f"({seconds * 1000:.0f}ms in total, slowest check {slowest * 1000:.2f}ms)"
+    )
+
+    try:
+        print("\nnextcord CooldownMapping (scans every bucket on every check):")
+        for count in NEXTCORD_USERS:
+            print(f"  {count:>6,} users: {nextcord_per_check(count) * 1e6:8.1f}us per check")
+    except ImportError:
+        print("\n(nextcord not installed, skipping the CooldownMapping comparison)")
+
+    sent, allowed, stats = flood()
+    print(f"\nflood: one script at {FLOOD_RATE}/s and {REGULAR_USERS} regular users for {FLOOD_SECONDS}s")
+    for who in ("script", "regular"):
+        print(f"  {who:<8} {sent[who]:6} sent, {allowed[who]:6} reached the database ({allowed[who] / sent[who]:.1%})")
+    print(f"  throttled by scope: {stats['throttled']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Benchmark: shared connection vs ConnectionPool
+Runs the warning helpers from many concurrent "guilds" against an
+in-process SQLite stand-in with simulated round-trip latency.
+
+    python -m benchmarks.bench_db_pool
+"""
+
+import asyncio
+import os
+import tempfile
+import time
+
+from benchmarks.fakes import FakeSQLiteConnection, sqlite_connector
+from cogs.utils.db import add_warning, create_tables, get_user_warnings, get_warning_count
+from cogs.utils.db_pool import ConnectionPool
+
+GUILDS = 50
+COMMANDS_PER_GUILD = 20
+LATENCY = 0.002
+
+
+async def run_commands(connection):
+    async def guild_worker(guild_id):
+        for i in range(COMMANDS_PER_GUILD):
+            await add_warning(connection, guild_id, i % 5, 1, "raid")
+            await get_warning_count(connection, guild_id, i % 5)
+            await get_user_warnings(connection, guild_id, i % 5)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(guild_worker(guild_id) for guild_id in range(GUILDS)))
+    return time.perf_counter() - start
+
+
+async def main():
+    commands = GUILDS * COMMANDS_PER_GUILD
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "shared.db")
+        connection = FakeSQLiteConnection(path, LATENCY)
+        await create_tables(connection)
+        elapsed = await run_commands(connection)
+        await connection.close()
+        print(f"shared connection : {commands / elapsed:8.0f} commands/s ({elapsed:.2f}s)")
+
+        for max_size in (4, 16):
+            path = os.path.join(tmp, f"pool_{max_size}.db")
+            pool = await ConnectionPool(sqlite_connector(path, LATENCY), min_size=2, max_size=max_size).open()
+            await create_tables(pool)
+            elapsed = await run_commands(pool)
+            stats = pool.stats()
+            await pool.close()
+            print(
+                f"pool max_size={max_size:<3}: {commands / elapsed:8.0f} commands/s ({elapsed:.2f}s) "
+                f"avg wait {stats['avg_wait'] * 1000:.2f}ms, p95 {stats['p95_wait'] * 1000:.2f}ms"
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
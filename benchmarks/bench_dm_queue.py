@@ -0,0 +1,97 @@
+"""
+Benchmark: inline DMs vs DMQueue
+A mass moderation action DMs every affected member, against a fake
+endpoint that enforces Discord's global (50/s) and per-channel limits.
+Also checks that moderation notices overtake cosmetic DMs queued earlier.
+
+    python -m benchmarks.bench_dm_queue
+"""
+
+import asyncio
+import time
+
+from benchmarks.fakes import FakeDiscordHTTP
+from cogs.utils.dm_queue import COSMETIC, MODERATION, SENT, DMQueue
+
+MEMBERS = 200
+CLOSED_DMS = range(0, MEMBERS, 10)
+
+
+def new_http():
+    return FakeDiscordHTTP(closed_dms=CLOSED_DMS, error_rate=0.02)
+
+
+async def inline():
+    http = new_http()
+    start = time.perf_counter()
+
+    async def notify(user_id):
+        try:
+            await http.user(user_id).send(content="You have been moderated")
+        except Exception:
+            pass
+
+    await asyncio.gather(*(notify(user_id) for user_id in range(MEMBERS)))
+    elapsed = time.perf_counter() - start
+    print(
+        f"inline gather : command answered after {elapsed:5.2f}s, {len(http.delivered)}/{MEMBERS} delivered, "
+        f"{http.rate_limited} requests got 429"
+    )
+
+
+async def queued():
+    http = new_http()
+    queue = DMQueue(base_delay=0.2)
+    queue.start()
+
+    start = time.perf_counter()
+    futures = [
+        queue.send(http.user(user_id), priority=MODERATION, content="You have been moderated")
+        for user_id in range(MEMBERS)
+    ]
+    answered = time.perf_counter() - start
+    results = await asyncio.gather(*futures)
+    drained = time.perf_counter() - start
+    await queue.close()
+
+    stats = queue.stats()
+    print(
+        f"DMQueue       : command answered after {answered:5.2f}s, {results.count(SENT)}/{MEMBERS} delivered "
+        f"in {drained:.2f}s, {http.rate_limited} requests got 429, {stats['forbidden']} DMs closed, "
+        f"{stats['retries']} retries"
+    )
+
+
+async def priorities():
+    http = FakeDiscordHTTP()
+    queue = DMQueue()
+    queue.start()
+
+    cosmetic = [
+        queue.send(http.user(10000 + i), priority=COSMETIC, content="Level up!")
+        for i in range(150)
+    ]
+    await asyncio.sleep(0)
+    moderation = [
+        queue.send(http.user(20000 + i), priority=MODERATION, content="You have been warned")
+        for i in range(20)
+    ]
+    await asyncio.gather(*cosmetic, *moderation)
+    await queue.close()
+
+    order = [user_id for user_id, _, _ in http.delivered]
+    positions = [order.index(20000 + i) for i in range(20)]
+    print(
+        f"priorities    : 20 moderation DMs queued behind 150 cosmetic ones were delivered "
+        f"at positions {min(positions)}-{max(positions)}"
+    )
+
+
+async def main():
+    await inline()
+    await queued()
+    await priorities()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,90 @@
+"""
+Benchmark: per-call nested parse_duration vs cogs.utils.durations
+Throughput for single inputs (cold and cached) and for batches.
+
+    python -m benchmarks.bench_durations
+"""
+
+import random
+import time
+from datetime import timedelta
+
+from cogs.utils.durations import _parse, parse_duration, parse_durations
+
+ITERATIONS = 200_000
+
+
+def legacy_temporary_action(duration):
+    # What ModerationCogTemplate.temporary_action used to do on every call
+    from datetime import datetime, timedelta
+
+    def parse_duration(duration_str):
+        if not duration_str:
+            return None
+
+        duration_str = duration_str.lower()
+        if duration_str == "permanent" or duration_str == "perm":
+            return None
+
+        try:
+            if duration_str.endswith('d'):
+                days = int(duration_str[:-1])
+                return timedelta(days=days)
+            elif duration_str.endswith('h'):
+                hours = int(duration_str[:-1])
+                return timedelta(hours=hours)
+            elif duration_str.endswith('m'):
+                minutes = int(duration_str[:-1])
+                return timedelta(minutes=minutes)
+            elif duration_str.endswith('s'):
+                seconds = int(duration_str[:-1])
+                return timedelta(seconds=seconds)
+            else:
+                hours = int(duration_str)
+                return timedelta(hours=hours)
+        except ValueError:
+            return None
+
+    return parse_duration(duration)
+
+
+def rate(func, inputs):
+    start = time.perf_counter()
+    for value in inputs:
+        func(value)
+    return len(inputs) / (time.perf_counter() - start)
+
+
+def main():
+    rng = random.Random(7)
+    simple = [f"{rng.randint(1, 48)}{rng.choice('dhms')}" for _ in range(ITERATIONS)]
+    compound = [
+        f"{rng.randint(1, 4)}w{rng.randint(1, 6)}d{rng.randint(1, 23)}h{rng.randint(1, 59)}m"
+        for _ in range(ITERATIONS)
+    ]
+    common = [rng.choice(["10m", "1h", "1d", "7d", "1d12h", "30m"]) for _ in range(ITERATIONS)]
+
+    def cold(value):
+        _parse.cache_clear()
+        return parse_duration(value)
+
+    print(f"{'':34}{'parses/s':>12}")
+    rows = (
+        ("legacy, simple", legacy_temporary_action, simple),
+        ("shared, simple, uncached", cold, simple),
+        ("shared, compound, uncached", cold, compound),
+        ("shared, common inputs, cached", parse_duration, common),
+    )
+    for name, func, inputs in rows:
+        print(f"{name:34}{rate(func, inputs):>12,.0f}")
+
+    _parse.cache_clear()
+    start = time.perf_counter()
+    results = parse_durations(common)
+    elapsed = time.perf_counter() - start
+    assert all(isinstance(result, timedelta) for result in results)
+    print(f"{'shared, batch of ' + format(len(common), ','):34}{len(common) / elapsed:>12,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Benchmark: hand-built embeds vs the embed factory
+Allocations and time per command for a typical response embed and for
+the blacklist embed. Requires nextcord.
+
+    python -m benchmarks.bench_embeds
+"""
+
+import time
+import tracemalloc
+
+import nextcord
+
+from cogs.utils.embeds import RYUJIN_LOGO, blacklist_embed, create_embed
+
+ITERATIONS = 100_000
+
+
+def legacy_response():
+    embed = nextcord.Embed(
+        title="✅ User Moderated",
+        description="**@user** has been moderated successfully.",
+        color=nextcord.Color.green()
+    )
+    embed.set_footer(
+        text="© Ryujin Bot (2023-2025) | Moderation System",
+        icon_url=RYUJIN_LOGO
+    )
+    embed.set_author(name="Ryujin", icon_url=RYUJIN_LOGO)
+    return embed
+
+
+def factory_response():
+    return create_embed(
+        "Moderation",
+        title="✅ User Moderated",
+        description="**@user** has been moderated successfully.",
+        color=nextcord.Color.green()
+    )
+
+
+def legacy_blacklist(reason="Spam"):
+    embed = nextcord.Embed(
+        title="You are blacklisted!",
+        description=f"**You can't use Ryujin's commands anymore because you have been blacklisted for `{reason}`.**",
+        color=nextcord.Color.red()
+    )
+    embed.set_footer(
+        text="© Ryujin Bot (2023-2025) | Blacklist System",
+        icon_url=RYUJIN_LOGO
+    )
+    embed.set_author(name="Ryujin", icon_url=RYUJIN_LOGO)
+    return embed
+
+
+def factory_blacklist(reason="Spam"):
+    return blacklist_embed(reason)
+
+
+def allocations(build):
+    build()  # warm caches
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    keep = [build() for _ in range(1000)]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    stats = after.compare_to(before, "filename")
+    blocks = sum(stat.count_diff for stat in stats)
+    size = sum(stat.size_diff for stat in stats)
+    del keep
+    return blocks / 1000, size / 1000
+
+
+def per_call_us(build):
+    start = time.perf_counter()
+    for _ in range(ITERATIONS):
+        build()
+    return (time.perf_counter() - start) * 1e6 / ITERATIONS
+
+
+def main():
+    print(f"{'':22}{'blocks/cmd':>12}{'bytes/cmd':>12}{'us/cmd':>10}")
+    for name, build in (
+        ("response (legacy)", legacy_response),
+        ("response (factory)", factory_response),
+        ("blacklist (legacy)", legacy_blacklist),
+        ("blacklist (factory)", factory_blacklist),
+    ):
+        blocks, size = allocations(build)
+        print(f"{name:22}{blocks:>12.1f}{size:>12.0f}{per_call_us(build):>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""
+Benchmark: eager vs lazy cog loading
+Generates a few hundred cogs from the three templates and measures cold
+start (fresh interpreter, so nothing is already imported) with
+`load_extension` for every cog vs `LazyCogLoader` with a manifest, then
+the first-use load time of lazy cogs. Needs nextcord.
+
+    python -m benchmarks.bench_lazy_cogs
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+COGS_PER_TEMPLATE = 100
+TEMPLATES = {
+    "basic": ("basic_cog_template.py", "BasicCogTemplate"),
+    "database": ("database_cog_template.py", "DatabaseCogTemplate"),
+    "moderation": ("moderation_cog_template.py", "ModerationCogTemplate"),
+}
+FIRST_USE_SAMPLES = 20
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def generate(directory):
+    """Write copies of the templates with unique cog and command names."""
+    package = os.path.join(directory, "benchcogs")
+    os.makedirs(package)
+    open(os.path.join(package, "__init__.py"), "w").close()
+
+    extensions = []
+    for kind, (filename, class_name) in TEMPLATES.items():
+        with open(os.path.join(ROOT, "developer_guide", "templates", filename), encoding="utf-8") as file:
+            source = file.read()
+        for i in range(COGS_PER_TEMPLATE):
+            copy = source.replace(class_name, f"{class_name}{i}")
+            copy = re.sub(r'(nextcord\.slash_command\(\s*name=")([a-z_]+)"', rf'\g<1>\g<2>_{i}"', copy)
+            module = f"{kind}_{i}"
+            with open(os.path.join(package, f"{module}.py"), "w", encoding="utf-8") as file:
+                file.write(copy)
+            extensions.append(f"benchcogs.{module}")
+    return extensions
+
+
+def make_bot():
+    from nextcord.ext import commands
+
+    from cogs.utils.expiry import ExpiryScheduler
+    from cogs.utils.warning_counts import WarningCountCache
+
+    bot = commands.Bot()
+    # What the template cogs' __init__ methods use
+    bot.connection = None
+    bot.expiry = ExpiryScheduler()
+    bot.warning_counts = WarningCountCache()
+    return bot
+
+
+async def child(args):
+    # Runs in a fresh interpreter; prints one JSON line
+    started = time.perf_counter()
+    from cogs.utils.lazy_cogs import LazyCogLoader, LazyCommand
+
+    extensions = args.extensions.split(",")
+    bot = make_bot()
+    setup_done = time.perf_counter()
+
+    if args.child == "eager":
+        for extension in extensions:
+            bot.load_extension(extension)
+        ready = time.perf_counter()
+        print(json.dumps({"imports": setup_done - started, "cogs": ready - setup_done}))
+        return
+
+    loader = LazyCogLoader(bot, args.manifest)
+    loader.load(extensions)
+    ready = time.perf_counter()
+
+    # Payload parity: what Discord sees must not change when the real cog loads
+    lazy = [e for e in extensions if not loader.is_loaded(e)][:FIRST_USE_SAMPLES]
+    before = {
+        command.name: command.get_payload(None)
+        for command in bot.get_all_application_commands()
+        if isinstance(command, LazyCommand) and command.extension in lazy
+    }
+    for extension in lazy:
+        await loader.ensure_loaded(extension)
+    after = {}
+    for name in before:
+        command = bot.get_application_command_from_signature(name, 1, None)
+        after[name] = None if isinstance(command, LazyCommand) else command.get_payload(None)
+
+    stats = loader.stats()
+    print(json.dumps({
+        "imports": setup_done - started,
+        "cogs": ready - setup_done,
+        "lazy": sum(1 for timing in stats.values() if timing["mode"] == "lazy"),
+        "eager": sum(1 for timing in stats.values() if timing["mode"] == "eager"),
+        "lazy_startup": sum(timing["startup"] for timing in stats.values() if timing["mode"] == "lazy"),
+        "first_use": sorted(stats[extension]["first_use"] for extension in lazy),
+        "payload_mismatches": sum(1 for name in before if before[name] != after[name]),
+        "report": "\n".join(loader.report().splitlines()[:4] + loader.report().splitlines()[-1:]),
+    }))
+
+
+def run_child(directory, mode, extensions, manifest=None):
+    command = [
+        sys.executable, "-m", "benchmarks.bench_lazy_cogs", "--child", mode,
+        "--extensions", ",".join(extensions),
+    ]
+    if manifest:
+        command += ["--manifest", manifest]
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([ROOT, directory, os.environ.get("PYTHONPATH", "")]))
+    started = time.perf_counter()
+    output = subprocess.run(command, cwd=ROOT, env=env, capture_output=True, text=True, check=True).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    result["wall"] = time.perf_counter() - started
+    return result
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        extensions = generate(tmp)
+        manifest = os.path.join(tmp, "manifest.json")
+
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join([ROOT, tmp]))
+        started = time.perf_counter()
+        subprocess.run(
+            [sys.executable, "-m", "cogs.utils.lazy_cogs", *extensions, "-o", manifest],
+            cwd=ROOT, env=env, capture_output=True, check=True
+        )
+        build = time.perf_counter() - started
+
+        eager = run_child(tmp, "eager", extensions)
+        lazy = run_child(tmp, "lazy", extensions, manifest)
+
+    print(f"{len(extensions)} cogs, {len(extensions) * 2} slash commands; manifest build {build:.2f}s (offline)\n")
+    print(f"{'mode':<6} {'process':>9} {'nextcord + utils':>17} {'cogs':>9}")
+    for name, result in (("eager", eager), ("lazy", lazy)):
+        print(f"{name:<6} {result['wall'] * 1000:8.0f}ms {result['imports'] * 1000:16.0f}ms {result['cogs'] * 1000:8.0f}ms")
+
+    first_use = lazy["first_use"]
+    print(
+        f"\nlazy: {lazy['lazy']} cogs deferred, {lazy['eager']} loaded at startup (lazy_load = False); "
+        f"cog startup {eager['cogs'] / lazy['cogs']:.0f}x faster"
+    )
+    print(
+        f"per cog: load_extension {eager['cogs'] / len(extensions) * 1000:.2f}ms, "
+        f"lazy registration {lazy['lazy_startup'] / lazy['lazy'] * 1000:.3f}ms"
+    )
+    print(
+        f"first use of a lazy cog: p50 {first_use[len(first_use) // 2] * 1000:.1f}ms, "
+        f"max {first_use[-1] * 1000:.1f}ms"
+    )
+    print(f"payload mismatches between stand-ins and real commands: {lazy['payload_mismatches']}")
+    print(f"\nreport excerpt:\n{lazy['report']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--child", choices=("eager", "lazy"))
+    parser.add_argument("--extensions")
+    parser.add_argument("--manifest")
+    args = parser.parse_args()
+    if args.child:
+        asyncio.run(child(args))
+    else:
+        main()
@@ -0,0 +1,114 @@
+"""
+Benchmark: botstats from cache walks vs the metrics registry
+nextcord's `bot.users` and `bot.guilds` build a new list from the cache
+on every access. Compares that with O(1) registry reads, and measures
+event recording cost and a Prometheus scrape over the local endpoint.
+
+    python -m benchmarks.bench_metrics
+"""
+
+import asyncio
+import time
+from datetime import datetime, timezone
+
+from cogs.utils.metrics import GatewayMetrics, MetricsRegistry
+
+GUILDS = 20000
+USERS = 1_000_000
+READS = 50
+EVENTS = 200_000
+
+
+class FakeGuild:
+    def __init__(self, guild_id, member_count):
+        self.id = guild_id
+        self.member_count = member_count
+
+
+class FakeCommand:
+    def __init__(self, name):
+        self.qualified_name = name
+
+
+class FakeInteraction:
+    def __init__(self, name):
+        self.application_command = FakeCommand(name)
+        self.created_at = datetime.now(timezone.utc)
+
+
+class FakeBot:
+    """Caches shaped like nextcord's ConnectionState."""
+
+    def __init__(self):
+        self._guilds = {i: FakeGuild(i, 50) for i in range(GUILDS)}
+        self._users = {i: object() for i in range(USERS)}
+        self.cogs = {"Moderation": None, "Database": None}
+        self.latency = 0.042
+        self.listeners = {}
+
+    @property
+    def guilds(self):
+        return list(self._guilds.values())
+
+    @property
+    def users(self):
+        return list(self._users.values())
+
+    def get_all_application_commands(self):
+        return [FakeCommand(f"command{i}") for i in range(40)]
+
+    def add_listener(self, function, name):
+        self.listeners[name] = function
+
+
+async def scrape(port):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(b"GET /metrics HTTP/1.1\r\nHost: localhost\r\n\r\n")
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    return response
+
+
+async def main():
+    bot = FakeBot()
+
+    start = time.perf_counter()
+    for _ in range(READS):
+        len(bot.guilds), len(bot.users)
+    walk = (time.perf_counter() - start) / READS
+    print(f"cache walk per botstats : {walk * 1000:9.3f} ms ({GUILDS} guilds, {USERS} users)")
+
+    metrics = GatewayMetrics(bot, MetricsRegistry())
+    await bot.listeners["on_ready"]()
+    start = time.perf_counter()
+    for _ in range(READS):
+        metrics.guilds.value(), metrics.members.value(), metrics.latency.value()
+    read = (time.perf_counter() - start) / READS
+    print(f"registry per botstats   : {read * 1000:9.3f} ms")
+
+    names = [f"command{i % 40}" for i in range(EVENTS)]
+    interactions = [FakeInteraction(name) for name in names[:1000]]
+    start = time.perf_counter()
+    for i in range(EVENTS):
+        await bot.listeners["on_application_command_completion"](interactions[i % 1000])
+    per_event = (time.perf_counter() - start) / EVENTS
+    for i in range(1000):
+        await bot.listeners["on_member_join"](None)
+    await bot.listeners["on_guild_join"](FakeGuild(-1, 1000))
+    print(f"command event recorded  : {per_event * 1e6:9.2f} us (counter + latency histogram)")
+    print(f"members after events    : {metrics.members.value()} (expected {GUILDS * 50 + 2000})")
+
+    server = await metrics.start_http_server(port=0)
+    port = server.sockets[0].getsockname()[1]
+    start = time.perf_counter()
+    response = await scrape(port)
+    elapsed = time.perf_counter() - start
+    await metrics.close()
+    body = response.split(b"\r\n\r\n", 1)[1].decode()
+    print(f"Prometheus scrape       : {elapsed * 1000:9.3f} ms, {len(body.splitlines())} lines, "
+          f"{response.split(b' ', 2)[1].decode()}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,106 @@
+"""
+Benchmark: nightcore rendering
+Realtime factor per core on generated test audio, time to first audio
+frame when streaming vs processing the whole track first, and a seam
+check: chunked output must match rendering the track in one piece.
+Needs numpy (and nextcord for the AudioSource base class).
+
+    python -m benchmarks.bench_nightcore
+"""
+
+import asyncio
+import time
+
+import numpy as np
+
+from cogs.utils.nightcore import (
+    CHANNELS,
+    FRAME_BYTES,
+    SAMPLE_RATE,
+    NightcoreEngine,
+    input_range,
+    render_chunk,
+)
+
+TRACK_SECONDS = 60
+SETTINGS = [(1.25, 1.25), (1.25, 1.5), (1.5, 1.2)]
+
+
+def test_audio(seconds):
+    # Chord with a slow sweep plus a little noise, different per channel
+    t = np.arange(seconds * SAMPLE_RATE) / SAMPLE_RATE
+    sweep = 220 * (1 + t / seconds)
+    left = 0.3 * np.sin(2 * np.pi * np.cumsum(sweep) / SAMPLE_RATE) + 0.2 * np.sin(2 * np.pi * 330 * t)
+    right = 0.3 * np.sin(2 * np.pi * 440 * t) + 0.2 * np.sin(2 * np.pi * np.cumsum(sweep * 1.5) / SAMPLE_RATE)
+    noise = np.random.default_rng(1).normal(0, 0.02, (len(t), CHANNELS))
+    audio = np.stack([left, right], axis=1) + noise
+    return (audio * 32767).astype(np.int16)
+
+
+def render_range(pcm, out_start, out_end, speed, pitch):
+    start, end = input_range(out_start, out_end, speed, pitch)
+    start = max(0, start)
+    return render_chunk(pcm[start:end], start, out_start, out_end, speed, pitch)
+
+
+def single_core(pcm, speed, pitch, chunk):
+    total = int(len(pcm) / speed)
+    cpu = 0.0
+    parts = []
+    for out_start in range(0, total, chunk):
+        data, seconds = render_range(pcm, out_start, min(out_start + chunk, total), speed, pitch)
+        parts.append(data)
+        cpu += seconds
+    whole, _ = render_range(pcm, 0, total, speed, pitch)
+    chunked = np.frombuffer(b"".join(parts), dtype=np.int16)
+    seam_error = int(np.abs(chunked.astype(np.int32) - np.frombuffer(whole, dtype=np.int16)).max())
+    return total / SAMPLE_RATE / cpu, seam_error
+
+
+async def streaming(engine, pcm, speed, pitch):
+    start = time.perf_counter()
+    source = engine.stream(pcm, speed, pitch)
+
+    def voice_thread():
+        first = None
+        frames = 0
+        while True:
+            frame = source.read()
+            if not frame:
+                return first, frames
+            assert len(frame) == FRAME_BYTES
+            if first is None:
+                first = time.perf_counter() - start
+            frames += 1
+
+    first, frames = await asyncio.to_thread(voice_thread)
+    elapsed = time.perf_counter() - start
+    source.cleanup()
+    return first, frames * 0.02 / elapsed
+
+
+async def main():
+    pcm = test_audio(TRACK_SECONDS)
+    engine = NightcoreEngine()
+    chunk = engine.chunk_samples
+    print(f"test track: {TRACK_SECONDS}s stereo, {engine.max_workers} workers, {chunk / SAMPLE_RATE:.2f}s chunks")
+
+    for speed, pitch in SETTINGS:
+        per_core, seam_error = single_core(pcm, speed, pitch, chunk)
+        whole_start = time.perf_counter()
+        render_range(pcm, 0, int(len(pcm) / speed), speed, pitch)
+        whole = time.perf_counter() - whole_start
+        first, wall_factor = await streaming(engine, pcm, speed, pitch)
+        print(
+            f"speed {speed} pitch {pitch}: {per_core:6.1f}x realtime per core, {wall_factor:6.1f}x with the pool | "
+            f"first frame after {first * 1000:5.1f}ms streaming vs {whole * 1000:6.1f}ms rendering it all | "
+            f"seam error {seam_error}"
+        )
+
+    stats = engine.stats()
+    print(f"engine: {stats['chunks']} chunks, {stats['underruns']} underruns while draining as fast as possible")
+    engine.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,92 @@
+"""
+Benchmark: re-rendering every request vs RenderCache
+A stream of nightcore requests where a few popular tracks at the default
+1.25/1.25 settings dominate. Reports render CPU time, hit ratio, bytes
+saved, and checks that a pinned (playing) entry survives eviction.
+Needs numpy and nextcord.
+
+    python -m benchmarks.bench_render_cache
+"""
+
+import random
+import tempfile
+import time
+
+from benchmarks.bench_nightcore import render_range, test_audio
+from cogs.utils.nightcore import SAMPLE_RATE
+from cogs.utils.render_cache import RenderCache, hash_source, render_key
+
+TRACKS = 30
+TRACK_SECONDS = 5
+REQUESTS = 300
+SETTINGS = [(1.25, 1.25)] * 7 + [(1.5, 1.5), (1.25, 1.5), (1.1, 1.3)]
+CACHE_BYTES = 40 * 1024 ** 2
+
+
+def requests():
+    rng = random.Random(1)
+    # Popularity falls off roughly like 1/rank
+    weights = [1 / (rank + 1) for rank in range(TRACKS)]
+    return [
+        (rng.choices(range(TRACKS), weights)[0], rng.choice(SETTINGS))
+        for _ in range(REQUESTS)
+    ]
+
+
+def render(pcm, speed, pitch):
+    total = int(len(pcm) / speed)
+    start = time.process_time()
+    data, _ = render_range(pcm, 0, total, speed, pitch)
+    return data, time.process_time() - start
+
+
+def main():
+    tracks = [test_audio(TRACK_SECONDS) for _ in range(TRACKS)]
+    for index, track in enumerate(tracks):
+        track[0, 0] = index  # make every track's content (and hash) unique
+    hashes = [hash_source(track) for track in tracks]
+    workload = requests()
+
+    uncached = 0.0
+    for track, (speed, pitch) in workload:
+        uncached += render(tracks[track], speed, pitch)[1]
+    print(f"no cache    : {uncached:6.2f}s of render CPU for {REQUESTS} requests")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = RenderCache(tmp, max_bytes=CACHE_BYTES)
+        cpu = 0.0
+        for track, (speed, pitch) in workload:
+            key = render_key(hashes[track], speed, pitch)
+            cached = cache.get(key)
+            if cached is not None:
+                # Walk it frame by frame like playback does
+                with cached:
+                    for offset in range(0, len(cached), 3840):
+                        cached.data[offset:offset + 3840]
+                continue
+            data, seconds = render(tracks[track], speed, pitch)
+            cpu += seconds
+            cache.put(key, data)
+
+        stats = cache.stats()
+        print(
+            f"RenderCache : {cpu:6.2f}s of render CPU, hit ratio {stats['hit_ratio']:.0%}, "
+            f"{stats['bytes_saved'] / 1024 ** 2:.0f} MiB served from cache, {stats['evictions']} evictions "
+            f"({CACHE_BYTES // 1024 ** 2} MiB limit)"
+        )
+
+        # Pinning: an entry that is playing is never evicted
+        key = render_key(hashes[0], 1.25, 1.25)
+        if key not in cache:
+            cache.put(key, render(tracks[0], 1.25, 1.25)[0])
+        playing = cache.get(key)
+        filler = bytes(SAMPLE_RATE * 4 * TRACK_SECONDS)
+        for i in range(CACHE_BYTES // len(filler) + 5):
+            cache.put(f"filler-{i}.pcm", filler)
+        survived = key in cache
+        playing.close()
+        print(f"pinning     : playing entry survived a full cache turnover: {survived}")
+
+
+if __name__ == "__main__":
+    main()
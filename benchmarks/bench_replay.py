@@ -0,0 +1,225 @@
+"""
+Benchmark: trace replay
+Replays a recorded interaction trace (see cogs/utils/traces.py) against
+the cog templates and in-process fakes at increasing speed, reporting
+queueing delay, command latency and connection pool contention as the
+load scales. Without a trace file, a synthetic 30-second trace is used.
+Needs nextcord.
+
+    python -m benchmarks.bench_replay
+    python -m benchmarks.bench_replay traces/interactions.jsonl.gz --speeds 1 10 50 --window 120
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import random
+import tempfile
+import time
+from collections import Counter
+
+from benchmarks.bench_templates import (
+    GUILDS,
+    MODERATORS,
+    REST_LATENCY,
+    SCENARIOS,
+    TARGETS,
+    Environment,
+    percentile,
+)
+from benchmarks.fakes import FakeInteraction, FakeMember
+from cogs.utils.traces import pseudonym, read_trace, write_trace
+
+SPEEDS = (1, 5, 10, 25, 50)
+
+# Synthetic trace: steady traffic plus a raid burst in one guild
+SYNTHETIC_SECONDS = 30
+SYNTHETIC_RATE = 40  # commands/s
+SYNTHETIC_MIX = (("get_data", 0.45), ("add_data", 0.25), ("moderate_user", 0.2), ("temporary_action", 0.1))
+
+
+def synthesize(path):
+    rng = random.Random(7)
+    salt = b"synthetic"
+    commands, weights = zip(*SYNTHETIC_MIX)
+    records = []
+
+    def record(t, command, guild, target):
+        options = {"user": {"id": pseudonym(target, salt)}}
+        if command == "add_data":
+            options["data"] = {"len": rng.randint(5, 60)}
+        elif command in ("moderate_user", "temporary_action"):
+            options["reason"] = {"len": rng.randint(5, 40)}
+        if command == "temporary_action":
+            options["duration"] = rng.choice(("10m", "1h", "1d"))
+        records.append({
+            "t": round(t, 3),
+            "c": command,
+            "g": pseudonym(guild, salt),
+            "u": pseudonym(rng.randrange(500), salt),
+            "o": options,
+            "d": 0.0,
+            "s": "ok",
+        })
+
+    t = 0.0
+    while t < SYNTHETIC_SECONDS:
+        t += rng.expovariate(SYNTHETIC_RATE)
+        # Popular guilds and repeat targets, like real traffic
+        guild = int(rng.paretovariate(1.2)) % 50
+        record(t, rng.choices(commands, weights)[0], guild, int(rng.paretovariate(1.1)) % 1000)
+
+    # Raid: 10 seconds in, moderators in one guild warn 300 accounts in 3 seconds
+    for n in range(300):
+        record(10 + rng.uniform(0, 3), rng.choice(("add_data", "moderate_user")), 0, 5000 + n)
+
+    write_trace(path, records)
+
+
+class Replay:
+    """Maps a trace's pseudonymous IDs onto the environment's seeded ones."""
+
+    def __init__(self, env):
+        self.env = env
+        self.commands = {command: cog for cog, command, _ in SCENARIOS}
+        self._guilds = {}
+        self._users = {}
+        self._targets = {}
+
+    @staticmethod
+    def _dense(mapping, key, size):
+        index = mapping.get(key)
+        if index is None:
+            index = mapping[key] = len(mapping)
+        return index % size
+
+    def options(self, record):
+        options = {}
+        for name, value in record["o"].items():
+            if isinstance(value, dict) and "id" in value:
+                target = 100_000 + self._dense(self._targets, value["id"], TARGETS)
+                options[name] = FakeMember(target, top_role=1, http=self.env.http)
+            elif isinstance(value, dict) and "len" in value:
+                options[name] = "x" * value["len"]
+            elif isinstance(value, dict):
+                return None  # attachments can't be replayed
+            else:
+                options[name] = value
+        return options
+
+    def interaction(self, record):
+        guild = self.env.guilds[self._dense(self._guilds, record["g"], GUILDS)]
+        moderator = FakeMember(1000 + self._dense(self._users, record["u"], MODERATORS), top_role=10, manage_messages=True)
+        return FakeInteraction(moderator, guild, record["c"], REST_LATENCY)
+
+
+async def replay(records, speed, directory):
+    env = await Environment().open(directory)
+    mapper = Replay(env)
+    delays = []
+    latencies = []
+    skipped = Counter()
+    errors = 0
+    in_flight = 0
+    peak_in_flight = 0
+
+    async def run(record, options, scheduled):
+        nonlocal errors, in_flight, peak_in_flight
+        cog = env.cogs[mapper.commands[record["c"]]]
+        callback = getattr(cog, record["c"]).callback
+        started = time.monotonic()
+        delays.append(started - scheduled)
+        in_flight += 1
+        peak_in_flight = max(peak_in_flight, in_flight)
+        try:
+            await callback(cog, mapper.interaction(record), **options)
+        except Exception as e:
+            errors += 1
+            logging.getLogger(__name__).error("/%s raised: %r", record["c"], e)
+        finally:
+            in_flight -= 1
+        latencies.append(time.monotonic() - started)
+
+    tasks = []
+    first = records[0]["t"]
+    start = time.monotonic()
+    for record in records:
+        options = mapper.options(record) if record["c"] in mapper.commands else None
+        if options is None:
+            skipped[record["c"]] += 1
+            continue
+        scheduled = start + (record["t"] - first) / speed
+        delay = scheduled - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(run(record, options, scheduled)))
+    await asyncio.gather(*tasks)
+    elapsed = time.monotonic() - start
+
+    pool = env.pool.stats()
+    queue = env.cogs["database"].warning_queue.stats()
+    await env.close()
+
+    delays.sort()
+    latencies.sort()
+    return {
+        "commands": len(tasks),
+        "offered": len(tasks) / max((records[-1]["t"] - first) / speed, 1e-9),
+        "achieved": len(tasks) / elapsed,
+        "delay_p50": percentile(delays, 0.5),
+        "delay_p99": percentile(delays, 0.99),
+        "latency_p50": percentile(latencies, 0.5),
+        "latency_p99": percentile(latencies, 0.99),
+        "peak_in_flight": peak_in_flight,
+        "pool_wait_avg": pool["avg_wait"],
+        "pool_wait_p95": pool["p95_wait"],
+        "avg_batch": queue["avg_batch_size"],
+        "errors": errors,
+        "skipped": skipped,
+    }
+
+
+async def main(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.trace
+        if path is None:
+            path = os.path.join(tmp, "synthetic.jsonl.gz")
+            synthesize(path)
+
+        records = read_trace(path)
+        if args.window:
+            records = [record for record in records if record["t"] - records[0]["t"] <= args.window]
+        if not records:
+            print("Trace is empty")
+            return
+        mix = Counter(record["c"] for record in records)
+        print(f"{len(records)} records over {records[-1]['t'] - records[0]['t']:.0f}s: {dict(mix.most_common())}\n")
+
+        print(
+            f"{'speed':>5} {'offered/s':>9} {'done/s':>7} {'delay p50':>9} {'p99 ms':>7} "
+            f"{'lat p50':>8} {'p99 ms':>7} {'in flight':>9} {'pool wait':>9} {'p95 ms':>7} {'batch':>5} {'errors':>6}"
+        )
+        skipped = Counter()
+        for speed in args.speeds:
+            run_dir = os.path.join(tmp, f"speed_{speed}")
+            os.makedirs(run_dir)
+            result = await replay(records, speed, run_dir)
+            skipped = result["skipped"]
+            print(
+                f"{speed:>4g}x {result['offered']:9.0f} {result['achieved']:7.0f} "
+                f"{result['delay_p50'] * 1000:9.1f} {result['delay_p99'] * 1000:7.1f} "
+                f"{result['latency_p50'] * 1000:8.1f} {result['latency_p99'] * 1000:7.1f} "
+                f"{result['peak_in_flight']:9} {result['pool_wait_avg'] * 1000:9.2f} "
+                f"{result['pool_wait_p95'] * 1000:7.2f} {result['avg_batch']:5.1f} {result['errors']:6}"
+            )
+        if skipped:
+            print(f"\nSkipped (no template command, or attachment options): {dict(skipped)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("trace", nargs="?", help="Trace file written by TraceRecorder")
+    parser.add_argument("--speeds", type=float, nargs="+", default=SPEEDS, help="Replay speed multipliers")
+    parser.add_argument("--window", type=float, help="Only replay the first N seconds of the trace")
+    asyncio.run(main(parser.parse_args()))
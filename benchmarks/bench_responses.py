@@ -0,0 +1,130 @@
+"""
+Benchmark: maybe_send_ad + interaction.send vs ResponsePipeline
+Commands with a slow ad and slow work; counts how many would miss
+Discord's 3-second acknowledgement window. Times are scaled down 10x.
+
+    python -m benchmarks.bench_responses
+"""
+
+import asyncio
+import random
+import time
+
+import nextcord
+
+from cogs.utils.responses import ResponseMetrics, ResponsePipeline
+
+SCALE = 0.1
+WINDOW = 3.0 * SCALE
+COMMANDS = 200
+
+
+class FakeResponse:
+    def __init__(self, interaction):
+        self._interaction = interaction
+        self._done = False
+
+    def is_done(self):
+        return self._done
+
+    async def defer(self, ephemeral=False):
+        if self._done:
+            raise nextcord.InteractionResponded(self._interaction)
+        await asyncio.sleep(0.05 * SCALE)
+        self._interaction.ack(deferred=True)
+
+
+class FakeInteraction:
+    def __init__(self):
+        self.response = FakeResponse(self)
+        self.created = time.monotonic()
+        self.acked_at = None
+        self.deferred = False
+
+    def ack(self, deferred=False):
+        if not self.response._done:
+            self.response._done = True
+            self.deferred = deferred
+            self.acked_at = time.monotonic()
+
+    async def send(self, *args, **kwargs):
+        await asyncio.sleep(0.1 * SCALE)
+        self.ack()
+
+
+class FakeBot:
+    def __init__(self, rng):
+        self.rng = rng
+
+    async def maybe_send_ad(self, interaction):
+        await self.post_ad(interaction, await self.prepare_ad(interaction))
+
+    async def prepare_ad(self, interaction):
+        # Most runs show no ad; picking one takes a slow lookup
+        if self.rng.random() < 0.5:
+            await asyncio.sleep(self.rng.uniform(0.4, 1.4) * SCALE)
+            return "ad"
+        return None
+
+    async def post_ad(self, interaction, ad):
+        if ad is not None:
+            await interaction.send(ad)
+
+
+def workloads():
+    rng = random.Random(1)
+    return [rng.uniform(0.2, 3.5) * SCALE for _ in range(COMMANDS)]
+
+
+async def run(handler):
+    bot = FakeBot(random.Random(2))
+    interactions = []
+
+    async def command(work):
+        interaction = FakeInteraction()
+        interactions.append(interaction)
+        await handler(bot, interaction, work)
+
+    await asyncio.gather(*(command(work) for work in workloads()))
+    acks = [interaction.acked_at - interaction.created for interaction in interactions]
+    missed = sum(ack > WINDOW for ack in acks)
+    return sorted(acks), missed
+
+
+async def legacy(bot, interaction, work):
+    await asyncio.sleep(work)
+    await bot.maybe_send_ad(interaction)
+    await interaction.send("result")
+
+
+def pipeline(metrics):
+    async def handler(bot, interaction, work):
+        async with ResponsePipeline(
+            bot,
+            interaction,
+            defer_after=1.5 * SCALE,
+            command_name="bench",
+            metrics=metrics
+        ) as response:
+            await asyncio.sleep(work)
+            await response.send("result")
+    return handler
+
+
+def report(name, acks, missed):
+    p95 = acks[int(len(acks) * 0.95) - 1] / SCALE
+    print(f"{name:<20}: p95 time-to-ack {p95:5.2f}s, max {acks[-1] / SCALE:5.2f}s, {missed}/{COMMANDS} missed the 3s window")
+
+
+async def main():
+    acks, missed = await run(legacy)
+    report("ad + send", acks, missed)
+
+    metrics = ResponseMetrics()
+    acks, missed = await run(pipeline(metrics))
+    report("ResponsePipeline", acks, missed)
+    print(f"{'':<20}  {metrics.stats()['bench']['deferred']} runs deferred")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
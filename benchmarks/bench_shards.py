@@ -0,0 +1,176 @@
+"""
+Benchmark: multi-process shard runner
+Runs the basic cog template under `ShardLauncher` with 1, 2 and 4 worker
+processes against fake gateways (one per shard) and reports commands/s
+across all workers, the shared blacklist segment vs what each worker would
+hold privately, and how long a blacklist change and a config update take
+to reach every worker. Scaling is bounded by the number of cores, which is
+printed first. Needs nextcord.
+
+    python -m benchmarks.bench_shards
+"""
+
+import asyncio
+import importlib
+import os
+import random
+import resource
+import time
+
+from benchmarks.fakes import FakeBot, FakeGuild, FakeInteraction, FakeMember
+from cogs.utils.shared_state import SharedBlacklistStore, SharedConfig
+from cogs.utils.shards import ShardLauncher
+
+SHARDS = 8
+EVENTS_PER_SHARD = 25_000
+WORKER_COUNTS = (1, 2, 4)
+BLACKLISTED = 1_000_000
+BLACKLISTED_SHARE = 0.05  # of command invocations
+USERS = 50_000
+EXTENSIONS = ["developer_guide.templates.basic_cog_template"]
+
+# A user the launcher blacklists after the run, and one worker 0 blacklists
+PROBE_USER = 7
+WORKER_USER = 8
+
+
+class GatewayBot(FakeBot):
+    """
+    Bot for one shard group: `start` plays EVENTS_PER_SHARD slash commands
+    per shard through the loaded cogs, as a gateway would deliver them,
+    then checks that a change broadcast by the launcher arrived.
+    """
+
+    def __init__(self, shard_ids, shard_count):
+        super().__init__(None, ad_rate=0.0, fetch_latency=0.0)
+        self.shard_ids = shard_ids
+        self.shard_count = shard_count
+        self.cogs = {}
+        self.closed = False
+
+    def add_cog(self, cog):
+        self.cogs[type(cog).__name__] = cog
+
+    def load_extension(self, name):
+        importlib.import_module(name).setup(self)
+
+    def events(self, shard_id):
+        rng = random.Random(shard_id)
+        config = self.config
+        guilds = [FakeGuild((n << 22) * self.shard_count + shard_id, self.user) for n in range(1, 51)]
+        for _ in range(config["events_per_shard"]):
+            if rng.random() < config["blacklisted_share"]:
+                user_id = config["blacklist_start"] + rng.randrange(config["blacklisted"])
+            else:
+                user_id = 10**17 + rng.randrange(config["users"])
+            yield FakeInteraction(FakeMember(user_id), rng.choice(guilds), "example")
+
+    async def start(self, token):
+        if self.ipc.index == 0:
+            # A change made in a worker reaches the others through the launcher
+            self.blacklist.add(WORKER_USER)
+
+        cog = self.cogs["BasicCogTemplate"]
+        callback = cog.example.callback
+        events = [event for shard_id in self.shard_ids for event in self.events(shard_id)]
+        started = time.time()
+        for interaction in events:
+            await callback(cog, interaction)
+        finished = time.time()
+        blocked = sum(1 for interaction in events if interaction.sent[0][1].title.startswith("You are blacklisted"))
+        self.ipc.report({
+            "events": len(events),
+            "blocked": blocked,
+            "started": started,
+            "finished": finished,
+            "shared_bytes": self.blacklist.shared_bytes(),
+            "private_bytes": self.blacklist.memory_usage() - self.blacklist.shared_bytes(),
+            "max_rss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+        })
+
+        while "probe_sent" not in self.config and not self.closed:
+            await asyncio.sleep(0.001)
+        if self.closed:
+            return
+        self.ipc.report({
+            "probe_latency": time.time() - self.config["probe_sent"],
+            "probe_seen": PROBE_USER in self.blacklist,
+            "worker_change_seen": WORKER_USER in self.blacklist,
+        })
+
+    async def close(self):
+        self.closed = True
+
+
+def create_bot(shard_ids, shard_count):
+    return GatewayBot(shard_ids, shard_count)
+
+
+async def wait_for_reports(launcher, key):
+    while not all(key in launcher.reports.get(index, {}) for index in range(len(launcher.groups))):
+        await asyncio.sleep(0.01)
+    return [launcher.reports[index] for index in range(len(launcher.groups))]
+
+
+async def run(workers):
+    blacklist_start = 10**17 + 10**9
+    blacklist = SharedBlacklistStore.from_ids(range(blacklist_start, blacklist_start + BLACKLISTED))
+    config = SharedConfig({
+        "events_per_shard": EVENTS_PER_SHARD,
+        "blacklisted_share": BLACKLISTED_SHARE,
+        "blacklist_start": blacklist_start,
+        "blacklisted": BLACKLISTED,
+        "users": USERS,
+    })
+    launcher = ShardLauncher(
+        "benchmarks.bench_shards:create_bot", EXTENSIONS, SHARDS, workers,
+        blacklist=blacklist, config=config, token_env=None
+    )
+    await launcher.start()
+    try:
+        reports = await wait_for_reports(launcher, "events")
+
+        # Broadcast a blacklist change, then a config update that tells the
+        # workers to check for it
+        blacklist.add(PROBE_USER)
+        config.update(probe_sent=time.time())
+        probes = await wait_for_reports(launcher, "probe_latency")
+        await launcher.wait()
+    finally:
+        await launcher.stop()
+    return reports, probes
+
+
+async def main():
+    print(f"{os.cpu_count()} CPU cores; {SHARDS} shards x {EVENTS_PER_SHARD:,} /example events, {BLACKLISTED:,} blacklisted IDs\n")
+    print(f"{'workers':>7} {'cmds/s':>9} {'speedup':>8} {'blocked':>8} {'segment MiB':>12} {'private KiB':>12} {'max RSS MiB':>12}")
+    baseline = None
+    probe_rows = []
+    for workers in WORKER_COUNTS:
+        reports, probes = await run(workers)
+        events = sum(report["events"] for report in reports)
+        elapsed = max(report["finished"] for report in reports) - min(report["started"] for report in reports)
+        rate = events / elapsed
+        baseline = baseline or rate
+        print(
+            f"{workers:>7} {rate:9.0f} {rate / baseline:7.2f}x {sum(report['blocked'] for report in reports):8} "
+            f"{reports[0]['shared_bytes'] / 2**20:12.1f} {max(report['private_bytes'] for report in reports) / 1024:12.1f} "
+            f"{max(report['max_rss'] for report in reports) / 2**20:12.0f}"
+        )
+        probe_rows.append((workers, probes))
+
+    private_copy = BLACKLISTED * 8 + (1 << 21)
+    print(f"\n(a private BlacklistStore would hold {private_copy / 2**20:.1f} MiB in every worker)")
+    print("\nbroadcast to every worker (launcher blacklist change + config update, and a change made in worker 0):")
+    for workers, probes in probe_rows:
+        latency = max(probe["probe_latency"] for probe in probes)
+        seen = sum(probe["probe_seen"] for probe in probes)
+        worker_seen = sum(probe["worker_change_seen"] for probe in probes)
+        print(
+            f"  {workers} workers: slowest {latency * 1000:.1f}ms; launcher change seen by {seen}/{workers}, "
+            f"worker 0's change seen by {worker_seen}/{workers}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,194 @@
+"""
+Benchmark: single-flight lookups
+Raid pattern: several moderators run /get_data on the same offender within
+the same second. Compares per-call lookups (one page query and one
+fetch_user per missing moderator name for every command) with
+`SingleFlight` on the page query and in `UserResolver`, with and without
+a reuse window. Ends with cancellation checks: the first waiter going
+away, and every waiter going away.
+
+    python -m benchmarks.bench_singleflight
+"""
+
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.fakes import FakeBot, sqlite_connector
+from cogs.utils.blacklist import BlacklistStore
+from cogs.utils.db import create_tables, get_warnings_page
+from cogs.utils.db_pool import ConnectionPool
+from cogs.utils.metrics import MetricsRegistry
+from cogs.utils.singleflight import SingleFlight
+from cogs.utils.users import UserResolver
+
+OFFENDERS = 40
+COMMANDS_PER_OFFENDER = 8  # moderators looking at the same offender
+RAID_WINDOW = 1.0          # seconds in which they all run /get_data
+RAIDS_OVER = 3.0           # seconds over which the raids start
+WARNINGS_PER_OFFENDER = 30
+MODERATORS_PER_OFFENDER = 10
+PAGE_SIZE = 10
+DB_LATENCY = 0.005
+FETCH_LATENCY = 0.08
+
+
+class PerCallResolver(UserResolver):
+    """UserResolver as it was before single-flight: every call fetches on its own."""
+
+    async def _fetch_name(self, user_id, semaphore):
+        async with semaphore:
+            self.fetches += 1
+            try:
+                user = await self.bot.fetch_user(user_id)
+            except Exception:
+                self.failures += 1
+                return user_id, None
+
+        self._store(user_id, user.name)
+        return user_id, user.name
+
+
+def counting_connector(path, latency, connections):
+    connect = sqlite_connector(path, latency)
+
+    async def counted():
+        connection = await connect()
+        connections.append(connection)
+        return connection
+    return counted
+
+
+async def seed(pool):
+    rows = [
+        (1, 10_000 + offender, 1000 + offender * MODERATORS_PER_OFFENDER + n % MODERATORS_PER_OFFENDER,
+         f"raid #{n}", "2024-01-01 00:00:00")
+        for offender in range(OFFENDERS)
+        for n in range(WARNINGS_PER_OFFENDER)
+    ]
+    async with pool.acquire() as conn:
+        await conn.executemany(
+            "INSERT INTO warnings (guild_id, user_id, moderator_id, reason, date) VALUES (?, ?, ?, ?, ?)",
+            rows
+        )
+
+
+def schedule():
+    rng = random.Random(23)
+    starts = []
+    for offender in range(OFFENDERS):
+        raid_start = rng.uniform(0, RAIDS_OVER)
+        for _ in range(COMMANDS_PER_OFFENDER):
+            starts.append((raid_start + rng.uniform(0, RAID_WINDOW), 10_000 + offender))
+    starts.sort()
+    return starts
+
+
+async def run(path, lookups, resolver_class):
+    connections = []
+    pool = await ConnectionPool(counting_connector(path, DB_LATENCY, connections), min_size=2, max_size=8).open()
+    bot = FakeBot(BlacklistStore(), connection=pool, gateway_hit_rate=0.0, fetch_latency=FETCH_LATENCY)
+    resolver = resolver_class(bot)
+    before = sum(connection.statements for connection in connections)
+
+    async def get_data(delay, user_id):
+        await asyncio.sleep(delay)
+        started = time.perf_counter()
+        if lookups is None:
+            rows, _ = await get_warnings_page(pool, 1, user_id, limit=PAGE_SIZE) or ([], 0)
+        else:
+            rows, _ = await lookups.do((1, user_id), get_warnings_page, pool, 1, user_id, limit=PAGE_SIZE) or ([], 0)
+        await resolver.resolve_names(moderator_id for _, moderator_id, _, _ in rows)
+        return time.perf_counter() - started
+
+    latencies = sorted(await asyncio.gather(*(get_data(delay, user_id) for delay, user_id in schedule())))
+    queries = sum(connection.statements for connection in connections) - before
+    await pool.close()
+    return queries, bot.fetches, latencies, resolver.stats()
+
+
+async def first_waiter_leaves():
+    """Ten waiters share a query; the one that started it is cancelled."""
+    lookups = SingleFlight("bench", registry=MetricsRegistry())
+    calls = []
+
+    async def query():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "rows"
+
+    first = asyncio.create_task(lookups.do("key", query))
+    await asyncio.sleep(0)
+    others = [asyncio.create_task(lookups.do("key", query)) for _ in range(9)]
+    await asyncio.sleep(0.01)
+    first.cancel()
+    results = await asyncio.gather(*others, return_exceptions=True)
+    answered = sum(1 for result in results if result == "rows")
+    return first.cancelled(), answered, len(calls)
+
+
+async def every_waiter_leaves():
+    """All waiters are cancelled: the query is cancelled, and the next caller starts afresh."""
+    lookups = SingleFlight("bench", registry=MetricsRegistry())
+    finished = []
+
+    async def query():
+        await asyncio.sleep(0.05)
+        finished.append(1)
+        return "rows"
+
+    waiters = [asyncio.create_task(lookups.do("key", query)) for _ in range(5)]
+    await asyncio.sleep(0.01)
+    for waiter in waiters:
+        waiter.cancel()
+    await asyncio.gather(*waiters, return_exceptions=True)
+    await asyncio.sleep(0.06)
+    abandoned = lookups.stats()["abandoned"]
+    result = await lookups.do("key", query)
+    return abandoned, len(finished) - 1, result
+
+
+async def main():
+    commands = OFFENDERS * COMMANDS_PER_OFFENDER
+    print(
+        f"{OFFENDERS} offenders x {COMMANDS_PER_OFFENDER} /get_data within {RAID_WINDOW:.0f}s each, "
+        f"{DB_LATENCY * 1000:.0f}ms per query, {FETCH_LATENCY * 1000:.0f}ms per fetch_user\n"
+    )
+    print(f"{'':<26} {'page queries':>12} {'fetch_user':>10} {'p50 ms':>7} {'p95 ms':>7}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for index, (name, lookups, resolver_class) in enumerate((
+            ("per call", None, PerCallResolver),
+            ("single-flight", SingleFlight("bench", registry=MetricsRegistry()), UserResolver),
+            ("single-flight + 1s reuse", SingleFlight("bench", reuse_for=1.0, registry=MetricsRegistry()), UserResolver),
+        )):
+            path = os.path.join(tmp, f"{index}.db")
+            pool = await ConnectionPool(sqlite_connector(path), min_size=1, max_size=1).open()
+            await create_tables(pool)
+            await seed(pool)
+            await pool.close()
+
+            queries, fetches, latencies, resolver_stats = await run(path, lookups, resolver_class)
+            p50 = latencies[len(latencies) // 2]
+            p95 = latencies[int(len(latencies) * 0.95)]
+            print(f"{name:<26} {queries:12} {fetches:10} {p50 * 1000:7.1f} {p95 * 1000:7.1f}")
+            if lookups is not None:
+                stats = lookups.stats()
+                print(
+                    f"{'':<26} {stats['collapsed']} queries joined one in flight, {stats['reused']} reused, "
+                    f"{resolver_stats['collapsed_fetches']} fetch_user calls joined"
+                )
+    print(f"({commands} commands)")
+
+    cancelled, answered, calls = await first_waiter_leaves()
+    print(f"\nfirst waiter cancelled: {cancelled}; other waiters answered: {answered}/9; queries run: {calls}")
+    abandoned, finished, result = await every_waiter_leaves()
+    print(
+        f"every waiter cancelled: {abandoned} query abandoned, {finished} finished anyway; "
+        f"next caller got {result!r}"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,250 @@
+"""
+Benchmark: cog template throughput
+Drives the commands of BasicCogTemplate, ModerationCogTemplate and
+DatabaseCogTemplate against in-process fakes (interaction, members, bot,
+SQLite with simulated latency) at increasing concurrency, and reports
+commands/s and latency percentiles per command. Needs nextcord.
+
+    python -m benchmarks.bench_templates
+    python -m benchmarks.bench_templates --save baseline.json
+    python -m benchmarks.bench_templates --baseline baseline.json  # exits 1 on a regression
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+
+from benchmarks.fakes import (
+    FakeBot,
+    FakeDiscordHTTP,
+    FakeGuild,
+    FakeInteraction,
+    FakeMember,
+    sqlite_connector,
+)
+from cogs.utils.blacklist import BlacklistStore
+from cogs.utils.db import create_tables
+from cogs.utils.db_pool import ConnectionPool
+from cogs.utils.dm_queue import DMQueue
+from cogs.utils.expiry import ExpiryScheduler
+from cogs.utils.warning_counts import WarningCountCache
+from developer_guide.templates.basic_cog_template import BasicCogTemplate
+from developer_guide.templates.database_cog_template import DATABASE_COOLDOWN, DatabaseCogTemplate
+from developer_guide.templates.moderation_cog_template import ModerationCogTemplate
+
+# Simulated latencies (seconds)
+REST_LATENCY = 0.02   # interaction responses, message edits
+DB_LATENCY = 0.001    # per statement
+FETCH_LATENCY = 0.05  # bot.fetch_user
+AD_LATENCY = 0.05     # picking an ad, on AD_RATE of commands
+AD_RATE = 0.2
+
+CONCURRENCY = (1, 50, 500)
+MIN_INVOCATIONS = 100
+INVOCATIONS_PER_WORKER = 10
+
+GUILDS = 20
+MODERATORS = 5000
+TARGETS = 200
+SEEDED_WARNINGS = 25      # per target, so get_data shows several pages
+BLACKLISTED = 0.01        # share of moderators on the blacklist
+
+# Slower than this fraction of the baseline counts as a regression
+TOLERANCE = 0.2
+
+
+def percentile(samples, q):
+    return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+
+class Environment:
+    """One fake bot with the three template cogs loaded."""
+
+    async def open(self, directory):
+        self.pool = await ConnectionPool(
+            sqlite_connector(os.path.join(directory, "templates.db"), DB_LATENCY),
+            min_size=2,
+            max_size=8
+        ).open()
+        await create_tables(self.pool)
+        await self._seed()
+
+        rng = random.Random(3)
+        blacklisted = rng.sample(range(MODERATORS), int(MODERATORS * BLACKLISTED))
+        blacklist = BlacklistStore.from_ids(
+            (1000 + index for index in blacklisted),
+            reasons={1000 + index: "Benchmark" for index in blacklisted}
+        )
+
+        self.http = FakeDiscordHTTP(latency=REST_LATENCY)
+        dm_queue = DMQueue()
+        dm_queue.start()
+        self.bot = FakeBot(
+            blacklist,
+            connection=self.pool,
+            expiry=ExpiryScheduler(self.pool),
+            dm_queue=dm_queue,
+            warning_counts=WarningCountCache(),
+            ad_rate=AD_RATE,
+            ad_latency=AD_LATENCY,
+            fetch_latency=FETCH_LATENCY
+        )
+        me = self.bot.user
+        self.guilds = [FakeGuild(guild_id, me) for guild_id in range(1, GUILDS + 1)]
+        for guild in self.guilds:
+            self.bot.add_guild(guild)
+
+        # Thousands of commands per second from a few guilds would mostly be
+        # throttled; this measures the commands (bench_cooldowns measures cooldowns)
+        DATABASE_COOLDOWN.enabled = False
+
+        self.cogs = {
+            "basic": BasicCogTemplate(self.bot),
+            "moderation": ModerationCogTemplate(self.bot),
+            "database": DatabaseCogTemplate(self.bot),
+        }
+        return self
+
+    async def _seed(self):
+        rows = [
+            (guild_id, 100_000 + target, 1000 + (target * 7 + n) % MODERATORS, f"seed #{n}", "2024-01-01 00:00:00")
+            for guild_id in range(1, GUILDS + 1)
+            for target in range(TARGETS)
+            for n in range(SEEDED_WARNINGS)
+        ]
+        async with self.pool.acquire() as conn:
+            # One transaction; the fake connection autocommits otherwise
+            await conn.execute("BEGIN")
+            await conn.executemany(
+                "INSERT INTO warnings (guild_id, user_id, moderator_id, reason, date) VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+            await conn.commit()
+
+    def interaction(self, rng, command_name):
+        moderator = FakeMember(1000 + rng.randrange(MODERATORS), top_role=10, manage_messages=True)
+        return FakeInteraction(moderator, rng.choice(self.guilds), command_name, REST_LATENCY)
+
+    def target(self, rng):
+        return FakeMember(100_000 + rng.randrange(TARGETS), top_role=1, http=self.http)
+
+    async def close(self):
+        await self.cogs["database"].warning_queue.close()
+        await self.bot.dm_queue.close(timeout=0)
+        await self.pool.close()
+
+
+# (cog, command, options) for every template command
+SCENARIOS = [
+    ("basic", "example", lambda env, rng: {}),
+    ("basic", "example_with_params", lambda env, rng: {"text": "hello", "number": 3}),
+    ("moderation", "moderate_user", lambda env, rng: {"user": env.target(rng), "reason": "spam"}),
+    ("moderation", "temporary_action", lambda env, rng: {"user": env.target(rng), "duration": "1h", "reason": "spam"}),
+    ("database", "add_data", lambda env, rng: {"user": env.target(rng), "data": "note"}),
+    ("database", "get_data", lambda env, rng: {"user": env.target(rng)}),
+]
+
+
+async def drive(env, cog_name, command_name, options, concurrency):
+    cog = env.cogs[cog_name]
+    callback = getattr(cog, command_name).callback
+    invocations = max(MIN_INVOCATIONS, concurrency * INVOCATIONS_PER_WORKER)
+    rng = random.Random(hash((command_name, concurrency)))
+    latencies = []
+    errors = 0
+    remaining = invocations
+
+    async def worker():
+        nonlocal errors, remaining
+        while remaining > 0:
+            remaining -= 1
+            interaction = env.interaction(rng, command_name)
+            kwargs = options(env, rng)
+            start = time.perf_counter()
+            try:
+                await callback(cog, interaction, **kwargs)
+            except Exception as e:
+                errors += 1
+                logging.getLogger(__name__).error("/%s raised: %r", command_name, e)
+                continue
+            latencies.append(time.perf_counter() - start)
+            # Templates report failures as "❌ ..." messages rather than raising
+            if any(content and content.startswith("❌") for content, _ in interaction.sent):
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "invocations": invocations,
+        "commands_per_second": invocations / elapsed,
+        "p50": percentile(latencies, 0.5) if latencies else 0.0,
+        "p95": percentile(latencies, 0.95) if latencies else 0.0,
+        "p99": percentile(latencies, 0.99) if latencies else 0.0,
+        "errors": errors,
+    }
+
+
+def find_regressions(results, baseline):
+    regressions = []
+    for key, result in results.items():
+        before = baseline.get(key)
+        if before is None:
+            continue
+        if result["commands_per_second"] < before["commands_per_second"] * (1 - TOLERANCE):
+            regressions.append(
+                f"{key}: {before['commands_per_second']:.0f} -> {result['commands_per_second']:.0f} commands/s"
+            )
+        if result["p95"] > before["p95"] * (1 + TOLERANCE):
+            regressions.append(f"{key}: p95 {before['p95'] * 1000:.1f} -> {result['p95'] * 1000:.1f}ms")
+    return regressions
+
+
+async def main(args):
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        env = await Environment().open(tmp)
+        print(
+            f"{'command':<22} {'conc':>5} {'cmds/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}"
+        )
+        for cog_name, command_name, options in SCENARIOS:
+            for concurrency in CONCURRENCY:
+                result = await drive(env, cog_name, command_name, options, concurrency)
+                results[f"{command_name}@{concurrency}"] = result
+                print(
+                    f"{command_name:<22} {concurrency:>5} {result['commands_per_second']:9.0f} "
+                    f"{result['p50'] * 1000:8.1f} {result['p95'] * 1000:8.1f} {result['p99'] * 1000:8.1f} "
+                    f"{result['errors']:7}"
+                )
+        await env.close()
+
+    if args.save:
+        with open(args.save, "w") as file:
+            json.dump(results, file, indent=2)
+        print(f"\nSaved results to {args.save}")
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = find_regressions(results, json.load(file))
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) against {args.baseline}:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print(f"\nNo regressions against {args.baseline} (tolerance {TOLERANCE:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--save", help="Write results to this JSON file")
+    parser.add_argument("--baseline", help="Compare against results saved earlier")
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,316 @@
+"""
+Benchmark: warnings table layout and archive
+Builds the same warning history twice at 1M, 10M and 50M rows: in the old
+layout (one `warnings` table with the (guild_id, user_id, id) index, schema
+version 6) and in the new one (the last year in `warnings`, with the
+same index plus one on `date`, everything older in the clustered
+`warnings_archive`). Then times the helpers /get_data relies on for random
+offenders, once right after dropping the database file from the OS page
+cache and once warm, and checks both layouts return the same rows. At the
+smallest size it also migrates a copy of the old layout and times
+`archive_warnings` on it.
+
+    python -m benchmarks.bench_warning_archive [--rows 1000000,10000000] [--dir /big/disk]
+
+The 50M databases take about 10 GB of disk and several minutes to build.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+from benchmarks.fakes import FakeSQLiteConnection
+from cogs.utils.db import MIGRATIONS, archive_warnings, get_user_warnings, get_warning_count, get_warnings_page, run_migrations
+
+GUILDS = 5000
+WARNINGS_PER_OFFENDER = 20  # on average
+HISTORY_DAYS = 5 * 365
+ARCHIVE_AFTER_DAYS = 365
+QUERIES = 500
+PAGE_SIZE = 10
+REASONS = [f"Rule {n}: {text}" for n, text in enumerate(
+    ("spam", "slurs", "NSFW in general", "raid participation", "ban evasion", "advertising",
+     "impersonating staff", "harassment", "off-topic flooding", "scam links"), 1
+)]
+
+# The warning helpers as they were before the archive (schema version 6)
+OLD_COUNT = "SELECT COUNT(*) FROM warnings WHERE guild_id = ? AND user_id = ?"
+OLD_HISTORY = (
+    "SELECT id, moderator_id, reason, date FROM warnings "
+    "WHERE guild_id = ? AND user_id = ? ORDER BY id DESC"
+)
+OLD_PAGE = (
+    "SELECT total.count, page.id, page.moderator_id, page.reason, page.date "
+    "FROM (SELECT COUNT(*) AS count FROM warnings WHERE guild_id = ? AND user_id = ?) AS total "
+    "LEFT JOIN (SELECT id, moderator_id, reason, date FROM warnings WHERE guild_id = ? AND user_id = ? "
+    "AND id < ? ORDER BY id DESC LIMIT ?) AS page ON 1 = 1 "
+    "ORDER BY page.id DESC"
+)
+
+
+def offender(n):
+    # Every offender belongs to one guild
+    return 10**17 + n % GUILDS, 2 * 10**17 + n
+
+
+def generate(rows, now):
+    """Warnings in id order, spread evenly over HISTORY_DAYS up to `now`."""
+    rng = random.Random(25)
+    offenders = max(1, rows // WARNINGS_PER_OFFENDER)
+    start = now - timedelta(days=HISTORY_DAYS)
+    step = HISTORY_DAYS * 86400 / rows
+    for index in range(rows):
+        guild_id, user_id = offender(rng.randrange(offenders))
+        date = (start + timedelta(seconds=index * step)).strftime("%Y-%m-%d %H:%M:%S")
+        yield guild_id, user_id, 3 * 10**17 + rng.randrange(2000), REASONS[index % len(REASONS)], date
+
+
+def open_for_build(path):
+    db = sqlite3.connect(path, isolation_level=None)
+    db.execute("PRAGMA journal_mode = OFF")
+    db.execute("PRAGMA synchronous = OFF")
+    db.execute("PRAGMA cache_size = -1000000")  # 1 GB, for index builds and the sort
+    return db
+
+
+def build_old(path, rows, now):
+    db = open_for_build(path)
+    for statement in MIGRATIONS[0]:
+        db.execute(statement)
+    db.execute("BEGIN")
+    db.executemany(
+        "INSERT INTO warnings (guild_id, user_id, moderator_id, reason, date) VALUES (?, ?, ?, ?, ?)",
+        generate(rows, now)
+    )
+    db.execute("COMMIT")
+    # Index built after loading, which ends up the same as building it as we go
+    for statements in MIGRATIONS[1:6]:
+        for statement in statements:
+            db.execute(statement)
+    db.execute("PRAGMA user_version = 6")
+    db.close()
+
+
+def build_new(path, old_path, cutoff):
+    """The new layout as migration 7 plus archive_warnings leave it, built by copying the old one."""
+    db = open_for_build(path)
+    for statements in MIGRATIONS:
+        for statement in statements:
+            db.execute(statement)
+    db.execute(f"PRAGMA user_version = {len(MIGRATIONS)}")
+    # Indexes on warnings are built after loading, as in build_old
+    db.execute("DROP INDEX idx_warnings_guild_user_id")
+    db.execute("DROP INDEX idx_warnings_date")
+    db.execute("ATTACH DATABASE ? AS old", (old_path,))
+    db.execute("BEGIN")
+    # Sorted in one pass instead of inserting 40M rows into the clustered table in id order
+    db.execute(
+        "INSERT INTO warnings_archive (guild_id, user_id, id, moderator_id, reason, date) "
+        "SELECT guild_id, user_id, id, moderator_id, reason, date FROM old.warnings "
+        "WHERE date < ? ORDER BY +guild_id, +user_id, +id",
+        (cutoff,)
+    )
+    db.execute(
+        "INSERT INTO warnings (id, guild_id, user_id, moderator_id, reason, date) "
+        "SELECT id, guild_id, user_id, moderator_id, reason, date FROM old.warnings "
+        "WHERE date >= ? ORDER BY id",
+        (cutoff,)
+    )
+    db.execute("COMMIT")
+    db.execute("DETACH DATABASE old")
+    for statements in MIGRATIONS:
+        for statement in statements:
+            db.execute(statement)
+    db.close()
+
+
+def drop_from_page_cache(path):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+    finally:
+        os.close(fd)
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def sample(rows):
+    rng = random.Random(7)
+    offenders = max(1, rows // WARNINGS_PER_OFFENDER)
+    return [offender(rng.randrange(offenders)) for _ in range(QUERIES)]
+
+
+async def time_old(conn, users, archived_before):
+    timings = {"first page": [], "count": [], "full history": [], "archived page": []}
+    results = []
+    for guild_id, user_id in users:
+        started = time.perf_counter()
+        cursor = await conn.execute(OLD_PAGE, (guild_id, user_id, guild_id, user_id, 2**63 - 1, PAGE_SIZE))
+        page = await cursor.fetchall()
+        timings["first page"].append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        cursor = await conn.execute(OLD_COUNT, (guild_id, user_id))
+        count = (await cursor.fetchone())[0]
+        timings["count"].append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        cursor = await conn.execute(OLD_HISTORY, (guild_id, user_id))
+        history = [tuple(row) for row in await cursor.fetchall()]
+        timings["full history"].append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        cursor = await conn.execute(OLD_PAGE, (guild_id, user_id, guild_id, user_id, archived_before, PAGE_SIZE))
+        archived = await cursor.fetchall()
+        timings["archived page"].append(time.perf_counter() - started)
+
+        results.append((
+            [tuple(row[1:]) for row in page if row[1] is not None], count, history,
+            [tuple(row[1:]) for row in archived if row[1] is not None],
+        ))
+    return timings, results
+
+
+async def time_new(conn, users, archived_before):
+    timings = {"first page": [], "count": [], "full history": [], "archived page": []}
+    results = []
+    for guild_id, user_id in users:
+        started = time.perf_counter()
+        page, _ = await get_warnings_page(conn, guild_id, user_id, limit=PAGE_SIZE)
+        timings["first page"].append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        count = await get_warning_count(conn, guild_id, user_id)
+        timings["count"].append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        history = await get_user_warnings(conn, guild_id, user_id)
+        timings["full history"].append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        archived, _ = await get_warnings_page(conn, guild_id, user_id, limit=PAGE_SIZE, before_id=archived_before)
+        timings["archived page"].append(time.perf_counter() - started)
+
+        results.append((page, count, history, archived))
+    return timings, results
+
+
+async def measure(path, timer, users, archived_before):
+    """Cold pass (file dropped from the page cache), then a warm pass over the same users."""
+    drop_from_page_cache(path)
+    conn = FakeSQLiteConnection(path)
+    try:
+        cold, results = await timer(conn, users, archived_before)
+        warm, _ = await timer(conn, users, archived_before)
+    finally:
+        await conn.close()
+    return cold, warm, results
+
+
+async def migrate_and_archive(old_path, tmp):
+    """Migrate a copy of the old layout and archive it with the real helper."""
+    path = os.path.join(tmp, "migrated.db")
+    shutil.copyfile(old_path, path)
+    conn = FakeSQLiteConnection(path)
+    try:
+        started = time.perf_counter()
+        await run_migrations(conn)
+        migrated = time.perf_counter() - started
+        started = time.perf_counter()
+        archived = await archive_warnings(conn, older_than_days=ARCHIVE_AFTER_DAYS)
+        elapsed = time.perf_counter() - started
+    finally:
+        await conn.close()
+
+    # No row lost or duplicated, and every archived warning older than every remaining one
+    db = sqlite3.connect(path)
+    try:
+        hot = db.execute("SELECT COUNT(*), TOTAL(id), MIN(date) FROM warnings").fetchone()
+        cold = db.execute("SELECT COUNT(*), TOTAL(id), MAX(date) FROM warnings_archive").fetchone()
+        db.execute("ATTACH DATABASE ? AS old", (old_path,))
+        before = db.execute("SELECT COUNT(*), TOTAL(id) FROM old.warnings").fetchone()
+    finally:
+        db.close()
+    consistent = (hot[0] + cold[0], hot[1] + cold[1]) == tuple(before) and cold[0] == archived and cold[2] < hot[2]
+    os.remove(path)
+    return migrated, archived, elapsed, consistent
+
+
+def ms(values):
+    return f"{percentile(values, 0.5) * 1000:7.2f} {percentile(values, 0.95) * 1000:7.2f}"
+
+
+async def run(rows, tmp, first):
+    now = datetime.now(timezone.utc)
+    cutoff = (now - timedelta(days=ARCHIVE_AFTER_DAYS)).strftime("%Y-%m-%d %H:%M:%S")
+    old_path = os.path.join(tmp, f"old-{rows}.db")
+    new_path = os.path.join(tmp, f"new-{rows}.db")
+
+    started = time.perf_counter()
+    build_old(old_path, rows, now)
+    old_build = time.perf_counter() - started
+    started = time.perf_counter()
+    build_new(new_path, old_path, cutoff)
+    new_build = time.perf_counter() - started
+
+    db = sqlite3.connect(new_path)
+    hot, archived_rows = (db.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] for table in ("warnings", "warnings_archive"))
+    db.close()
+    # A page from two years ago, where every row is archived
+    archived_before = int(rows * (HISTORY_DAYS - 2 * 365) / HISTORY_DAYS)
+
+    print(
+        f"\n{rows:,} warnings ({hot:,} in warnings, {archived_rows:,} archived); built in "
+        f"{old_build:.0f}s / {new_build:.0f}s; on disk {os.path.getsize(old_path) / 2**20:,.0f} MiB (old) vs "
+        f"{os.path.getsize(new_path) / 2**20:,.0f} MiB (new)"
+    )
+    users = sample(rows)
+    old_cold, old_warm, old_results = await measure(old_path, time_old, users, archived_before)
+    new_cold, new_warm, new_results = await measure(new_path, time_new, users, archived_before)
+    mismatches = sum(1 for old, new in zip(old_results, new_results) if old != new)
+
+    print(f"{'ms, p50 p95':<16} {'old cold':>15} {'new cold':>15} {'old warm':>15} {'new warm':>15}")
+    for name in old_cold:
+        print(
+            f"{name:<16} {ms(old_cold[name])} {ms(new_cold[name])} "
+            f"{ms(old_warm[name])} {ms(new_warm[name])}"
+        )
+    print(f"results differing between layouts: {mismatches}/{len(users)}")
+
+    if first:
+        migrated, archived, elapsed, consistent = await migrate_and_archive(old_path, tmp)
+        print(
+            f"migration 7 on the old layout: {migrated:.1f}s; archive_warnings moved {archived:,} rows in "
+            f"{elapsed:.1f}s ({archived / elapsed:,.0f} rows/s); no rows lost and archive older than the rest: {consistent}"
+        )
+    os.remove(old_path)
+    os.remove(new_path)
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", default="1000000,10000000,50000000", help="comma-separated table sizes")
+    parser.add_argument("--dir", default=None, help="where to build the databases")
+    args = parser.parse_args()
+    sizes = [int(size) for size in args.rows.split(",")]
+
+    print(
+        f"{GUILDS:,} guilds, about {WARNINGS_PER_OFFENDER} warnings per offender over {HISTORY_DAYS // 365} years, "
+        f"archived after {ARCHIVE_AFTER_DAYS} days; {QUERIES} random offenders per pass, {PAGE_SIZE} per page"
+    )
+    with tempfile.TemporaryDirectory(dir=args.dir) as tmp:
+        for index, rows in enumerate(sizes):
+            await run(rows, tmp, index == 0)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
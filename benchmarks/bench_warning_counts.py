@@ -0,0 +1,240 @@
+"""
+Benchmark: warning count cache
+Database statements and time for an add_data/get_data/delete traffic mix
+with and without `WarningCountCache`, memory per cached count at 1M
+entries, a count read racing a write, and drift detection after warnings
+are deleted behind the cache's back.
+
+    python -m benchmarks.bench_warning_counts
+"""
+
+import asyncio
+import gc
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.fakes import FakeCursor, FakeSQLiteConnection
+from cogs.utils.db import (
+    add_warning,
+    clear_warnings,
+    create_tables,
+    delete_warning,
+    get_warning_count,
+    get_warnings_page,
+)
+from cogs.utils.warning_counts import ENTRY_BYTES, WarningCountCache
+
+COMMANDS = 5000
+USERS = 2000
+GUILDS = 20
+LATENCY = 0.0005
+PAGE_SIZE = 10
+SEEDED_WARNINGS = 3
+
+# (command, share of traffic); add_data and delete also read the count back
+MIX = (
+    ("add_data", 0.30),
+    ("get_data", 0.60),
+    ("delete", 0.08),
+    ("clear", 0.02),
+)
+
+MEMORY_ENTRIES = 1_000_000
+DRIFTED_USERS = 50
+
+
+async def seed(connection):
+    rows = [
+        (guild_id, user_id, 99, "seed", "2024-01-01 00:00:00")
+        for guild_id in range(GUILDS)
+        for user_id in range(USERS // GUILDS)
+        for _ in range(SEEDED_WARNINGS)
+    ]
+    await connection.executemany(
+        "INSERT INTO warnings (guild_id, user_id, moderator_id, reason, date) VALUES (?, ?, ?, ?, ?)",
+        rows
+    )
+
+
+class SlowReplyConnection(FakeSQLiteConnection):
+    """Runs a statement at once but takes `latency` seconds to return it."""
+
+    async def execute(self, sql, parameters=()):
+        cursor = FakeCursor(self._db.execute(sql, parameters))
+        await asyncio.sleep(self.latency)
+        return cursor
+
+
+def count_queries(connection):
+    """Count the COUNT(*) queries run on `connection`."""
+    counter = {"queries": 0}
+
+    def trace(statement):
+        if "COUNT(*)" in statement:
+            counter["queries"] += 1
+
+    connection._db.set_trace_callback(trace)
+    return counter
+
+
+async def traffic(connection, cache):
+    rng = random.Random(22)
+    commands, weights = zip(*MIX)
+    per_guild = USERS // GUILDS
+    warning_ids = {}
+    counter = count_queries(connection)
+    before = connection.statements
+    start = time.perf_counter()
+
+    for _ in range(COMMANDS):
+        command = rng.choices(commands, weights)[0]
+        guild_id = rng.randrange(GUILDS)
+        # Skewed: a few users in each guild draw most of the attention
+        user_id = min(int(rng.paretovariate(1.2)) - 1, per_guild - 1)
+        if command == "add_data":
+            warning_id = await add_warning(connection, guild_id, user_id, 99, "bench", cache=cache)
+            warning_ids.setdefault((guild_id, user_id), []).append(warning_id)
+            await get_warning_count(connection, guild_id, user_id, cache=cache)
+        elif command == "get_data":
+            await get_warnings_page(connection, guild_id, user_id, limit=PAGE_SIZE, cache=cache)
+        elif command == "delete":
+            ids = warning_ids.get((guild_id, user_id))
+            if ids:
+                await delete_warning(connection, guild_id, ids.pop(), cache=cache)
+            await get_warning_count(connection, guild_id, user_id, cache=cache)
+        else:
+            await clear_warnings(connection, guild_id, user_id, cache=cache)
+            warning_ids.pop((guild_id, user_id), None)
+
+    return time.perf_counter() - start, connection.statements - before, counter["queries"]
+
+
+async def mismatches(connection, cache):
+    """Cached counts that differ from the database; must be 0."""
+    wrong = 0
+    for key in list(cache._counts):
+        guild_id, user_id = key >> 64, key & 0xFFFFFFFFFFFFFFFF
+        cursor = await connection.execute(
+            "SELECT COUNT(*) FROM warnings WHERE guild_id = ? AND user_id = ?", (guild_id, user_id)
+        )
+        if (await cursor.fetchone())[0] != cache._counts[key]:
+            wrong += 1
+    return wrong
+
+
+def memory_per_entry():
+    cache = WarningCountCache(max_bytes=10 * MEMORY_ENTRIES * ENTRY_BYTES)
+    rng = random.Random(5)
+    guild_ids = [rng.randrange(10**17, 10**18) for _ in range(1000)]
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for i in range(MEMORY_ENTRIES):
+        cache.set(guild_ids[i % 1000], 10**17 + i * 7919, i % 20)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return (after - before) / MEMORY_ENTRIES
+
+
+def bounded():
+    cache = WarningCountCache(max_bytes=1 * 2**20)
+    for i in range(100_000):
+        cache.set(1, i, 1)
+    return cache.stats()
+
+
+async def race(path):
+    """
+    A count read whose reply arrives after a write committed must not
+    cache the older count.
+    """
+    writer = FakeSQLiteConnection(path)
+    # WAL, so the reader's open statement doesn't block the write
+    await writer.execute("PRAGMA journal_mode=WAL")
+    await create_tables(writer)
+    reader = SlowReplyConnection(path, 0.05)
+    cache = WarningCountCache()
+    await add_warning(writer, 1, 1, 99, "first")
+
+    read = asyncio.create_task(get_warning_count(reader, 1, 1, cache=cache))
+    await asyncio.sleep(0.01)  # the read has run and its reply is on the way
+    await add_warning(writer, 1, 1, 99, "second", cache=cache)
+    loaded = await read
+
+    cached = cache.get(1, 1)
+    actual = await get_warning_count(writer, 1, 1)
+    await reader.close()
+    await writer.close()
+    return loaded, cached, actual, cache.discarded_loads
+
+
+async def drift(connection, cache):
+    """Delete warnings by hand (the cache doesn't see it), then verify."""
+    keys = list(cache._counts)
+    rng = random.Random(8)
+    targets = [key for key in keys if cache._counts[key] > 0]
+    targets = rng.sample(targets, min(DRIFTED_USERS, len(targets)))
+    for key in targets:
+        guild_id, user_id = key >> 64, key & 0xFFFFFFFFFFFFFFFF
+        await connection.execute(
+            "DELETE FROM warnings WHERE id = (SELECT MAX(id) FROM warnings WHERE guild_id = ? AND user_id = ?)",
+            (guild_id, user_id)
+        )
+    first = await cache.verify(connection, sample_size=len(cache))
+    second = await cache.verify(connection, sample_size=len(cache))
+    return len(targets), first, second
+
+
+async def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        results = {}
+        for name, cache in (("no cache", None), ("WarningCountCache", WarningCountCache())):
+            connection = FakeSQLiteConnection(os.path.join(tmp, f"{len(results)}.db"), LATENCY)
+            await create_tables(connection)
+            await seed(connection)
+            elapsed, statements, counts = await traffic(connection, cache)
+            results[name] = (elapsed, statements, counts, connection, cache)
+
+        print(f"{COMMANDS} commands {dict(MIX)} over {USERS} users, {LATENCY * 1000:.1f}ms per statement\n")
+        print(f"{'':<18} {'statements':>10} {'COUNT(*) queries':>16} {'time':>7}")
+        for name, (elapsed, statements, counts, _, _) in results.items():
+            print(f"{name:<18} {statements:10} {counts:16} {elapsed:6.2f}s")
+
+        _, _, _, connection, cache = results["WarningCountCache"]
+        stats = cache.stats()
+        print(
+            f"\ncache: {stats['entries']} counts, hit ratio {stats['hit_ratio']:.1%}, "
+            f"{stats['updates']} in-place updates, cached counts that differ from the database: "
+            f"{await mismatches(connection, cache)}"
+        )
+
+        per_entry = memory_per_entry()
+        print(
+            f"\nmemory: {per_entry:.0f} bytes per cached count at {MEMORY_ENTRIES:,} entries "
+            f"(ENTRY_BYTES = {ENTRY_BYTES}), {per_entry * MEMORY_ENTRIES / 2**20:.0f} MiB"
+        )
+        stats = bounded()
+        print(
+            f"bounded: 1 MiB limit -> {stats['entries']:,} entries kept (max {stats['max_entries']:,}), "
+            f"{stats['evictions']:,} evicted"
+        )
+
+        loaded, cached, actual, discarded = await race(os.path.join(tmp, "race.db"))
+        print(
+            f"\nrace: read returned {loaded} after a write made it {actual}; "
+            f"cached afterwards: {cached} ({discarded} stale load discarded)"
+        )
+
+        drifted, first, second = await drift(connection, cache)
+        print(f"\ndrift: {drifted} warnings deleted by hand")
+        print(f"  verify  : {first['checked']} checked, {first['drifted']} drifted (repaired)")
+        print(f"  re-verify: {second['checked']} checked, {second['drifted']} drifted")
+        for _, _, _, conn, _ in results.values():
+            await conn.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,95 @@
+"""
+Benchmark: add_warning per call vs WarningWriteQueue
+Raid-style burst of warnings (add + count, as in /add_data), then a
+simulated crash check: every acknowledged warning must be on disk.
+
+    python -m benchmarks.bench_warning_queue
+"""
+
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+from benchmarks.fakes import FakeSQLiteConnection
+from cogs.utils.db import add_warning, create_tables, get_warning_count
+from cogs.utils.warning_queue import WarningWriteQueue
+
+WARNINGS = 2000
+TARGETS = 50
+LATENCY = 0.001
+
+
+async def burst(add, count):
+    rng = random.Random(1)
+
+    async def command(i):
+        user_id = rng.randrange(TARGETS)
+        warning_id = await add(1, user_id, 99, f"raid #{i}")
+        await count(1, user_id)
+        return warning_id
+
+    start = time.perf_counter()
+    ids = await asyncio.gather(*(command(i) for i in range(WARNINGS)))
+    return time.perf_counter() - start, ids
+
+
+async def crash_check(path):
+    connection = FakeSQLiteConnection(path, LATENCY)
+    await create_tables(connection)
+    queue = WarningWriteQueue(connection, max_batch=50, max_delay=0.01)
+
+    acknowledged = []
+
+    async def command(i):
+        warning_id = await queue.add_warning(2, i % TARGETS, 99, "crash test")
+        acknowledged.append(warning_id)
+
+    tasks = [asyncio.create_task(command(i)) for i in range(WARNINGS)]
+    while len(acknowledged) < WARNINGS // 2:
+        await asyncio.sleep(0.001)
+
+    # Crash: drop everything in flight without flushing, then reopen the database
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await connection.close()
+
+    reopened = FakeSQLiteConnection(path)
+    cursor = await reopened.execute("SELECT id FROM warnings WHERE guild_id = 2")
+    on_disk = {row[0] for row in await cursor.fetchall()}
+    await reopened.close()
+
+    lost = [warning_id for warning_id in acknowledged if warning_id not in on_disk]
+    return len(acknowledged), len(on_disk), len(lost)
+
+
+async def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        connection = FakeSQLiteConnection(os.path.join(tmp, "direct.db"), LATENCY)
+        await create_tables(connection)
+        elapsed, _ = await burst(
+            lambda *args: add_warning(connection, *args),
+            lambda *args: get_warning_count(connection, *args)
+        )
+        print(f"per-call add_warning : {WARNINGS / elapsed:8.0f} warnings/s, {connection.statements} statements")
+
+        connection = FakeSQLiteConnection(os.path.join(tmp, "queued.db"), LATENCY)
+        await create_tables(connection)
+        queue = WarningWriteQueue(connection)
+        elapsed, ids = await burst(queue.add_warning, queue.get_warning_count)
+        await queue.close()
+        stats = queue.stats()
+        assert len(set(ids)) == WARNINGS and None not in ids
+        print(
+            f"WarningWriteQueue    : {WARNINGS / elapsed:8.0f} warnings/s, {connection.statements} statements, "
+            f"avg batch {stats['avg_batch_size']:.1f}, count cache hits {stats['count_hits']}/{WARNINGS}"
+        )
+
+        acknowledged, on_disk, lost = await crash_check(os.path.join(tmp, "crash.db"))
+        print(f"crash check          : {acknowledged} acknowledged, {on_disk} on disk, {lost} acknowledged but lost")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
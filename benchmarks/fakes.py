@@ -0,0 +1,328 @@
+"""
+In-process stand-ins used by the benchmarks.
+Nothing here talks to Discord or a real database server.
+"""
+
+import asyncio
+import random
+import sqlite3
+import time
+from collections import deque
+
+
+class FakeCursor:
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self.lastrowid = cursor.lastrowid
+        self.rowcount = cursor.rowcount
+
+    async def fetchone(self):
+        return self._cursor.fetchone()
+
+    async def fetchall(self):
+        return self._cursor.fetchall()
+
+
+class FakeSQLiteConnection:
+    """
+    aiosqlite-style async connection backed by the standard sqlite3 module.
+
+    Like a real database connection it only runs one statement at a time,
+    and `latency` seconds are added to every statement to simulate the
+    network round trip to a database server.
+    """
+
+    def __init__(self, path, latency=0.0):
+        # Autocommit, so no lock is held across an await between connections
+        self._db = sqlite3.connect(
+            path,
+            uri=path.startswith("file:"),
+            check_same_thread=False,
+            isolation_level=None
+        )
+        self._lock = asyncio.Lock()
+        self.latency = latency
+        self.statements = 0
+
+    async def _run(self, method, *args):
+        async with self._lock:
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            self.statements += 1
+            return method(*args)
+
+    async def execute(self, sql, parameters=()):
+        return FakeCursor(await self._run(self._db.execute, sql, parameters))
+
+    async def executemany(self, sql, parameters):
+        return FakeCursor(await self._run(self._db.executemany, sql, parameters))
+
+    async def executescript(self, script):
+        return FakeCursor(await self._run(self._db.executescript, script))
+
+    async def commit(self):
+        await self._run(self._db.commit)
+
+    async def rollback(self):
+        await self._run(self._db.rollback)
+
+    async def close(self):
+        self._db.close()
+
+
+def sqlite_connector(path, latency=0.0):
+    """Return a `connect` callable suitable for ConnectionPool."""
+    async def connect():
+        return FakeSQLiteConnection(path, latency)
+    return connect
+
+
+class FakeHTTPError(Exception):
+    """Carries `status` like nextcord.HTTPException (plus `retry_after` on a 429)."""
+
+    def __init__(self, status, retry_after=None):
+        super().__init__(f"HTTP {status}")
+        self.status = status
+        self.retry_after = retry_after
+
+
+class FakeDiscordHTTP:
+    """
+    DM endpoint that enforces Discord-style rate limits.
+
+    Requests over the global limit or a channel's limit get a 429 instead
+    of being delivered. Users in `closed_dms` answer with a 403, and
+    `error_rate` of all other requests fail with a 500.
+    """
+
+    def __init__(
+        self,
+        global_rate=50,
+        global_per=1.0,
+        route_rate=5,
+        route_per=5.0,
+        latency=0.02,
+        closed_dms=(),
+        error_rate=0.0,
+        seed=1
+    ):
+        self.global_rate = global_rate
+        self.global_per = global_per
+        self.route_rate = route_rate
+        self.route_per = route_per
+        self.latency = latency
+        self.closed_dms = set(closed_dms)
+        self.error_rate = error_rate
+        self._rng = random.Random(seed)
+        self._global = deque()
+        self._routes = {}
+
+        self.requests = 0
+        self.rate_limited = 0
+        self.delivered = []  # (user_id, content kwargs, monotonic time)
+
+    def user(self, user_id):
+        return FakeDMUser(self, user_id)
+
+    @staticmethod
+    def _over_limit(window, rate, per, now):
+        while window and window[0] <= now - per:
+            window.popleft()
+        if len(window) >= rate:
+            return window[0] + per - now
+        return None
+
+    async def post_dm(self, user_id, kwargs):
+        self.requests += 1
+        now = time.monotonic()
+        route = self._routes.setdefault(user_id, deque())
+        retry_after = self._over_limit(self._global, self.global_rate, self.global_per, now)
+        if retry_after is None:
+            retry_after = self._over_limit(route, self.route_rate, self.route_per, now)
+        if retry_after is not None:
+            self.rate_limited += 1
+            raise FakeHTTPError(429, retry_after)
+        self._global.append(now)
+        route.append(now)
+
+        await asyncio.sleep(self.latency)
+        if user_id in self.closed_dms:
+            raise FakeHTTPError(403)
+        if self._rng.random() < self.error_rate:
+            raise FakeHTTPError(500)
+        self.delivered.append((user_id, kwargs, time.monotonic()))
+
+
+class FakeDMUser:
+    def __init__(self, http, user_id):
+        self._http = http
+        self.id = user_id
+
+    async def send(self, **kwargs):
+        await self._http.post_dm(self.id, kwargs)
+
+
+class FakePermissions:
+    def __init__(self, manage_messages=True):
+        self.manage_messages = manage_messages
+
+
+class FakeMember:
+    """
+    Stand-in for nextcord.Member. `top_role` is a plain int, which
+    compares the same way roles do.
+    """
+
+    def __init__(self, user_id, name=None, top_role=1, manage_messages=False, http=None):
+        self.id = user_id
+        self.name = name or f"user{user_id}"
+        self.mention = f"<@{user_id}>"
+        self.top_role = top_role
+        self.guild_permissions = FakePermissions(manage_messages)
+        self._http = http
+
+    async def send(self, **kwargs):
+        # DMs go through a FakeDiscordHTTP when one is attached
+        if self._http is not None:
+            await self._http.post_dm(self.id, kwargs)
+
+
+class FakeGuild:
+    def __init__(self, guild_id, me, name=None):
+        self.id = guild_id
+        self.name = name or f"guild{guild_id}"
+        self.me = me
+        self._members = {}
+
+    def get_member(self, user_id):
+        return self._members.get(user_id)
+
+
+class FakeCommand:
+    def __init__(self, name):
+        self.name = name
+        self.qualified_name = name
+
+
+class FakeMessage:
+    def __init__(self, latency):
+        self._latency = latency
+        self.edits = 0
+
+    async def edit(self, **kwargs):
+        await asyncio.sleep(self._latency)
+        self.edits += 1
+
+
+class FakeInteractionResponse:
+    def __init__(self, interaction):
+        self._interaction = interaction
+        self._done = False
+
+    def is_done(self):
+        return self._done
+
+    async def defer(self, ephemeral=False):
+        self._done = True
+        await asyncio.sleep(self._interaction.latency)
+
+
+class FakeInteraction:
+    """
+    Stand-in for nextcord.Interaction. Every response takes `latency`
+    seconds, like a REST round trip. Sent messages are kept in `sent`
+    (content, embed) so callers can check what a command answered.
+    """
+
+    def __init__(self, user, guild, command_name, latency=0.0):
+        self.user = user
+        self.guild = guild
+        self.application_command = FakeCommand(command_name)
+        self.latency = latency
+        self.response = FakeInteractionResponse(self)
+        self.sent = []
+
+    async def send(self, content=None, embed=None, **kwargs):
+        self.response._done = True
+        await asyncio.sleep(self.latency)
+        self.sent.append((content, embed))
+        return FakeMessage(self.latency)
+
+
+class FakeBot:
+    """
+    The parts of the bot the cog templates use, with simulated latencies.
+
+    `maybe_send_ad` shows an ad on `ad_rate` of calls, taking
+    `ad_latency` seconds to pick it before sending; `prepare_ad` and
+    `post_ad` split the same thing into the pick and the send. `fetch_user` takes `fetch_latency`
+    seconds; `gateway_hit_rate` of `get_user` calls find the user in the
+    (simulated) gateway cache.
+
+    Args:
+        blacklist: BlacklistStore (or anything with `in` and `get_reason`)
+        connection: Connection or ConnectionPool for the database helpers
+        expiry: ExpiryScheduler for the moderation template
+        dm_queue: DMQueue for the moderation template
+        warning_counts: WarningCountCache for the database template
+    """
+
+    def __init__(
+        self,
+        blacklist,
+        connection=None,
+        expiry=None,
+        dm_queue=None,
+        warning_counts=None,
+        ad_rate=0.2,
+        ad_latency=0.05,
+        fetch_latency=0.05,
+        gateway_hit_rate=0.5,
+        seed=1
+    ):
+        self.blacklist = blacklist
+        self.connection = connection
+        self.expiry = expiry
+        self.dm_queue = dm_queue
+        self.warning_counts = warning_counts
+        self.user = FakeMember(1, "Ryujin", top_role=100, manage_messages=True)
+        self.ad_rate = ad_rate
+        self.ad_latency = ad_latency
+        self.fetch_latency = fetch_latency
+        self.gateway_hit_rate = gateway_hit_rate
+        self._rng = random.Random(seed)
+        self._guilds = {}
+
+        self.ads_sent = 0
+        self.fetches = 0
+
+    def add_guild(self, guild):
+        self._guilds[guild.id] = guild
+
+    def get_guild(self, guild_id):
+        return self._guilds.get(guild_id)
+
+    def get_user(self, user_id):
+        if self._rng.random() < self.gateway_hit_rate:
+            return FakeMember(user_id)
+        return None
+
+    async def fetch_user(self, user_id):
+        self.fetches += 1
+        await asyncio.sleep(self.fetch_latency)
+        return FakeMember(user_id)
+
+    async def maybe_send_ad(self, interaction):
+        ad = await self.prepare_ad(interaction)
+        await self.post_ad(interaction, ad)
+
+    async def prepare_ad(self, interaction):
+        if self._rng.random() < self.ad_rate:
+            await asyncio.sleep(self.ad_latency)
+            return "ad"
+        return None
+
+    async def post_ad(self, interaction, ad):
+        if ad is not None:
+            self.ads_sent += 1
+            await interaction.send(ad)
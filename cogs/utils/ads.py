@@ -0,0 +1,255 @@
+"""
+Ad Tracker for Ryujin Bot
+In-memory ad frequency state behind `bot.maybe_send_ad`.
+"""
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+
+from cogs.utils.db import get_ad_states, save_ad_states
+
+log = logging.getLogger(__name__)
+
+
+class _AdState:
+    __slots__ = ("last_shown", "commands_since", "shown_count", "last_seen", "unsaved_shows")
+
+    def __init__(self, last_shown=0, commands_since=0, shown_count=0, last_seen=0):
+        self.last_shown = last_shown
+        self.commands_since = commands_since
+        self.shown_count = shown_count
+        self.last_seen = last_seen
+        self.unsaved_shows = 0  # ads shown since the last successful flush
+
+    def row(self, user_id):
+        # shown_count is written as a delta (see save_ad_states), so a user
+        # recreated after eviction adds to the stored total instead of
+        # replacing it
+        return (user_id, self.last_shown, self.commands_since, self.unsaved_shows, self.last_seen)
+
+
+class AdTracker:
+    """
+    Decides whether a command should be followed by an ad.
+
+    Every decision is made from memory: per-user state (last time an ad was
+    shown, commands since then, total ads shown) lives in a size-bounded
+    LRU, and users idle for longer than `ttl` are dropped. Changed state is
+    written to the `ad_state` table in batches by a background task, never
+    on the command path. A user that isn't in memory starts fresh, which is
+    the same answer the database would give once `ttl` has passed; their
+    stored total and last ad time are merged on the next flush, not
+    overwritten. Users evicted within `cooldown` of their last ad keep that
+    time in a small side table, so eviction never skips the cooldown.
+
+    Usage:
+        bot.ads = await AdTracker(bot.connection).load()
+        bot.ads.start_flush(interval=5)
+
+        async def maybe_send_ad(self, interaction):
+            if not self.ads.should_show(interaction.user.id):
+                return
+            await interaction.send(embed=ad_embed)
+
+        # The split used by ResponsePipeline (cogs/utils/responses.py)
+        async def prepare_ad(self, interaction):
+            # Runs alongside the command, so it must not change any state
+            if self.ads.peek(interaction.user.id):
+                return await self.pick_ad()
+            return None
+
+        async def post_ad(self, interaction, ad):
+            # Only after a successful command; records it
+            if self.ads.should_show(interaction.user.id):
+                await interaction.send(embed=ad or await self.pick_ad())
+
+    Args:
+        connection: `bot.connection`, or None to keep state in memory only
+        every_commands: Commands a user must run between two ads
+        cooldown: Minimum seconds between two ads for the same user
+        max_size: Users kept in memory
+        ttl: Seconds of inactivity after which a user's state is dropped
+        flush_batch: Rows per write transaction
+    """
+
+    def __init__(
+        self,
+        connection=None,
+        every_commands=5,
+        cooldown=1800,
+        max_size=100000,
+        ttl=86400,
+        flush_batch=1000
+    ):
+        self.connection = connection
+        self.every_commands = every_commands
+        self.cooldown = cooldown
+        self.max_size = max_size
+        self.ttl = ttl
+        self.flush_batch = flush_batch
+
+        self._states = OrderedDict()  # user_id -> _AdState, least recently seen first
+        self._dirty = {}              # user_id -> _AdState changed since the last flush
+        self._cooling = OrderedDict() # evicted user_id -> last_shown, while within cooldown
+        self._flush_lock = asyncio.Lock()
+        self._flush_task = None
+
+        # Metrics, see stats()
+        self.decisions = 0
+        self.shown = 0
+        self.new_users = 0
+        self.evictions = 0
+        self.rows_written = 0
+        self.failed_flushes = 0
+
+    async def load(self):
+        """Warm the cache with users active within `ttl`. Returns self."""
+        if self.connection is None:
+            return self
+
+        now = int(time.time())
+        rows = await get_ad_states(self.connection, now - self.ttl, limit=self.max_size)
+        # Rows come most recent first; insert oldest first to keep LRU order
+        for user_id, *values in reversed(rows):
+            self._states[user_id] = _AdState(*values)
+        log.info("Loaded ad state for %s users", len(rows))
+        return self
+
+    def should_show(self, user_id, now=None):
+        """
+        Record a command for `user_id` and return whether to show an ad.
+
+        A True result counts as the ad being shown. Pure memory, no I/O.
+        """
+        if now is None:
+            now = int(time.time())
+        self.decisions += 1
+
+        states = self._states
+        state = states.get(user_id)
+        if state is None or now - state.last_seen > self.ttl:
+            fresh = _AdState(last_shown=self._cooling.pop(user_id, 0))
+            if state is not None:
+                # Lifetime total and unflushed ads carry over
+                fresh.shown_count = state.shown_count
+                fresh.unsaved_shows = state.unsaved_shows
+            state = fresh
+            states[user_id] = state
+            self.new_users += 1
+            if len(states) > self.max_size:
+                self._evict(now)
+        else:
+            states.move_to_end(user_id)
+
+        state.last_seen = now
+        state.commands_since += 1
+        show = state.commands_since >= self.every_commands and now - state.last_shown >= self.cooldown
+        if show:
+            state.last_shown = now
+            state.commands_since = 0
+            state.shown_count += 1
+            state.unsaved_shows += 1
+            self.shown += 1
+
+        self._dirty[user_id] = state
+        return show
+
+    def peek(self, user_id, now=None):
+        """
+        Return what `should_show` would answer right now, without recording
+        anything. Pure memory, no I/O.
+        """
+        if now is None:
+            now = int(time.time())
+        state = self._states.get(user_id)
+        if state is None or now - state.last_seen > self.ttl:
+            commands_since, last_shown = 0, self._cooling.get(user_id, 0)
+        else:
+            commands_since, last_shown = state.commands_since, state.last_shown
+        return commands_since + 1 >= self.every_commands and now - last_shown >= self.cooldown
+
+    def _evict(self, now):
+        states = self._states
+        # Idle users first, then least recently seen until under max_size.
+        # Evicted state that is still dirty is written by the next flush.
+        cooling = self._cooling
+        while states:
+            user_id, state = next(iter(states.items()))
+            if len(states) <= self.max_size and now - state.last_seen <= self.ttl:
+                break
+            del states[user_id]
+            self.evictions += 1
+            if now - state.last_shown < self.cooldown:
+                cooling[user_id] = state.last_shown
+
+        # Roughly oldest first; anything left behind expires on a later pass
+        while cooling and now - next(iter(cooling.values())) >= self.cooldown:
+            cooling.popitem(last=False)
+
+    async def flush(self):
+        """Write all changed state to the database."""
+        if self.connection is None:
+            self._dirty.clear()
+            return
+
+        async with self._flush_lock:
+            self._evict(int(time.time()))
+            if not self._dirty:
+                return
+
+            dirty, self._dirty = self._dirty, {}
+            rows = [state.row(user_id) for user_id, state in dirty.items()]
+            for state in dirty.values():
+                state.unsaved_shows = 0
+            for start in range(0, len(rows), self.flush_batch):
+                batch = rows[start:start + self.flush_batch]
+                if await save_ad_states(self.connection, batch):
+                    self.rows_written += len(batch)
+                    continue
+
+                # Retry on the next flush, unless the user has changed since;
+                # the unwritten ads go back onto their state
+                self.failed_flushes += 1
+                for row in rows[start:]:
+                    dirty[row[0]].unsaved_shows += row[3]
+                    self._dirty.setdefault(row[0], dirty[row[0]])
+                break
+
+    async def _flush_loop(self, interval):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                log.error("Ad state flush failed: %s", e)
+
+    def start_flush(self, interval=5):
+        """Write changed state every `interval` seconds in the background."""
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_loop(interval))
+
+    async def close(self):
+        """Stop the background task and write what is left."""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            await asyncio.gather(self._flush_task, return_exceptions=True)
+            self._flush_task = None
+        await self.flush()
+
+    def __len__(self):
+        return len(self._states)
+
+    def stats(self):
+        return {
+            "users": len(self._states),
+            "dirty": len(self._dirty),
+            "decisions": self.decisions,
+            "shown": self.shown,
+            "new_users": self.new_users,
+            "evictions": self.evictions,
+            "cooling": len(self._cooling),
+            "rows_written": self.rows_written,
+            "failed_flushes": self.failed_flushes,
+        }
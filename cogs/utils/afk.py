@@ -0,0 +1,183 @@
+"""
+AFK Index for Ryujin Bot
+In-memory AFK statuses checked on every message.
+"""
+
+import asyncio
+import logging
+import time
+
+from cogs.utils.db import get_afk_statuses, save_afk_changes
+
+log = logging.getLogger(__name__)
+
+
+class AfkIndex:
+    """
+    Every AFK status, held in memory as guild_id -> {user_id: (reason, since)}.
+
+    `process_message` is called from `on_message`: it clears the author's
+    status if they were AFK and returns the mentioned users who are AFK,
+    with one dict lookup per mention and no database access. Guilds where
+    nobody is AFK cost a single lookup.
+
+    Changes are written behind: only the latest change per (guild, user)
+    is kept, and a background task saves them in one transaction.
+    `load()` warms the index on startup.
+
+    Usage:
+        bot.afk = await AfkIndex(bot.connection).load()
+        bot.afk.start_flush(interval=5)
+
+    Args:
+        connection: `bot.connection`, or None to keep statuses in memory only
+    """
+
+    def __init__(self, connection=None):
+        self.connection = connection
+
+        self._guilds = {}   # guild_id -> {user_id: (reason, since)}
+        self._pending = {}  # (guild_id, user_id) -> (reason, since), or None to delete
+        self._flush_lock = asyncio.Lock()
+        self._flush_task = None
+
+        # Metrics, see stats()
+        self.messages = 0
+        self.mention_lookups = 0
+        self.mention_hits = 0
+        self.auto_cleared = 0
+        self.rows_written = 0
+        self.failed_flushes = 0
+
+    async def load(self):
+        """Load every stored status. Returns self."""
+        if self.connection is None:
+            return self
+
+        rows = await get_afk_statuses(self.connection)
+        for guild_id, user_id, reason, since in rows:
+            self._guilds.setdefault(guild_id, {})[user_id] = (reason, since)
+        log.info("Loaded %s AFK statuses", len(rows))
+        return self
+
+    def set(self, guild_id, user_id, reason):
+        """Mark a user AFK. Returns the stored (reason, since) status."""
+        status = (reason, int(time.time()))
+        self._guilds.setdefault(guild_id, {})[user_id] = status
+        self._pending[(guild_id, user_id)] = status
+        return status
+
+    def clear(self, guild_id, user_id):
+        """Remove a user's AFK status. Returns the old status, or None."""
+        users = self._guilds.get(guild_id)
+        if not users:
+            return None
+        status = users.pop(user_id, None)
+        if status is None:
+            return None
+        if not users:
+            del self._guilds[guild_id]
+        self._pending[(guild_id, user_id)] = None
+        return status
+
+    def get(self, guild_id, user_id):
+        """Return a user's (reason, since) status, or None."""
+        users = self._guilds.get(guild_id)
+        return users.get(user_id) if users else None
+
+    def process_message(self, guild_id, author_id, mentioned_ids):
+        """
+        Handle one guild message.
+
+        Args:
+            guild_id: The message's guild
+            author_id: The message author
+            mentioned_ids: IDs mentioned in the message (`message.raw_mentions`)
+
+        Returns:
+            Tuple of (the author's cleared status or None,
+            list of (user_id, status) for mentioned users who are AFK)
+        """
+        self.messages += 1
+        users = self._guilds.get(guild_id)
+        if not users:
+            return None, []
+
+        returned = None
+        if author_id in users:
+            returned = self.clear(guild_id, author_id)
+            self.auto_cleared += 1
+            users = self._guilds.get(guild_id, {})
+
+        afk = []
+        for user_id in dict.fromkeys(mentioned_ids):
+            self.mention_lookups += 1
+            status = users.get(user_id)
+            if status is not None and user_id != author_id:
+                afk.append((user_id, status))
+        self.mention_hits += len(afk)
+        return returned, afk
+
+    def __len__(self):
+        return sum(len(users) for users in self._guilds.values())
+
+    async def flush(self):
+        """Write pending changes to the database."""
+        if self.connection is None:
+            self._pending.clear()
+            return
+
+        async with self._flush_lock:
+            if not self._pending:
+                return
+            pending, self._pending = self._pending, {}
+            upserts = []
+            deletes = []
+            for (guild_id, user_id), status in pending.items():
+                if status is None:
+                    deletes.append((guild_id, user_id))
+                else:
+                    upserts.append((guild_id, user_id, *status))
+
+            if await save_afk_changes(self.connection, upserts, deletes):
+                self.rows_written += len(pending)
+                return
+
+            # Retry on the next flush, unless the status changed since
+            self.failed_flushes += 1
+            for key, status in pending.items():
+                self._pending.setdefault(key, status)
+
+    async def _flush_loop(self, interval):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                log.error("AFK flush failed: %s", e)
+
+    def start_flush(self, interval=5):
+        """Write pending changes every `interval` seconds in the background."""
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_loop(interval))
+
+    async def close(self):
+        """Stop the background task and write what is left."""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            await asyncio.gather(self._flush_task, return_exceptions=True)
+            self._flush_task = None
+        await self.flush()
+
+    def stats(self):
+        return {
+            "afk_users": len(self),
+            "guilds": len(self._guilds),
+            "pending": len(self._pending),
+            "messages": self.messages,
+            "mention_lookups": self.mention_lookups,
+            "mention_hits": self.mention_hits,
+            "auto_cleared": self.auto_cleared,
+            "rows_written": self.rows_written,
+            "failed_flushes": self.failed_flushes,
+        }
@@ -0,0 +1,248 @@
+"""
+Blacklist Store for Ryujin Bot
+Compact in-memory blacklist used by every command's blacklist check.
+"""
+
+import asyncio
+import heapq
+import logging
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+
+from cogs.utils.db import get_blacklist_changes, get_blacklist_reason, get_blacklist_snapshot
+
+log = logging.getLogger(__name__)
+
+# 2^24-bit (2 MiB) filter in front of the sorted ID array
+_FILTER_BITS = 24
+_FILTER_MASK = (1 << _FILTER_BITS) - 1
+
+
+# Returned by `store[user_id]` for a blacklisted user whose reason hasn't
+# been loaded yet (see get_reason)
+UNKNOWN_REASON = "Reason unavailable"
+
+
+def _filter_slot(user_id):
+    # Fold the snowflake timestamp into its worker/increment bits
+    return (user_id ^ (user_id >> 22)) & _FILTER_MASK
+
+
+class BlacklistStore:
+    """
+    Set of blacklisted user IDs.
+
+    IDs live in a sorted `array('q')` (8 bytes per ID) with a bitmap filter
+    in front, so most non-blacklisted users are rejected with one byte
+    lookup. Changes since the last rebuild are held in two small sets and
+    merged into the array once they pass `compact_threshold`.
+
+    Reasons are not kept in memory; `get_reason` loads them from the
+    database on a hit and keeps the most recent ones in a small LRU.
+
+    Cogs written for the old dict can still use `store[user_id]` and
+    `store.get(user_id)` without awaiting. They return the cached reason,
+    or UNKNOWN_REASON while it is loaded in the background.
+
+    Usage:
+        bot.blacklist = await BlacklistStore(bot.connection).load()
+        bot.blacklist.start_refresh(interval=30)
+
+        if user_id in bot.blacklist:
+            reason = await bot.blacklist.get_reason(user_id)
+    """
+
+    def __init__(self, connection=None, compact_threshold=4096, reason_cache_size=1024):
+        self.connection = connection
+        self.compact_threshold = compact_threshold
+        self.reason_cache_size = reason_cache_size
+        self.sequence = 0
+
+        self._ids = array("q")
+        self._filter = bytearray(1 << (_FILTER_BITS - 3))
+        self._added = set()    # blacklisted since the last rebuild, not in _ids
+        self._removed = set()  # in _ids, but no longer blacklisted
+        self._reasons = OrderedDict()
+        self._reason_loads = {}  # user_id -> background get_reason task
+        self._refresh_task = None
+
+    @classmethod
+    def from_ids(cls, user_ids, reasons=None, **kwargs):
+        """Build a store from an iterable of IDs without touching the database."""
+        store = cls(**kwargs)
+        store._rebuild(sorted(set(user_ids)))
+        if reasons:
+            for user_id, reason in reasons.items():
+                store._cache_reason(user_id, reason)
+        return store
+
+    def _rebuild(self, sorted_ids):
+        self._ids = array("q", sorted_ids)
+        self._filter = bytearray(len(self._filter))
+        flt = self._filter
+        for user_id in self._ids:
+            slot = _filter_slot(user_id)
+            flt[slot >> 3] |= 1 << (slot & 7)
+        self._added.clear()
+        self._removed.clear()
+
+    def _in_base(self, user_id):
+        ids = self._ids
+        i = bisect_left(ids, user_id)
+        return i != len(ids) and ids[i] == user_id
+
+    def __contains__(self, user_id):
+        # Hot path: _filter_slot is inlined to save a function call
+        slot = (user_id ^ (user_id >> 22)) & _FILTER_MASK
+        if not self._filter[slot >> 3] >> (slot & 7) & 1:
+            return False
+        if user_id in self._added:
+            return True
+        if user_id in self._removed:
+            return False
+        return self._in_base(user_id)
+
+    def __getitem__(self, user_id):
+        if user_id not in self:
+            raise KeyError(user_id)
+        reason = self._reasons.get(user_id)
+        if reason is None:
+            self._load_reason_soon(user_id)
+            return UNKNOWN_REASON
+        return reason
+
+    def get(self, user_id, default=None):
+        """Like `dict.get`: the user's reason if they are blacklisted, else `default`."""
+        try:
+            return self[user_id]
+        except KeyError:
+            return default
+
+    def _load_reason_soon(self, user_id):
+        # So the next sync lookup has the real reason
+        if self.connection is None or user_id in self._reason_loads:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        task = loop.create_task(self.get_reason(user_id))
+        self._reason_loads[user_id] = task
+        task.add_done_callback(lambda _: self._reason_loads.pop(user_id, None))
+
+    def __len__(self):
+        return len(self._ids) + len(self._added) - len(self._removed)
+
+    def add(self, user_id, reason=None):
+        """Mark a user as blacklisted in memory (the database is not written)."""
+        if user_id in self._removed:
+            self._removed.discard(user_id)
+        elif not self._in_base(user_id):
+            self._added.add(user_id)
+            slot = _filter_slot(user_id)
+            self._filter[slot >> 3] |= 1 << (slot & 7)
+
+        self._reasons.pop(user_id, None)
+        if reason is not None:
+            self._cache_reason(user_id, reason)
+        self._maybe_compact()
+
+    def discard(self, user_id):
+        """Mark a user as no longer blacklisted in memory."""
+        if user_id in self._added:
+            self._added.discard(user_id)
+        elif self._in_base(user_id):
+            self._removed.add(user_id)
+
+        self._reasons.pop(user_id, None)
+        self._maybe_compact()
+
+    def _maybe_compact(self):
+        if len(self._added) + len(self._removed) >= self.compact_threshold:
+            self.compact()
+
+    def compact(self):
+        """Merge pending changes into the sorted array and rebuild the filter."""
+        removed = self._removed
+        kept = (user_id for user_id in self._ids if user_id not in removed)
+        self._rebuild(heapq.merge(kept, sorted(self._added)))
+
+    def _cache_reason(self, user_id, reason):
+        self._reasons[user_id] = reason
+        self._reasons.move_to_end(user_id)
+        while len(self._reasons) > self.reason_cache_size:
+            self._reasons.popitem(last=False)
+
+    async def get_reason(self, user_id):
+        """
+        Return the blacklist reason for a user, loading it on first use.
+
+        A blacklisted user whose reason can't be loaded (no connection, as
+        in shard workers, or a failed read) gets UNKNOWN_REASON; None means
+        the user isn't blacklisted.
+        """
+        reason = self._reasons.get(user_id)
+        if reason is not None:
+            self._reasons.move_to_end(user_id)
+            return reason
+
+        if self.connection is not None:
+            reason = await get_blacklist_reason(self.connection, user_id)
+            if reason is not None:
+                if user_id in self:
+                    self._cache_reason(user_id, reason)
+                return reason
+        return UNKNOWN_REASON if user_id in self else None
+
+    async def load(self):
+        """Load the full blacklist. Only needed once, at startup."""
+        user_ids, sequence = await get_blacklist_snapshot(self.connection)
+        self._rebuild(user_ids)
+        self._reasons.clear()
+        self.sequence = sequence
+        log.info("Loaded %s blacklisted users (sequence %s)", len(self), sequence)
+        return self
+
+    async def refresh(self):
+        """
+        Apply blacklist changes made since the last load or refresh.
+
+        Returns:
+            Number of changes applied
+        """
+        applied = 0
+        while True:
+            changes = await get_blacklist_changes(self.connection, self.sequence)
+            if not changes:
+                return applied
+
+            for seq, user_id, blacklisted in changes:
+                if blacklisted:
+                    self.add(user_id)
+                else:
+                    self.discard(user_id)
+                self.sequence = seq
+            applied += len(changes)
+
+    async def _refresh_loop(self, interval):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.refresh()
+            except Exception as e:
+                log.error("Blacklist refresh failed: %s", e)
+
+    def start_refresh(self, interval=30):
+        """Poll the change log every `interval` seconds in the background."""
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._refresh_loop(interval))
+
+    def stop_refresh(self):
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            self._refresh_task = None
+
+    def memory_usage(self):
+        """Approximate bytes used by the ID array and filter."""
+        return self._ids.itemsize * len(self._ids) + len(self._filter)
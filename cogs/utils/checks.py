@@ -0,0 +1,295 @@
+"""
+Command Checks for Ryujin Bot
+Declarative pre-command checks (blacklist, permissions, role hierarchy, cooldowns).
+"""
+
+import functools
+import inspect
+from operator import attrgetter
+
+from cogs.utils.metrics import registry as default_registry
+from cogs.utils.phases import phase
+
+# Relative cost of a check; cheaper checks run first
+COST_ID = 0           # compares IDs that are already on hand
+COST_BLACKLIST = 0    # in-memory membership test
+COST_PERMISSIONS = 1  # resolves guild permissions (walks the member's roles once)
+COST_HIERARCHY = 2    # resolves top roles
+COST_COOLDOWN = 3     # uses up a token, so it only runs once everything else passed
+
+
+class Check:
+    """
+    One pre-command check.
+
+    Args:
+        name: Name used in rejection counts
+        predicate: `predicate(context)` returning True if the command may run
+        message: Sent (ephemeral) when the check fails
+        cost: Relative cost, see the COST_* constants
+        reject: Optional `async reject(context)` that answers instead of `message`
+    """
+
+    __slots__ = ("name", "predicate", "message", "cost", "reject")
+
+    def __init__(self, name, predicate, message=None, cost=COST_PERMISSIONS, reject=None):
+        self.name = name
+        self.predicate = predicate
+        self.message = message
+        self.cost = cost
+        self.reject = reject
+
+
+class CheckContext:
+    """
+    What a check can look at. Permissions and top roles (the invoking
+    member's, the bot's and those of member options) are resolved on first
+    use and then shared by every check of the same invocation.
+    """
+
+    __slots__ = (
+        "cog", "interaction", "options", "throttled",
+        "_permissions", "_bot_permissions", "_top_role", "_bot_top_role", "_target_roles"
+    )
+
+    def __init__(self, cog, interaction, options):
+        self.cog = cog
+        self.interaction = interaction
+        self.options = options
+        self.throttled = None  # scope a cooldown rejected, see cooldown()
+        self._permissions = None
+        self._bot_permissions = None
+        self._top_role = None
+        self._bot_top_role = None
+        self._target_roles = {}
+
+    @property
+    def permissions(self):
+        if self._permissions is None:
+            self._permissions = self.interaction.user.guild_permissions
+        return self._permissions
+
+    @property
+    def bot_permissions(self):
+        if self._bot_permissions is None:
+            self._bot_permissions = self.interaction.guild.me.guild_permissions
+        return self._bot_permissions
+
+    @property
+    def top_role(self):
+        if self._top_role is None:
+            self._top_role = self.interaction.user.top_role
+        return self._top_role
+
+    @property
+    def bot_top_role(self):
+        if self._bot_top_role is None:
+            self._bot_top_role = self.interaction.guild.me.top_role
+        return self._bot_top_role
+
+    def target_top_role(self, option):
+        """Top role of a member option, or None for a user who isn't a member."""
+        roles = self._target_roles
+        if option not in roles:
+            roles[option] = getattr(self.options[option], "top_role", None)
+        return roles[option]
+
+
+async def _reject_blacklisted(context):
+    user_id = context.interaction.user.id
+    reason = await context.cog.bot.blacklist.get_reason(user_id)
+    embed = context.cog.create_blacklist_embed(reason)
+    await context.interaction.send(embed=embed, ephemeral=True)
+
+
+def not_blacklisted():
+    """The invoking user is not blacklisted. Uses the cog's `create_blacklist_embed`."""
+    return Check(
+        "blacklist",
+        lambda context: context.interaction.user.id not in context.cog.bot.blacklist,
+        cost=COST_BLACKLIST,
+        reject=_reject_blacklisted
+    )
+
+
+def _permission_test(permissions):
+    # One attrgetter call per check, instead of a getattr per permission
+    names = [name for name, value in permissions.items() if value]
+    if not names:
+        raise ValueError("No permissions given")
+    getter = attrgetter(*names)
+    if len(names) == 1:
+        return getter
+    return lambda resolved: all(getter(resolved))
+
+
+def has_permissions(**permissions):
+    """The invoking member has every given guild permission."""
+    test = _permission_test(permissions)
+    return Check(
+        "permissions",
+        lambda context: test(context.permissions),
+        "❌ You don't have permission to use this command.",
+        cost=COST_PERMISSIONS
+    )
+
+
+def bot_has_permissions(**permissions):
+    """The bot has every given guild permission."""
+    test = _permission_test(permissions)
+    return Check(
+        "bot_permissions",
+        lambda context: test(context.bot_permissions),
+        "❌ I don't have permission to use this command.",
+        cost=COST_PERMISSIONS
+    )
+
+
+def not_self(option="user"):
+    """The member option isn't the invoking user."""
+    return Check(
+        "self_target",
+        lambda context: context.options[option].id != context.interaction.user.id,
+        "❌ You can't moderate yourself.",
+        cost=COST_ID
+    )
+
+
+def not_bot(option="user"):
+    """The member option isn't the bot."""
+    return Check(
+        "bot_target",
+        lambda context: context.options[option].id != context.cog.bot.user.id,
+        "❌ You can't moderate the bot.",
+        cost=COST_ID
+    )
+
+
+def _below(target_role, top_role):
+    # A user who isn't a member of the guild has no roles to outrank
+    return target_role is None or target_role < top_role
+
+
+def above_target(option="user"):
+    """The invoking member's top role is above the member option's."""
+    return Check(
+        "hierarchy",
+        lambda context: _below(context.target_top_role(option), context.top_role),
+        "❌ You can't moderate this user due to role hierarchy.",
+        cost=COST_HIERARCHY
+    )
+
+
+def bot_above_target(option="user"):
+    """The bot's top role is above the member option's."""
+    return Check(
+        "bot_hierarchy",
+        lambda context: _below(context.target_top_role(option), context.bot_top_role),
+        "❌ I can't moderate this user due to role hierarchy.",
+        cost=COST_HIERARCHY
+    )
+
+
+def cooldown(limiter):
+    """
+    The command is within its `Cooldown` (cogs/utils/cooldowns.py). Pass the
+    same `Cooldown` to several commands to limit them together.
+    """
+    def allowed(context):
+        interaction = context.interaction
+        context.throttled = limiter.hit(interaction.user.id, interaction.guild.id if interaction.guild else None)
+        return context.throttled is None
+
+    async def reject(context):
+        interaction = context.interaction
+        guild_id = interaction.guild.id if interaction.guild else None
+        await interaction.send(limiter.message(context.throttled, interaction.user.id, guild_id), ephemeral=True)
+
+    return Check("cooldown", allowed, cost=COST_COOLDOWN, reject=reject)
+
+
+class CheckPipeline:
+    """
+    The checks of one command, sorted cheapest first (ties keep the
+    declared order, so `not_blacklisted()` declared first stays first).
+    The first failing check answers the interaction and stops the rest.
+
+    Rejections are counted per check (`stats()`) and in the
+    `ryujin_check_rejections_total` counter (labels: command, check).
+    """
+
+    def __init__(self, command, checks, registry=default_registry):
+        self.command = command
+        self.checks = tuple(sorted(checks, key=lambda check: check.cost))
+        self.counter = registry.counter(
+            "ryujin_check_rejections_total", "Commands rejected by a pre-command check", ("command", "check")
+        )
+
+        # Metrics, see stats()
+        self.runs = 0
+        self.rejections = {check.name: 0 for check in self.checks}
+
+    async def run(self, cog, interaction, options):
+        """Return True if the command may run; otherwise answer and return False."""
+        self.runs += 1
+        context = CheckContext(cog, interaction, options)
+        with phase("checks"):
+            for check in self.checks:
+                if check.predicate(context):
+                    continue
+                self.rejections[check.name] += 1
+                self.counter.inc(command=self.command, check=check.name)
+                if check.reject is not None:
+                    await check.reject(context)
+                else:
+                    await interaction.send(check.message, ephemeral=True)
+                return False
+        return True
+
+    def stats(self):
+        return {"runs": self.runs, "rejections": dict(self.rejections)}
+
+
+_pipelines = {}  # "module.Class.command" -> CheckPipeline, replaced when a cog is reloaded
+
+
+def require(*checks):
+    """
+    Run checks before a command. Put it below `@nextcord.slash_command`:
+
+        @nextcord.slash_command(name="moderate_user", ...)
+        @require(
+            not_blacklisted(),
+            has_permissions(manage_messages=True),
+            not_self("user"),
+            above_target("user"),
+        )
+        async def moderate_user(self, interaction, user, reason=None):
+
+    The checks are sorted and bound when the cog's module is loaded, so an
+    invocation costs one loop over them. Options are looked up by name.
+    """
+    def decorator(func):
+        pipeline = CheckPipeline(func.__name__, checks)
+        _pipelines[f"{func.__module__}.{func.__qualname__}"] = pipeline
+        # Names of the options after (self, interaction), for positional calls
+        names = tuple(inspect.signature(func).parameters)[2:]
+
+        @functools.wraps(func)
+        async def wrapper(cog, interaction, *args, **kwargs):
+            options = dict(zip(names, args), **kwargs) if args else kwargs
+            if await pipeline.run(cog, interaction, options):
+                return await func(cog, interaction, *args, **kwargs)
+
+        wrapper.pipeline = pipeline
+        return wrapper
+    return decorator
+
+
+def check_stats():
+    """
+    Return {"module.Class.command": {"runs", "rejections": {check: count}}}
+    for every pipeline. Keyed like `_pipelines`, so commands with the same
+    name in different cogs are reported separately.
+    """
+    return {key: pipeline.stats() for key, pipeline in _pipelines.items()}
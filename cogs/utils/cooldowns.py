@@ -0,0 +1,209 @@
+"""
+Cooldowns for Ryujin Bot
+Token-bucket rate limits per user, per guild and for the whole bot.
+"""
+
+import math
+import time
+
+from cogs.utils.metrics import registry as default_registry
+
+SCOPES = ("user", "guild", "total")
+
+# Idle buckets evicted per sweep at most, so a sweep never stalls a command;
+# if there are more, the next check sweeps again
+MAX_SWEEP = 1000
+
+MESSAGES = {
+    "user": "⏳ You're using this command too often. Try again in {seconds}s.",
+    "guild": "⏳ This server is using this command too often. Try again in {seconds}s.",
+    "total": "⏳ The bot is busy right now. Try again in {seconds}s.",
+}
+
+
+class RateLimit:
+    """
+    Token buckets for one scope: up to `rate` uses per `per` seconds, in
+    bursts of up to `rate`.
+
+    Each bucket is a single float, the time at which it will be full again
+    (the "theoretical arrival time" of GCRA). Refilling is implicit, so an
+    unused bucket costs nothing until it is used again. Buckets are kept in
+    last-use order, and a full bucket is the same as no bucket, so evicting
+    idle ones only looks at the oldest entries.
+
+    Args:
+        rate: Uses allowed per `per` seconds (and the burst size)
+        per: Seconds
+        sweep_interval: Seconds between evictions of idle buckets
+    """
+
+    __slots__ = ("rate", "per", "interval", "sweep_interval", "_headroom", "_buckets", "_next_sweep", "evicted")
+
+    def __init__(self, rate, per, sweep_interval=1.0):
+        if rate < 1 or per <= 0:
+            raise ValueError(f"Invalid rate limit: {rate} per {per}s")
+        self.rate = rate
+        self.per = per
+        self.interval = per / rate
+        # A use is allowed while the bucket is full again within this many
+        # seconds (plus a little, so rounding never costs a token)
+        self._headroom = per - self.interval + 1e-9
+        self.sweep_interval = sweep_interval
+        self._buckets = {}  # key -> time the bucket is full again, oldest use first
+        self._next_sweep = 0.0
+
+        # Metrics, see Cooldown.stats()
+        self.evicted = 0
+
+    def __len__(self):
+        return len(self._buckets)
+
+    def take(self, key, now):
+        """Use one token. Return 0.0 if there was one, else seconds until there is."""
+        if now >= self._next_sweep:
+            self._sweep(now)
+        buckets = self._buckets
+        # Popping and re-adding keeps the dict in last-use order
+        full_at = buckets.pop(key, now)
+        if full_at < now:
+            full_at = now
+        if full_at - now > self._headroom:
+            buckets[key] = full_at
+            return full_at - now - self._headroom
+        buckets[key] = full_at + self.interval
+        return 0.0
+
+    def refund(self, key):
+        """Give back the token the last `take` for `key` used."""
+        self._buckets[key] -= self.interval
+
+    def retry_after(self, key, now):
+        """Seconds until `key` has a token, without using one."""
+        full_at = self._buckets.get(key, now)
+        return max(0.0, full_at - now - self._headroom)
+
+    def _sweep(self, now):
+        # A bucket is written at most `per` seconds before it is full, so
+        # the first one that isn't full yet was used within the last `per`
+        # seconds, and so was everything after it: stop there.
+        self._next_sweep = now + self.sweep_interval
+        idle = []
+        for key, full_at in self._buckets.items():
+            if full_at > now:
+                break
+            idle.append(key)
+            if len(idle) == MAX_SWEEP:
+                self._next_sweep = now
+                break
+        for key in idle:
+            del self._buckets[key]
+        self.evicted += len(idle)
+
+    def clear(self):
+        self._buckets.clear()
+
+
+class Cooldown:
+    """
+    Rate limits shared by one or more commands: per user, per guild and
+    for the whole bot. Each is given as `(rate, per)`, meaning up to `rate`
+    uses per `per` seconds. A use has to pass every limit; when one
+    rejects it, nothing is used from the others.
+
+    Attach it to commands with the `cooldown()` check (cogs/utils/checks.py).
+    Rejections are counted per scope in `stats()` and in the
+    `ryujin_cooldown_throttled_total` counter (label: scope). Set
+    `enabled = False` to stop throttling, e.g. for load tests.
+
+    Usage:
+        DATABASE_COOLDOWN = Cooldown(user=(5, 10), guild=(60, 10), total=(200, 1))
+
+        @nextcord.slash_command(name="add_data", ...)
+        @require(not_blacklisted(), cooldown(DATABASE_COOLDOWN))
+        async def add_data(self, interaction, ...):
+
+    Args:
+        user: Limit per user
+        guild: Limit per guild (not applied in DMs)
+        total: Limit for everyone together
+        registry: MetricsRegistry for the counter
+    """
+
+    def __init__(self, user=None, guild=None, total=None, registry=default_registry):
+        configured = dict(zip(SCOPES, (user, guild, total)))
+        self.limits = tuple(
+            (scope, RateLimit(*limit)) for scope, limit in configured.items() if limit is not None
+        )
+        if not self.limits:
+            raise ValueError("Cooldown needs at least one limit")
+        limits = dict(self.limits)
+        self._user = limits.get("user")
+        self._guild = limits.get("guild")
+        self._total = limits.get("total")
+        self.enabled = True
+        self.counter = registry.counter(
+            "ryujin_cooldown_throttled_total", "Commands rejected by a cooldown", ("scope",)
+        )
+
+        # Metrics, see stats()
+        self.allowed = 0
+        self.throttled = {scope: 0 for scope, _ in self.limits}
+
+    def hit(self, user_id, guild_id, now=None):
+        """
+        Use one token from each limit. Return None if the use is allowed,
+        else the scope ("user", "guild" or "total") that rejected it.
+        """
+        if not self.enabled:
+            return None
+        if now is None:
+            now = time.monotonic()
+
+        user, guild, total = self._user, self._guild, self._total
+        if guild_id is None:
+            guild = None
+        if user is not None and user.take(user_id, now):
+            return self._reject("user")
+        if guild is not None and guild.take(guild_id, now):
+            if user is not None:
+                user.refund(user_id)
+            return self._reject("guild")
+        if total is not None and total.take(0, now):
+            if user is not None:
+                user.refund(user_id)
+            if guild is not None:
+                guild.refund(guild_id)
+            return self._reject("total")
+        self.allowed += 1
+        return None
+
+    def _reject(self, scope):
+        self.throttled[scope] += 1
+        self.counter.inc(scope=scope)
+        return scope
+
+    def retry_after(self, scope, user_id, guild_id, now=None):
+        """Whole seconds (at least 1) until `scope` would allow a use again."""
+        if now is None:
+            now = time.monotonic()
+        limit = dict(self.limits)[scope]
+        key = {"user": user_id, "guild": guild_id, "total": 0}[scope]
+        return max(1, math.ceil(limit.retry_after(key, now)))
+
+    def message(self, scope, user_id, guild_id):
+        """Ephemeral answer for a rejected use."""
+        return MESSAGES[scope].format(seconds=self.retry_after(scope, user_id, guild_id))
+
+    def reset(self):
+        """Refill every bucket."""
+        for _, limit in self.limits:
+            limit.clear()
+
+    def stats(self):
+        return {
+            "allowed": self.allowed,
+            "throttled": dict(self.throttled),
+            "buckets": {scope: len(limit) for scope, limit in self.limits},
+            "evicted": {scope: limit.evicted for scope, limit in self.limits},
+        }
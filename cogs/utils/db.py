@@ -0,0 +1,674 @@
+"""
+Database Utilities for Ryujin Bot
+Warning system helpers. Every helper takes `self.bot.connection` as its
+first argument, which may be a single connection or a ConnectionPool.
+"""
+
+import logging
+from datetime import datetime, timedelta, timezone
+
+from cogs.utils.db_pool import acquire_connection
+
+log = logging.getLogger(__name__)
+
+
+# Each migration runs once, in order, tracked through PRAGMA user_version.
+MIGRATIONS = [
+    # 1: warnings table
+    [
+        """
+        CREATE TABLE IF NOT EXISTS warnings (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            guild_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            moderator_id INTEGER NOT NULL,
+            reason TEXT NOT NULL,
+            date TEXT NOT NULL
+        )
+        """,
+    ],
+    # 2: index for per-user history pages (keyset pagination on id)
+    [
+        "CREATE INDEX IF NOT EXISTS idx_warnings_guild_user_id ON warnings (guild_id, user_id, id)",
+    ],
+    # 3: blacklist and its change log (read incrementally by BlacklistStore)
+    [
+        """
+        CREATE TABLE IF NOT EXISTS blacklist (
+            user_id INTEGER PRIMARY KEY,
+            reason TEXT NOT NULL,
+            date TEXT NOT NULL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS blacklist_changes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            blacklisted INTEGER NOT NULL
+        )
+        """,
+    ],
+    # 4: per-user ad frequency state (written in batches by AdTracker)
+    [
+        """
+        CREATE TABLE IF NOT EXISTS ad_state (
+            user_id INTEGER PRIMARY KEY,
+            last_shown INTEGER NOT NULL,
+            commands_since INTEGER NOT NULL,
+            shown_count INTEGER NOT NULL,
+            last_seen INTEGER NOT NULL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_ad_state_last_seen ON ad_state (last_seen)",
+    ],
+    # 5: timers for temporary actions (loaded by ExpiryScheduler on startup)
+    [
+        """
+        CREATE TABLE IF NOT EXISTS scheduled_actions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            action TEXT NOT NULL,
+            guild_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            expires_at REAL NOT NULL,
+            data TEXT
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_scheduled_actions_key ON scheduled_actions (action, guild_id, user_id)",
+    ],
+    # 6: AFK statuses (kept in memory by AfkIndex, written behind)
+    [
+        """
+        CREATE TABLE IF NOT EXISTS afk (
+            guild_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            reason TEXT NOT NULL,
+            since INTEGER NOT NULL,
+            PRIMARY KEY (guild_id, user_id)
+        )
+        """,
+    ],
+    # 7: archive for old warnings, clustered by guild and user, and an
+    # index on date so archive_warnings finds the rows to move
+    [
+        """
+        CREATE TABLE IF NOT EXISTS warnings_archive (
+            guild_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            id INTEGER NOT NULL,
+            moderator_id INTEGER NOT NULL,
+            reason TEXT NOT NULL,
+            date TEXT NOT NULL,
+            PRIMARY KEY (guild_id, user_id, id)
+        ) WITHOUT ROWID
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_warnings_date ON warnings (date)",
+    ],
+]
+
+# Warnings live in two tables with the same columns: `warnings` for recent
+# ones and `warnings_archive` for those moved there by archive_warnings.
+# IDs keep coming from the AUTOINCREMENT sequence, which never reuses one,
+# and the read helpers below cover both tables.
+_COUNT_WARNINGS = (
+    "SELECT (SELECT COUNT(*) FROM warnings WHERE guild_id = ? AND user_id = ?)"
+    " + (SELECT COUNT(*) FROM warnings_archive WHERE guild_id = ? AND user_id = ?)"
+)
+
+
+def current_timestamp():
+    """Return the current UTC time in the format stored in `date` columns."""
+    return datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+
+async def run_migrations(connection):
+    """
+    Bring the schema up to date.
+
+    Returns:
+        The schema version after migrating
+    """
+    async with acquire_connection(connection) as conn:
+        cursor = await conn.execute("PRAGMA user_version")
+        row = await cursor.fetchone()
+        version = row[0] if row else 0
+
+        for number, statements in enumerate(MIGRATIONS[version:], version + 1):
+            for statement in statements:
+                await conn.execute(statement)
+            await conn.execute(f"PRAGMA user_version = {number}")
+            await conn.commit()
+            log.info("Applied database migration %s", number)
+            version = number
+
+        return version
+
+
+async def create_tables(connection):
+    """Create the warning tables if they don't exist yet."""
+    await run_migrations(connection)
+
+
+async def add_warning(connection, guild_id, user_id, moderator_id, reason, cache=None):
+    """
+    Store a new warning.
+
+    Args:
+        cache: Optional WarningCountCache to update once the insert commits
+
+    Returns:
+        The new warning ID, or None if the insert failed
+    """
+    date = current_timestamp()
+    try:
+        async with acquire_connection(connection) as conn:
+            cursor = await conn.execute(
+                "INSERT INTO warnings (guild_id, user_id, moderator_id, reason, date) VALUES (?, ?, ?, ?, ?)",
+                (guild_id, user_id, moderator_id, reason, date)
+            )
+            await conn.commit()
+    except Exception as e:
+        log.error("Failed to add warning for %s in %s: %s", user_id, guild_id, e)
+        if cache is not None:
+            # The insert may have committed before the error
+            cache.forget(guild_id, user_id)
+        return None
+    if cache is not None:
+        cache.add(guild_id, user_id, 1)
+    return cursor.lastrowid
+
+
+async def count_warnings(connection, guild_id, user_id):
+    """
+    Count a user's warnings in a guild, archived ones included, without
+    going through a cache.
+
+    Returns:
+        The count, or None on error (so a failed read is never cached as 0)
+    """
+    try:
+        async with acquire_connection(connection) as conn:
+            cursor = await conn.execute(_COUNT_WARNINGS, (guild_id, user_id) * 2)
+            row = await cursor.fetchone()
+            return row[0] if row else 0
+    except Exception as e:
+        log.error("Failed to count warnings for %s in %s: %s", user_id, guild_id, e)
+        return None
+
+
+async def get_warning_count(connection, guild_id, user_id, cache=None):
+    """
+    Return how many warnings a user has in a guild (0 on error).
+
+    Args:
+        cache: Optional WarningCountCache to read through
+    """
+    if cache is None:
+        count = await count_warnings(connection, guild_id, user_id)
+    else:
+        count = await cache.read(guild_id, user_id, lambda: count_warnings(connection, guild_id, user_id))
+    return count or 0
+
+
+async def delete_warning(connection, guild_id, warning_id, cache=None):
+    """
+    Delete one warning.
+
+    Args:
+        cache: Optional WarningCountCache to update once the delete commits
+
+    Returns:
+        True if the warning existed and was deleted, otherwise False
+    """
+    rows = []
+    try:
+        async with acquire_connection(connection) as conn:
+            # RETURNING tells which user's count to update (SQLite 3.35+).
+            # An archived warning is found by scanning the guild's archive
+            for table in ("warnings", "warnings_archive"):
+                cursor = await conn.execute(
+                    f"DELETE FROM {table} WHERE guild_id = ? AND id = ? RETURNING user_id",
+                    (guild_id, warning_id)
+                )
+                rows = await cursor.fetchall()
+                if rows:
+                    break
+            await conn.commit()
+    except Exception as e:
+        log.error("Failed to delete warning %s in %s: %s", warning_id, guild_id, e)
+        if cache is not None and rows:
+            # The delete may have committed before the error
+            cache.forget(guild_id, rows[0][0])
+        return False
+    if not rows:
+        return False
+    if cache is not None:
+        cache.add(guild_id, rows[0][0], -1)
+    return True
+
+
+async def clear_warnings(connection, guild_id, user_id, cache=None):
+    """
+    Delete all of a user's warnings in a guild.
+
+    Args:
+        cache: Optional WarningCountCache to update once the delete commits
+
+    Returns:
+        How many warnings were deleted, or None if the delete failed
+    """
+    deleted = 0
+    try:
+        async with acquire_connection(connection) as conn:
+            for table in ("warnings", "warnings_archive"):
+                cursor = await conn.execute(
+                    f"DELETE FROM {table} WHERE guild_id = ? AND user_id = ?",
+                    (guild_id, user_id)
+                )
+                deleted += cursor.rowcount
+            await conn.commit()
+    except Exception as e:
+        log.error("Failed to clear warnings for %s in %s: %s", user_id, guild_id, e)
+        if cache is not None:
+            cache.forget(guild_id, user_id)
+        return None
+    if cache is not None:
+        cache.set(guild_id, user_id, 0)
+    return deleted
+
+
+async def get_user_warnings(connection, guild_id, user_id):
+    """
+    Return a user's warnings in a guild, newest first.
+
+    Returns:
+        List of (id, moderator_id, reason, date) tuples (empty on error)
+    """
+    try:
+        async with acquire_connection(connection) as conn:
+            cursor = await conn.execute(
+                "SELECT id, moderator_id, reason, date FROM warnings WHERE guild_id = ? AND user_id = ? "
+                "UNION ALL "
+                "SELECT id, moderator_id, reason, date FROM warnings_archive WHERE guild_id = ? AND user_id = ? "
+                "ORDER BY id DESC",
+                (guild_id, user_id) * 2
+            )
+            rows = await cursor.fetchall()
+            return [tuple(row) for row in rows]
+    except Exception as e:
+        log.error("Failed to fetch warnings for %s in %s: %s", user_id, guild_id, e)
+        return []
+
+
+async def get_warnings_page(connection, guild_id, user_id, limit=10, before_id=None, cache=None):
+    """
+    Return one page of a user's warnings plus their total count in a
+    single query.
+
+    Pages are keyset paginated: pass the ID of the last row of the previous
+    page as `before_id` to get the next (older) page.
+
+    Args:
+        cache: Optional WarningCountCache; when it has the count only the
+            page is queried, otherwise the count is stored in it
+
+    Returns:
+        Tuple of (rows, total_count) where rows is a list of
+        (id, moderator_id, reason, date) tuples, newest first, or None on
+        error (so a failed read never looks like an empty history)
+    """
+    if before_id is None:
+        page_filter = "guild_id = ? AND user_id = ?"
+        filter_params = (guild_id, user_id)
+    else:
+        page_filter = "guild_id = ? AND user_id = ? AND id < ?"
+        filter_params = (guild_id, user_id, before_id)
+    # Both sides are read in id order from an index, newest first, and
+    # merged; a page of recent warnings barely touches the archive
+    page_query = (
+        f"SELECT id, moderator_id, reason, date FROM warnings WHERE {page_filter} "
+        "UNION ALL "
+        f"SELECT id, moderator_id, reason, date FROM warnings_archive WHERE {page_filter} "
+        "ORDER BY id DESC LIMIT ?"
+    )
+    page_params = filter_params * 2 + (limit,)
+
+    total_count = cache.get(guild_id, user_id) if cache is not None else None
+    if total_count is not None:
+        try:
+            async with acquire_connection(connection) as conn:
+                cursor = await conn.execute(page_query, page_params)
+                rows = await cursor.fetchall()
+        except Exception as e:
+            log.error("Failed to fetch warning page for %s in %s: %s", user_id, guild_id, e)
+            return None
+        return [tuple(row) for row in rows], total_count
+
+    # The LEFT JOIN keeps one row (carrying the count) even when the page is empty
+    query = (
+        "SELECT total.count, page.id, page.moderator_id, page.reason, page.date "
+        f"FROM ({_COUNT_WARNINGS} AS count) AS total "
+        f"LEFT JOIN ({page_query}) AS page ON 1 = 1 "
+        "ORDER BY page.id DESC"
+    )
+
+    token = cache.begin_load(guild_id, user_id) if cache is not None else None
+    total_count = None
+    try:
+        async with acquire_connection(connection) as conn:
+            cursor = await conn.execute(query, (guild_id, user_id) * 2 + page_params)
+            rows = await cursor.fetchall()
+        total_count = rows[0][0] if rows else 0
+    except Exception as e:
+        log.error("Failed to fetch warning page for %s in %s: %s", user_id, guild_id, e)
+        return None
+    finally:
+        if token is not None:
+            cache.end_load(token, total_count)
+
+    page = [tuple(row[1:]) for row in rows if row[1] is not None]
+    return page, total_count
+
+
+async def archive_warnings(connection, older_than_days=365, batch_size=10000):
+    """
+    Move warnings older than `older_than_days` into `warnings_archive`.
+
+    Rows are picked by `date` alone and moved oldest first in batches of
+    `batch_size`, each in its own transaction, so commands using the
+    database wait for one batch at most.
+    Counts don't change, so a WarningCountCache stays valid. Run it from a
+    daily task; the first run on a large table takes a while.
+
+    Returns:
+        How many warnings were archived (those moved before an error, if one
+        happened)
+    """
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=older_than_days)).strftime("%Y-%m-%d %H:%M:%S")
+    archived = 0
+    try:
+        while True:
+            async with acquire_connection(connection) as conn:
+                # The last (date, id) of the batch in idx_warnings_date order.
+                # IDs don't have to follow dates (imports, clock changes), so
+                # the batch is bounded by date, not by an id range.
+                cursor = await conn.execute(
+                    "SELECT date, id FROM warnings WHERE date < ? ORDER BY date, id LIMIT 1 OFFSET ?",
+                    (cutoff, batch_size - 1)
+                )
+                last = await cursor.fetchone()
+                if last is None:
+                    # Fewer than a full batch left
+                    condition, params = "date < ?", (cutoff,)
+                else:
+                    condition, params = "date <= ? AND (date < ? OR id <= ?)", (last[0], last[0], last[1])
+                try:
+                    await conn.execute(
+                        "INSERT INTO warnings_archive (guild_id, user_id, id, moderator_id, reason, date) "
+                        f"SELECT guild_id, user_id, id, moderator_id, reason, date FROM warnings WHERE {condition}",
+                        params
+                    )
+                    cursor = await conn.execute(f"DELETE FROM warnings WHERE {condition}", params)
+                    await conn.commit()
+                except Exception:
+                    await conn.rollback()
+                    raise
+            archived += cursor.rowcount
+            if last is None:
+                break
+    except Exception as e:
+        log.error("Failed to archive warnings older than %s: %s", cutoff, e)
+    if archived:
+        log.info("Archived %s warnings older than %s", archived, cutoff)
+    return archived
+
+
+async def add_blacklist(connection, user_id, reason):
+    """
+    Blacklist a user (or update their reason).
+
+    Returns:
+        The change sequence number, or None if the write failed
+    """
+    date = current_timestamp()
+    try:
+        async with acquire_connection(connection) as conn:
+            await conn.execute(
+                "INSERT OR REPLACE INTO blacklist (user_id, reason, date) VALUES (?, ?, ?)",
+                (user_id, reason, date)
+            )
+            cursor = await conn.execute(
+                "INSERT INTO blacklist_changes (user_id, blacklisted) VALUES (?, 1)",
+                (user_id,)
+            )
+            await conn.commit()
+            return cursor.lastrowid
+    except Exception as e:
+        log.error("Failed to blacklist %s: %s", user_id, e)
+        return None
+
+
+async def remove_blacklist(connection, user_id):
+    """
+    Remove a user from the blacklist.
+
+    Returns:
+        The change sequence number, or None if the write failed
+    """
+    try:
+        async with acquire_connection(connection) as conn:
+            await conn.execute("DELETE FROM blacklist WHERE user_id = ?", (user_id,))
+            cursor = await conn.execute(
+                "INSERT INTO blacklist_changes (user_id, blacklisted) VALUES (?, 0)",
+                (user_id,)
+            )
+            await conn.commit()
+            return cursor.lastrowid
+    except Exception as e:
+        log.error("Failed to remove %s from the blacklist: %s", user_id, e)
+        return None
+
+
+async def get_blacklist_snapshot(connection):
+    """
+    Return every blacklisted user ID and the change sequence the list is
+    current as of.
+
+    Returns:
+        Tuple of (sorted list of user IDs, sequence)
+    """
+    async with acquire_connection(connection) as conn:
+        cursor = await conn.execute("SELECT COALESCE(MAX(seq), 0) FROM blacklist_changes")
+        sequence = (await cursor.fetchone())[0]
+        cursor = await conn.execute("SELECT user_id FROM blacklist ORDER BY user_id")
+        rows = await cursor.fetchall()
+        return [row[0] for row in rows], sequence
+
+
+async def get_blacklist_changes(connection, since_seq, limit=10000):
+    """
+    Return blacklist changes made after `since_seq`.
+
+    Returns:
+        List of (seq, user_id, blacklisted) tuples, oldest first
+    """
+    async with acquire_connection(connection) as conn:
+        cursor = await conn.execute(
+            "SELECT seq, user_id, blacklisted FROM blacklist_changes WHERE seq > ? ORDER BY seq LIMIT ?",
+            (since_seq, limit)
+        )
+        rows = await cursor.fetchall()
+        return [tuple(row) for row in rows]
+
+
+async def get_blacklist_reason(connection, user_id):
+    """Return a blacklisted user's reason, or None if they aren't blacklisted."""
+    async with acquire_connection(connection) as conn:
+        cursor = await conn.execute("SELECT reason FROM blacklist WHERE user_id = ?", (user_id,))
+        row = await cursor.fetchone()
+        return row[0] if row else None
+
+
+async def get_ad_states(connection, seen_since, limit=100000):
+    """
+    Return ad state for users active since `seen_since` (unix time).
+
+    Returns:
+        List of (user_id, last_shown, commands_since, shown_count, last_seen)
+        tuples, most recently active first
+    """
+    async with acquire_connection(connection) as conn:
+        cursor = await conn.execute(
+            "SELECT user_id, last_shown, commands_since, shown_count, last_seen FROM ad_state "
+            "WHERE last_seen >= ? ORDER BY last_seen DESC LIMIT ?",
+            (seen_since, limit)
+        )
+        rows = await cursor.fetchall()
+        return [tuple(row) for row in rows]
+
+
+async def save_ad_states(connection, rows):
+    """
+    Upsert many users' ad state in one transaction.
+
+    Existing rows are merged, not replaced: `shown_count` is added to the
+    stored total and the later `last_shown`/`last_seen` wins, so a user the
+    caller no longer had in memory doesn't lose their history.
+
+    Args:
+        rows: (user_id, last_shown, commands_since, shown_count, last_seen)
+            tuples, where shown_count is the number of ads shown since the
+            last save
+
+    Returns:
+        True if the write succeeded
+    """
+    try:
+        async with acquire_connection(connection) as conn:
+            try:
+                await conn.executemany(
+                    "INSERT INTO ad_state (user_id, last_shown, commands_since, shown_count, last_seen) "
+                    "VALUES (?, ?, ?, ?, ?) "
+                    "ON CONFLICT (user_id) DO UPDATE SET "
+                    "last_shown = MAX(last_shown, excluded.last_shown), "
+                    "commands_since = excluded.commands_since, "
+                    "shown_count = shown_count + excluded.shown_count, "
+                    "last_seen = MAX(last_seen, excluded.last_seen)",
+                    rows
+                )
+                await conn.commit()
+            except Exception:
+                await conn.rollback()
+                raise
+        return True
+    except Exception as e:
+        log.error("Failed to save ad state for %s users: %s", len(rows), e)
+        return False
+
+
+async def add_scheduled_actions(connection, rows):
+    """
+    Store timers in one transaction.
+
+    Args:
+        rows: (action, guild_id, user_id, expires_at, data) tuples, at most
+            a few hundred per call
+
+    Returns:
+        List of new IDs in row order, or None if the write failed
+    """
+    placeholders = ", ".join(["(?, ?, ?, ?, ?)"] * len(rows))
+    parameters = [value for row in rows for value in row]
+    try:
+        async with acquire_connection(connection) as conn:
+            try:
+                cursor = await conn.execute(
+                    f"INSERT INTO scheduled_actions (action, guild_id, user_id, expires_at, data) VALUES {placeholders}",
+                    parameters
+                )
+                await conn.commit()
+            except Exception:
+                await conn.rollback()
+                raise
+    except Exception as e:
+        log.error("Failed to store %s timers: %s", len(rows), e)
+        return None
+
+    # Consecutive AUTOINCREMENT IDs within one INSERT
+    first_id = cursor.lastrowid - len(rows) + 1
+    return list(range(first_id, cursor.lastrowid + 1))
+
+
+async def delete_scheduled_actions(connection, ids):
+    """Delete fired or cancelled timers. Returns True on success."""
+    try:
+        async with acquire_connection(connection) as conn:
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                await conn.execute(
+                    f"DELETE FROM scheduled_actions WHERE id IN ({', '.join('?' * len(chunk))})",
+                    chunk
+                )
+            await conn.commit()
+        return True
+    except Exception as e:
+        log.error("Failed to delete %s timers: %s", len(ids), e)
+        return False
+
+
+async def get_scheduled_actions(connection):
+    """
+    Return every stored timer.
+
+    Returns:
+        List of (id, action, guild_id, user_id, expires_at, data) tuples
+    """
+    async with acquire_connection(connection) as conn:
+        cursor = await conn.execute(
+            "SELECT id, action, guild_id, user_id, expires_at, data FROM scheduled_actions"
+        )
+        rows = await cursor.fetchall()
+        return [tuple(row) for row in rows]
+
+
+async def get_afk_statuses(connection):
+    """
+    Return every stored AFK status.
+
+    Returns:
+        List of (guild_id, user_id, reason, since) tuples
+    """
+    async with acquire_connection(connection) as conn:
+        cursor = await conn.execute("SELECT guild_id, user_id, reason, since FROM afk")
+        rows = await cursor.fetchall()
+        return [tuple(row) for row in rows]
+
+
+async def save_afk_changes(connection, upserts, deletes):
+    """
+    Apply a batch of AFK changes in one transaction.
+
+    Args:
+        upserts: (guild_id, user_id, reason, since) tuples
+        deletes: (guild_id, user_id) tuples
+
+    Returns:
+        True if the write succeeded
+    """
+    try:
+        async with acquire_connection(connection) as conn:
+            try:
+                if deletes:
+                    await conn.executemany("DELETE FROM afk WHERE guild_id = ? AND user_id = ?", deletes)
+                if upserts:
+                    await conn.executemany(
+                        "INSERT OR REPLACE INTO afk (guild_id, user_id, reason, since) VALUES (?, ?, ?, ?)",
+                        upserts
+                    )
+                await conn.commit()
+            except Exception:
+                await conn.rollback()
+                raise
+        return True
+    except Exception as e:
+        log.error("Failed to save %s AFK changes: %s", len(upserts) + len(deletes), e)
+        return False
@@ -0,0 +1,218 @@
+"""
+Database Connection Pool for Ryujin Bot
+Lets database work from different guilds run in parallel instead of
+queueing behind one shared connection.
+"""
+
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
+
+class PoolTimeoutError(Exception):
+    """Raised when no connection becomes available within the acquire timeout."""
+
+
+class PoolClosedError(Exception):
+    """Raised when acquiring from a pool that has been closed."""
+
+
+async def _default_health_check(connection):
+    cursor = await connection.execute("SELECT 1")
+    await cursor.fetchone()
+
+
+class ConnectionPool:
+    """
+    Async connection pool.
+
+    Args:
+        connect: Async callable (or callable returning an awaitable) that
+            opens a new connection, e.g. `lambda: aiosqlite.connect(path)`
+        min_size: Connections opened by `open()` and kept warm
+        max_size: Maximum number of connections checked out at once
+        acquire_timeout: Seconds to wait for a free connection before
+            raising PoolTimeoutError
+        health_check: Async callable run against a connection before it is
+            handed out again; raising means the connection is replaced
+        health_check_interval: Only health check connections that have been
+            idle at least this many seconds (or that saw an error)
+    """
+
+    def __init__(
+        self,
+        connect,
+        min_size=1,
+        max_size=10,
+        acquire_timeout=10.0,
+        health_check=_default_health_check,
+        health_check_interval=30.0
+    ):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError("Pool sizes must satisfy 0 <= min_size <= max_size and max_size >= 1")
+
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.acquire_timeout = acquire_timeout
+        self.health_check = health_check
+        self.health_check_interval = health_check_interval
+
+        self._slots = asyncio.Semaphore(max_size)
+        self._idle = deque()  # (connection, released_at)
+        self._size = 0
+        self._closed = False
+
+        # Metrics, see stats()
+        self.acquires = 0
+        self.timeouts = 0
+        self.created = 0
+        self.discarded = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self._recent_waits = deque(maxlen=1000)
+
+    async def open(self):
+        """Open `min_size` connections up front."""
+        while self._size < self.min_size:
+            connection = await self._create()
+            self._idle.append((connection, time.monotonic()))
+        return self
+
+    async def _create(self):
+        connection = await self._connect()
+        self._size += 1
+        self.created += 1
+        return connection
+
+    async def _discard(self, connection):
+        self._size -= 1
+        self.discarded += 1
+        try:
+            await connection.close()
+        except Exception:
+            pass
+
+    async def _is_healthy(self, connection):
+        if self.health_check is None:
+            return True
+        try:
+            await self.health_check(connection)
+            return True
+        except Exception:
+            return False
+
+    async def _checkout(self):
+        while self._idle:
+            connection, released_at = self._idle.pop()
+            if time.monotonic() - released_at < self.health_check_interval:
+                return connection
+            if await self._is_healthy(connection):
+                return connection
+            await self._discard(connection)
+
+        return await self._create()
+
+    async def _checkin(self, connection, broken=False):
+        if self._closed:
+            await self._discard(connection)
+            return
+
+        # A connection that raised is health checked on its next checkout
+        released_at = float("-inf") if broken else time.monotonic()
+        self._idle.append((connection, released_at))
+
+    @asynccontextmanager
+    async def acquire(self):
+        """
+        Check out a connection for the duration of an `async with` block.
+
+        Raises:
+            PoolTimeoutError: No connection was free within `acquire_timeout`
+            PoolClosedError: The pool has been closed
+        """
+        if self._closed:
+            raise PoolClosedError("Connection pool is closed")
+
+        start = time.monotonic()
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.acquire_timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise PoolTimeoutError(
+                f"Timed out after {self.acquire_timeout}s waiting for a database connection"
+            ) from None
+
+        try:
+            connection = await self._checkout()
+        except BaseException:
+            self._slots.release()
+            raise
+
+        waited = time.monotonic() - start
+        self.acquires += 1
+        self.total_wait += waited
+        self.max_wait = max(self.max_wait, waited)
+        self._recent_waits.append(waited)
+
+        broken = False
+        try:
+            yield connection
+        except BaseException:
+            broken = True
+            raise
+        finally:
+            try:
+                await self._checkin(connection, broken)
+            finally:
+                self._slots.release()
+
+    async def close(self):
+        """Close every idle connection; busy ones are closed when released."""
+        self._closed = True
+        while self._idle:
+            connection, _ = self._idle.pop()
+            await self._discard(connection)
+
+    @property
+    def size(self):
+        return self._size
+
+    @property
+    def idle(self):
+        return len(self._idle)
+
+    def stats(self):
+        """Return pool size and per-acquire wait-time metrics (in seconds)."""
+        waits = sorted(self._recent_waits)
+        p95 = waits[int(len(waits) * 0.95) - 1] if waits else 0.0
+        return {
+            "size": self._size,
+            "idle": len(self._idle),
+            "in_use": self._size - len(self._idle),
+            "acquires": self.acquires,
+            "timeouts": self.timeouts,
+            "created": self.created,
+            "discarded": self.discarded,
+            "avg_wait": self.total_wait / self.acquires if self.acquires else 0.0,
+            "p95_wait": p95,
+            "max_wait": self.max_wait,
+        }
+
+
+@asynccontextmanager
+async def _borrow(connection):
+    yield connection
+
+
+def acquire_connection(connection):
+    """
+    Return an async context manager yielding a usable connection.
+
+    Accepts either a `ConnectionPool` or a plain connection, so helpers keep
+    working whichever one `self.bot.connection` is.
+    """
+    if isinstance(connection, ConnectionPool):
+        return connection.acquire()
+    return _borrow(connection)
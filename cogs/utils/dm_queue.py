@@ -0,0 +1,361 @@
+"""
+DM Queue for Ryujin Bot
+Sends DMs in the background without tripping Discord's rate limits.
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import random
+import time
+from collections import deque
+
+log = logging.getLogger(__name__)
+
+# Priority lanes, lowest first
+MODERATION = 0
+NORMAL = 1
+COSMETIC = 2
+
+# Delivery results passed to status callbacks
+SENT = "sent"
+FORBIDDEN = "forbidden"  # DMs closed / no shared server, never retried
+FAILED = "failed"        # gave up after max_attempts
+
+
+class TokenBucket:
+    """
+    `rate` tokens per `per` seconds, holding at most `capacity` tokens.
+
+    At most `capacity + rate` requests can pass in any `per`-second window,
+    so keep that sum under the limit being respected.
+    """
+
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate, per, capacity=None):
+        self.rate = rate / per
+        self.capacity = capacity if capacity is not None else rate
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def delay(self, now):
+        """Seconds until a token is available (0 if one is available now)."""
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self, now):
+        self._refill(now)
+        self.tokens -= 1
+
+    def full(self, now):
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+
+class _Job:
+    __slots__ = ("target", "kwargs", "priority", "route", "on_status", "future", "attempts")
+
+    def __init__(self, target, kwargs, priority, route, on_status, future):
+        self.target = target
+        self.kwargs = kwargs
+        self.priority = priority
+        self.route = route
+        self.on_status = on_status
+        self.future = future
+        self.attempts = 0
+
+
+class DMQueue:
+    """
+    Background DM dispatcher.
+
+    Every DM goes through two token buckets: one for its route (the
+    recipient's DM channel) and one shared global bucket, so a mass action
+    is paced instead of hitting 429s. Jobs wait in priority lanes, so
+    moderation notices go out ahead of cosmetic DMs queued earlier. A job
+    whose route is out of tokens is parked until it refills, without
+    holding up other recipients.
+
+    Transient failures (429, 5xx, network errors) are retried with
+    exponential backoff and jitter; a 403 means the user can't be DMed and
+    is reported straight away.
+
+    Usage:
+        bot.dm_queue = DMQueue()
+        bot.dm_queue.start()
+
+        bot.dm_queue.send(user, embed=dm_embed, priority=MODERATION, on_status=callback)
+
+    The defaults stay under Discord's 50/s global and 5 per 5s per-channel
+    limits.
+
+    Args:
+        global_rate: DMs per `global_per` seconds across all recipients
+        global_per: Global bucket window in seconds
+        global_burst: Global bucket capacity
+        route_rate: DMs per `route_per` seconds to one recipient
+        route_per: Per-route bucket window in seconds
+        route_burst: Per-route bucket capacity
+        concurrency: Sends in flight at once
+        max_attempts: Attempts before a DM is reported as FAILED
+        base_delay: First retry delay in seconds (doubles every attempt)
+        max_delay: Longest retry delay in seconds
+    """
+
+    def __init__(
+        self,
+        global_rate=40,
+        global_per=1.0,
+        global_burst=10,
+        route_rate=4,
+        route_per=5.0,
+        route_burst=1,
+        concurrency=10,
+        max_attempts=4,
+        base_delay=1.0,
+        max_delay=30.0
+    ):
+        self.global_bucket = TokenBucket(global_rate, global_per, global_burst)
+        self.route_rate = route_rate
+        self.route_per = route_per
+        self.route_burst = route_burst
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        self._lanes = [deque() for _ in range(COSMETIC + 1)]
+        self._delayed = []  # heap of (ready_at, seq, job)
+        self._seq = itertools.count()
+        self._routes = {}
+        self._slots = asyncio.Semaphore(concurrency)
+        self._wakeup = asyncio.Event()
+        self._sending = {}  # delivery task -> job
+        self._task = None
+        self._closed = False
+
+        # Metrics, see stats()
+        self.sent = 0
+        self.forbidden = 0
+        self.failed = 0
+        self.retries = 0
+        self.rate_limited = 0
+        self.parked = 0
+
+    def send(self, target, priority=NORMAL, on_status=None, route=None, **kwargs):
+        """
+        Queue a DM and return immediately.
+
+        Args:
+            target: Anything with an async `send(**kwargs)`, usually a User/Member
+            priority: MODERATION, NORMAL or COSMETIC
+            on_status: Optional `async def callback(status, error)`, called
+                once with SENT, FORBIDDEN or FAILED
+            route: Rate limit key (defaults to the recipient)
+            **kwargs: Passed to `target.send`
+
+        Returns:
+            A future resolving to the status. Await it if the DM must be
+            delivered before continuing (e.g. before a ban).
+        """
+        if self._closed:
+            raise RuntimeError("DM queue is closed")
+
+        future = asyncio.get_running_loop().create_future()
+        if route is None:
+            route = ("dm", getattr(target, "id", id(target)))
+        job = _Job(target, kwargs, priority, route, on_status, future)
+        self._lanes[priority].append(job)
+        self._wakeup.set()
+        return future
+
+    def start(self):
+        """Start the dispatcher task."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._dispatch())
+
+    def _route_bucket(self, route):
+        bucket = self._routes.get(route)
+        if bucket is None:
+            bucket = self._routes[route] = TokenBucket(self.route_rate, self.route_per, self.route_burst)
+        return bucket
+
+    def _pending(self):
+        return sum(len(lane) for lane in self._lanes) + len(self._delayed)
+
+    def _next_job(self, now):
+        delayed = self._delayed
+        while delayed and delayed[0][0] <= now:
+            job = heapq.heappop(delayed)[2]
+            # Retries go ahead of fresh jobs in the same lane
+            self._lanes[job.priority].appendleft(job)
+
+        for lane in self._lanes:
+            if lane:
+                return lane.popleft()
+        return None
+
+    def _park(self, job, ready_at):
+        heapq.heappush(self._delayed, (ready_at, next(self._seq), job))
+
+    async def _dispatch(self):
+        while not self._closed or self._pending():
+            now = time.monotonic()
+            job = self._next_job(now)
+            if job is None:
+                self._wakeup.clear()
+                timeout = self._delayed[0][0] - now if self._delayed else None
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            route_delay = self._route_bucket(job.route).delay(now)
+            if route_delay:
+                self.parked += 1
+                self._park(job, now + route_delay)
+                continue
+
+            global_delay = self.global_bucket.delay(now)
+            if global_delay:
+                # Put it back and wait; a more urgent job may arrive meanwhile
+                self._lanes[job.priority].appendleft(job)
+                await asyncio.sleep(global_delay)
+                continue
+
+            self._route_bucket(job.route).take(now)
+            self.global_bucket.take(now)
+
+            try:
+                await self._slots.acquire()
+            except asyncio.CancelledError:
+                # close() timed out; put the job back so it is reported
+                self._lanes[job.priority].appendleft(job)
+                raise
+            task = asyncio.create_task(self._deliver(job))
+            self._sending[task] = job
+            task.add_done_callback(self._delivered)
+            self._prune_routes(now)
+
+    def _prune_routes(self, now):
+        # Full buckets carry no state, so drop them once there are many
+        if len(self._routes) > 10000:
+            self._routes = {
+                route: bucket for route, bucket in self._routes.items()
+                if not bucket.full(now)
+            }
+
+    def _delivered(self, task):
+        self._sending.pop(task, None)
+
+    async def _deliver(self, job):
+        job.attempts += 1
+        error = None
+        try:
+            await job.target.send(**job.kwargs)
+        except Exception as e:
+            error = e
+        finally:
+            # Free the slot before the status callback, which usually makes
+            # a REST call of its own (editing a message)
+            self._slots.release()
+
+        if error is None:
+            self.sent += 1
+            await self._finish(job, SENT, None)
+            return
+
+        # nextcord.HTTPException and its subclasses carry the HTTP status
+        status = getattr(error, "status", None)
+        if status == 403:
+            self.forbidden += 1
+            await self._finish(job, FORBIDDEN, error)
+        elif status is not None and status != 429 and status < 500:
+            self.failed += 1
+            await self._finish(job, FAILED, error)
+        elif job.attempts >= self.max_attempts or self._closed:
+            self.failed += 1
+            log.warning("Giving up on DM to %s after %s attempts: %s", job.route, job.attempts, error)
+            await self._finish(job, FAILED, error)
+        else:
+            self._retry(job, error, status)
+
+    def _retry(self, job, error, status):
+        self.retries += 1
+        delay = min(self.max_delay, self.base_delay * 2 ** (job.attempts - 1))
+        delay *= random.uniform(0.5, 1.5)
+        if status == 429:
+            self.rate_limited += 1
+            delay = max(delay, getattr(error, "retry_after", 0) or 0)
+        self._park(job, time.monotonic() + delay)
+        self._wakeup.set()
+
+    async def _finish(self, job, status, error):
+        if not job.future.done():
+            job.future.set_result(status)
+        if job.on_status is not None:
+            try:
+                await job.on_status(status, error)
+            except Exception as e:
+                log.error("DM status callback failed: %s", e)
+
+    async def close(self, timeout=10):
+        """
+        Stop accepting DMs and wait up to `timeout` seconds for the rest.
+
+        Every queued DM is resolved: whatever isn't delivered in time,
+        including sends still in flight, is reported as FAILED.
+        """
+        self._closed = True
+        self._wakeup.set()
+        deadline = time.monotonic() + timeout
+        if self._task is not None:
+            try:
+                await asyncio.wait_for(asyncio.shield(self._task), timeout)
+            except asyncio.TimeoutError:
+                self._task.cancel()
+                # Let the dispatcher put back the job it was holding
+                await asyncio.gather(self._task, return_exceptions=True)
+
+        leftover = []
+        if self._sending:
+            _, pending = await asyncio.wait(self._sending, timeout=max(0, deadline - time.monotonic()))
+            if pending:
+                # Sends (or their status callbacks) that hung past the deadline
+                stuck = [self._sending[task] for task in pending]
+                for task in pending:
+                    task.cancel()
+                await asyncio.gather(*pending, return_exceptions=True)
+                leftover += [job for job in stuck if not job.future.done()]
+
+        # Anything still queued after the timeout is reported as failed
+        leftover += [job for lane in self._lanes for job in lane] + [entry[2] for entry in self._delayed]
+        for lane in self._lanes:
+            lane.clear()
+        self._delayed.clear()
+        # Reported concurrently: a status callback usually edits a message,
+        # and thousands of them one after another would stall shutdown
+        self.failed += len(leftover)
+        await asyncio.gather(*(self._finish(job, FAILED, None) for job in leftover))
+
+    def stats(self):
+        return {
+            "queued": [len(lane) for lane in self._lanes],
+            "delayed": len(self._delayed),
+            "in_flight": len(self._sending),
+            "sent": self.sent,
+            "forbidden": self.forbidden,
+            "failed": self.failed,
+            "retries": self.retries,
+            "rate_limited": self.rate_limited,
+            "parked": self.parked,
+        }
@@ -0,0 +1,147 @@
+"""
+Duration Parsing for Ryujin Bot
+Shared parser for command durations like "30m", "1d12h" or "P1DT2H".
+"""
+
+import re
+from datetime import timedelta
+from functools import lru_cache
+
+PERMANENT = frozenset({"permanent", "perm", "forever"})
+MAX_LENGTH = 64
+
+_UNIT_SECONDS = {
+    "w": 604800,
+    "d": 86400,
+    "h": 3600,
+    "m": 60,
+    "s": 1,
+}
+
+# Longest spellings first so "min" isn't read as "m" + "in"
+_UNIT_NAMES = {
+    "weeks": "w", "week": "w", "w": "w",
+    "days": "d", "day": "d", "d": "d",
+    "hours": "h", "hour": "h", "hrs": "h", "hr": "h", "h": "h",
+    "minutes": "m", "minute": "m", "mins": "m", "min": "m", "m": "m",
+    "seconds": "s", "second": "s", "secs": "s", "sec": "s", "s": "s",
+}
+_UNIT_PATTERN = "|".join(sorted(_UNIT_NAMES, key=len, reverse=True))
+
+_COMPOUND_RE = re.compile(rf"(?:\d+\s*(?:{_UNIT_PATTERN})\s*,?\s*)+")
+_PART_RE = re.compile(rf"(\d+)\s*({_UNIT_PATTERN})")
+_NUMBER_RE = re.compile(r"\d+")
+_SIMPLE_RE = re.compile(r"(\d+)([wdhms])")
+_ISO_RE = re.compile(
+    r"P(?:(?P<w>\d+)W)?(?:(?P<d>\d+)D)?"
+    r"(?:T(?=\d)(?:(?P<h>\d+)H)?(?:(?P<m>\d+)M)?(?:(?P<s>\d+(?:\.\d+)?)S)?)?"
+)
+_ISO_UNSUPPORTED_RE = re.compile(r"P(?:\d+Y|(?:\d+Y)?\d+M)", re.IGNORECASE)
+
+
+class DurationError(ValueError):
+    """Raised when a duration string can't be parsed. The message is user-facing."""
+
+
+def _to_timedelta(seconds, original):
+    if seconds <= 0:
+        raise DurationError(f"Duration `{original}` must be longer than zero.")
+    try:
+        return timedelta(seconds=seconds)
+    except OverflowError:
+        raise DurationError(f"Duration `{original}` is too long.") from None
+
+
+@lru_cache(maxsize=1024)
+def _parse(text, default_unit):
+    value = text.strip().lower()
+    if not value:
+        return None
+    if value in PERMANENT:
+        return None
+    if len(value) > MAX_LENGTH:
+        raise DurationError(f"Duration is too long (max {MAX_LENGTH} characters).")
+
+    if _NUMBER_RE.fullmatch(value):
+        return _to_timedelta(int(value) * _UNIT_SECONDS[default_unit], text)
+
+    # Fast path for the common single-unit form ("30m", "2h")
+    simple = _SIMPLE_RE.fullmatch(value)
+    if simple:
+        return _to_timedelta(int(simple[1]) * _UNIT_SECONDS[simple[2]], text)
+
+    if _COMPOUND_RE.fullmatch(value):
+        seconds = sum(
+            int(amount) * _UNIT_SECONDS[_UNIT_NAMES[unit]]
+            for amount, unit in _PART_RE.findall(value)
+        )
+        return _to_timedelta(seconds, text)
+
+    iso = _ISO_RE.fullmatch(value.upper())
+    if iso and any(iso.groupdict().values()):
+        parts = iso.groupdict(default="0")
+        seconds = (
+            int(parts["w"]) * 604800
+            + int(parts["d"]) * 86400
+            + int(parts["h"]) * 3600
+            + int(parts["m"]) * 60
+            + float(parts["s"])
+        )
+        return _to_timedelta(seconds, text)
+
+    if _ISO_UNSUPPORTED_RE.match(value):
+        raise DurationError(f"Duration `{text}` uses years or months, which aren't supported. Use weeks or days.")
+
+    raise DurationError(
+        f"Invalid duration `{text}`. Use a number with units like `30m`, `2h`, `1d12h`, `1w2d3h30m`, "
+        "an ISO-8601 duration like `P1DT2H`, or `permanent`."
+    )
+
+
+def parse_duration(text, default_unit="h"):
+    """
+    Parse a duration string.
+
+    Accepts compound durations (`1w2d3h30m15s`, `1 day 12 hours`), ISO-8601
+    durations (`P1W`, `P1DT2H30M`, `PT45S`) and bare numbers, which use
+    `default_unit`. Results are cached, so repeated inputs are free.
+
+    Args:
+        text: The duration string (may be None)
+        default_unit: Unit for bare numbers: "w", "d", "h", "m" or "s"
+
+    Returns:
+        A timedelta, or None for empty input and "permanent"/"perm"/"forever"
+
+    Raises:
+        DurationError: The string is not a valid duration
+    """
+    if text is None:
+        return None
+    if default_unit not in _UNIT_SECONDS:
+        raise ValueError(f"Unknown default unit {default_unit!r}")
+    return _parse(text, default_unit)
+
+
+def parse_durations(texts, default_unit="h"):
+    """
+    Parse many durations at once, e.g. for bulk actions.
+
+    Returns:
+        List of results in input order (timedelta or None)
+
+    Raises:
+        DurationError: One or more entries are invalid; the message lists
+            all of them, not just the first
+    """
+    results = []
+    invalid = []
+    for text in texts:
+        try:
+            results.append(parse_duration(text, default_unit))
+        except DurationError:
+            invalid.append(f"`{text}`")
+
+    if invalid:
+        raise DurationError(f"Invalid durations: {', '.join(invalid)}")
+    return results
@@ -0,0 +1,77 @@
+"""
+Embed Factory for Ryujin Bot
+Branded embeds with the standard footer and author, and cached static ones.
+"""
+
+from functools import lru_cache
+
+import nextcord
+
+RYUJIN_LOGO = "https://cdn.discordapp.com/avatars/1059400568805785620/63a77f852ea29f37961f458c53fb5a97.png"
+FOOTER_TEXT = "© Ryujin Bot (2023-2025) | {category} System"
+
+
+@lru_cache(maxsize=None)
+def _skeleton(category, author):
+    # The branding as Embed.to_dict() has it, built once per category.
+    # The footer and author dicts are shared by every embed made from it;
+    # nextcord replaces them (set_footer, set_author) and never edits them.
+    data = {"type": "rich", "footer": {"text": FOOTER_TEXT.format(category=category), "icon_url": RYUJIN_LOGO}}
+    if author:
+        data["author"] = {"name": "Ryujin", "icon_url": RYUJIN_LOGO}
+    return data
+
+
+def create_embed(category, title=None, description=None, color=None, author=True):
+    """
+    Return a new embed with the standard footer and author, copied from a
+    prebuilt skeleton for the category.
+
+    Args:
+        category: Footer category, e.g. "Moderation" for "Moderation System"
+        title: Embed title
+        description: Embed description
+        color: Embed color
+        author: Whether to add the "Ryujin" author line (DMs don't have one)
+
+    Returns:
+        A fresh nextcord.Embed the caller is free to modify
+    """
+    data = dict(_skeleton(category, author))
+    if title is not None:
+        data["title"] = title
+    if description is not None:
+        data["description"] = description
+    if color is not None:
+        data["color"] = color.value if isinstance(color, nextcord.Colour) else color
+    return nextcord.Embed.from_dict(data)
+
+
+def create_success_embed(category, title, description):
+    return create_embed(category, title, description, nextcord.Color.green())
+
+
+@lru_cache(maxsize=256)
+def static_embed(category, title, description, color=None):
+    """
+    Return a shared, prebuilt embed for content that never changes.
+
+    The same object is returned for the same arguments, so treat it as
+    read-only: use create_embed if you need to add fields.
+    """
+    return create_embed(category, title, description, color)
+
+
+def blacklist_embed(reason):
+    """Return the (shared, read-only) embed shown to blacklisted users."""
+    return static_embed(
+        "Blacklist",
+        "You are blacklisted!",
+        f"**You can't use Ryujin's commands anymore because you have been blacklisted for `{reason}`.**",
+        nextcord.Color.red()
+    )
+
+
+def permission_error_embed(category, message="You don't have permission to use this command."):
+    """Return the (shared, read-only) embed for a failed permission check."""
+    return static_embed(category, "❌ Missing Permissions", message, nextcord.Color.red())
@@ -0,0 +1,357 @@
+"""
+Expiry Scheduler for Ryujin Bot
+Persistent timers that revert temporary actions when they expire.
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from collections import deque
+
+from cogs.utils.db import add_scheduled_actions, delete_scheduled_actions, get_scheduled_actions
+
+log = logging.getLogger(__name__)
+
+# Re-read the clock at least this often, in case the wall clock jumps
+_MAX_SLEEP = 60.0
+_INSERT_CHUNK = 500
+
+
+class Timer:
+    __slots__ = ("id", "action", "guild_id", "user_id", "expires_at", "data", "attempts")
+
+    def __init__(self, id, action, guild_id, user_id, expires_at, data=None):
+        self.id = id
+        self.action = action
+        self.guild_id = guild_id
+        self.user_id = user_id
+        self.expires_at = expires_at
+        self.data = data
+        self.attempts = 0  # failed handler calls so far
+
+    @property
+    def key(self):
+        return (self.action, self.guild_id, self.user_id)
+
+    def __repr__(self):
+        return f"<Timer id={self.id} action={self.action!r} guild_id={self.guild_id} user_id={self.user_id}>"
+
+
+class ExpiryScheduler:
+    """
+    Fires handlers when temporary actions expire.
+
+    Timers live in one min-heap ordered by expiry and are stored in the
+    `scheduled_actions` table, so `load()` restores them after a restart
+    (anything that expired while the bot was down fires straight away).
+    A single task sleeps until the earliest expiry and fires everything
+    due in batches of up to `max_batch`, grouped by action: a handler
+    receives a list of timers, not one call per timer.
+
+    There is at most one timer per (action, guild, user): scheduling again
+    replaces the old one, e.g. when a timeout is extended.
+
+    Usage:
+        bot.expiry = await ExpiryScheduler(bot.connection).load()
+        bot.expiry.start()
+
+        # In a cog
+        bot.expiry.register("mute", self.unmute_expired)
+        await bot.expiry.schedule("mute", guild.id, member.id, time.time() + 3600)
+
+        # In the cog's cog_unload
+        bot.expiry.unregister("mute")
+
+    Args:
+        connection: `bot.connection`, or None to keep timers in memory only
+        max_batch: Most timers passed to handlers per wakeup
+        retry_delay: Seconds before a batch whose handler raised is retried
+            (doubles every failed attempt)
+        max_retry_delay: Longest retry delay in seconds
+        max_attempts: Failed handler calls before a timer is logged and dropped
+        lag_samples: Recent fire lags kept for stats()
+    """
+
+    def __init__(
+        self,
+        connection=None,
+        max_batch=500,
+        retry_delay=60,
+        max_retry_delay=3600,
+        max_attempts=5,
+        lag_samples=10000
+    ):
+        self.connection = connection
+        self.max_batch = max_batch
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.max_attempts = max_attempts
+
+        self._heap = []     # (expires_at, id, timer); cancelled entries are skipped when popped
+        self._timers = {}   # id -> live Timer
+        self._keys = {}     # (action, guild_id, user_id) -> id
+        self._handlers = {}
+        self._orphans = {}  # action -> due timers with no handler registered yet
+        self._local_ids = itertools.count(1)
+        self._wakeup = asyncio.Event()
+        self._task = None
+
+        # Metrics, see stats()
+        self._lags = deque(maxlen=lag_samples)
+        self.fired = 0
+        self.batches = 0
+        self.failed_batches = 0
+        self.dropped = 0
+        self.max_lag = 0.0
+
+    def register(self, action, handler):
+        """
+        Set the handler for `action`: `async def handler(timers)`.
+
+        Timers that came due before the handler was registered (e.g. loaded
+        at startup, before the cog) are fired on the next wakeup.
+        """
+        self._handlers[action] = handler
+        for timer in self._orphans.pop(action, ()):
+            if self._timers.get(timer.id) is timer:
+                heapq.heappush(self._heap, (timer.expires_at, timer.id, timer))
+        self._wakeup.set()
+
+    def unregister(self, action):
+        """
+        Remove the handler for `action`, e.g. when its cog is unloaded.
+
+        Its timers stay scheduled; any that come due are held until a
+        handler is registered again.
+        """
+        self._handlers.pop(action, None)
+
+    async def load(self):
+        """Restore stored timers. Returns self."""
+        if self.connection is None:
+            return self
+
+        for row in await get_scheduled_actions(self.connection):
+            self._add(Timer(*row))
+        heapq.heapify(self._heap)
+        log.info("Loaded %s timers", len(self._timers))
+        return self
+
+    def _add(self, timer, push=False):
+        old_id = self._keys.get(timer.key)
+        self._keys[timer.key] = timer.id
+        self._timers[timer.id] = timer
+        entry = (timer.expires_at, timer.id, timer)
+        if push:
+            heapq.heappush(self._heap, entry)
+        else:
+            self._heap.append(entry)
+        if old_id is not None and old_id != timer.id:
+            self._timers.pop(old_id, None)
+            return old_id
+        return None
+
+    async def schedule(self, action, guild_id, user_id, expires_at, data=None):
+        """
+        Schedule `action` to expire at `expires_at` (unix time).
+
+        Returns:
+            The Timer, or None if it couldn't be stored
+        """
+        timers = await self.schedule_many([(action, guild_id, user_id, expires_at, data)])
+        return timers[0] if timers else None
+
+    async def schedule_many(self, entries):
+        """
+        Schedule many timers with one write per few hundred rows.
+
+        Args:
+            entries: (action, guild_id, user_id, expires_at, data) tuples
+
+        Returns:
+            List of Timers, or None if they couldn't be stored
+        """
+        entries = list(entries)
+        if self.connection is None:
+            ids = [next(self._local_ids) for _ in entries]
+        else:
+            ids = []
+            for start in range(0, len(entries), _INSERT_CHUNK):
+                chunk_ids = await add_scheduled_actions(self.connection, entries[start:start + _INSERT_CHUNK])
+                if chunk_ids is None:
+                    if ids:
+                        await delete_scheduled_actions(self.connection, ids)
+                    return None
+                ids.extend(chunk_ids)
+
+        timers = []
+        replaced = []
+        earliest = self._heap[0][0] if self._heap else None
+        for timer_id, entry in zip(ids, entries):
+            timer = Timer(timer_id, *entry)
+            old_id = self._add(timer, push=True)
+            if old_id is not None:
+                replaced.append(old_id)
+            timers.append(timer)
+
+        if replaced and self.connection is not None:
+            await delete_scheduled_actions(self.connection, replaced)
+        self._compact()
+
+        if earliest is None or self._heap[0][0] < earliest:
+            self._wakeup.set()
+        return timers
+
+    async def cancel(self, action, guild_id, user_id):
+        """
+        Cancel a pending timer, e.g. after a manual unmute.
+
+        Returns:
+            True if a timer was cancelled; False if there was none, or if
+            it couldn't be deleted from the database (it stays pending
+            rather than firing again after a restart)
+        """
+        key = (action, guild_id, user_id)
+        timer_id = self._keys.get(key)
+        if timer_id is None:
+            return False
+        if self.connection is not None and not await delete_scheduled_actions(self.connection, [timer_id]):
+            return False
+        # It may have fired or been replaced during the delete
+        if self._keys.get(key) == timer_id:
+            del self._keys[key]
+        self._timers.pop(timer_id, None)
+        self._compact()
+        return True
+
+    def get(self, action, guild_id, user_id):
+        """Return the pending Timer for this key, or None."""
+        timer_id = self._keys.get((action, guild_id, user_id))
+        return self._timers.get(timer_id) if timer_id is not None else None
+
+    def _compact(self):
+        # Drop cancelled/replaced entries once they make up most of the heap
+        if len(self._heap) > 1024 and len(self._heap) > 2 * len(self._timers):
+            self._heap = [entry for entry in self._heap if self._timers.get(entry[1]) is entry[2]]
+            heapq.heapify(self._heap)
+
+    def start(self):
+        """Start firing timers in the background."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        while True:
+            heap = self._heap
+            if not heap:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            delay = heap[0][0] - time.time()
+            if delay > 0:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), min(delay, _MAX_SLEEP))
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            now = time.time()
+            batch = []
+            timers = self._timers
+            while heap and heap[0][0] <= now and len(batch) < self.max_batch:
+                _, timer_id, timer = heapq.heappop(heap)
+                if timers.get(timer_id) is timer:
+                    batch.append(timer)
+            if batch:
+                await self._fire(batch, now)
+
+    async def _fire(self, batch, now):
+        groups = {}
+        for timer in batch:
+            groups.setdefault(timer.action, []).append(timer)
+
+        done = []
+        dropped = []
+        for action, timers in groups.items():
+            handler = self._handlers.get(action)
+            if handler is None:
+                self._orphans.setdefault(action, []).extend(timers)
+                continue
+
+            try:
+                await handler(timers)
+            except Exception as e:
+                self.failed_batches += 1
+                log.error("Expiry handler for %r failed on %s timers: %s", action, len(timers), e)
+                dropped.extend(self._retry(action, timers))
+                continue
+
+            self.batches += 1
+            for timer in timers:
+                self._forget(timer)
+                lag = now - timer.expires_at
+                self._lags.append(lag)
+                if lag > self.max_lag:
+                    self.max_lag = lag
+                done.append(timer.id)
+
+        self.fired += len(done)
+        done.extend(dropped)
+        if done and self.connection is not None:
+            await delete_scheduled_actions(self.connection, done)
+
+    def _forget(self, timer):
+        # The handler may have rescheduled the same key; keep that one
+        if self._timers.get(timer.id) is timer:
+            del self._timers[timer.id]
+            if self._keys.get(timer.key) == timer.id:
+                del self._keys[timer.key]
+
+    def _retry(self, action, timers):
+        """Push failed timers back with backoff. Returns the ids of the ones given up on."""
+        dropped = []
+        now = time.time()
+        for timer in timers:
+            timer.attempts += 1
+            if timer.attempts >= self.max_attempts:
+                self._forget(timer)
+                dropped.append(timer.id)
+                continue
+            delay = min(self.max_retry_delay, self.retry_delay * 2 ** (timer.attempts - 1))
+            heapq.heappush(self._heap, (now + delay, timer.id, timer))
+
+        if dropped:
+            self.dropped += len(dropped)
+            log.error(
+                "Dropping %s %r timers after %s failed attempts: %s",
+                len(dropped), action, self.max_attempts, dropped
+            )
+        return dropped
+
+    def __len__(self):
+        return len(self._timers)
+
+    def stats(self):
+        """Pending timers, fire counts and recent lag (actual - scheduled fire time, seconds)."""
+        lags = sorted(self._lags)
+        return {
+            "pending": len(self._timers),
+            "fired": self.fired,
+            "batches": self.batches,
+            "failed_batches": self.failed_batches,
+            "dropped": self.dropped,
+            "lag_p50": lags[len(lags) // 2] if lags else 0.0,
+            "lag_p95": lags[int(len(lags) * 0.95)] if lags else 0.0,
+            "lag_p99": lags[int(len(lags) * 0.99)] if lags else 0.0,
+            "lag_max": self.max_lag,
+        }
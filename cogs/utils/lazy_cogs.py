@@ -0,0 +1,323 @@
+"""
+Lazy Cog Loading for Ryujin Bot
+Registers slash commands from a manifest and imports each cog on first use.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import importlib
+import importlib.util
+import inspect
+import json
+import logging
+import sys
+import time
+
+import nextcord
+from nextcord.ext import commands
+
+log = logging.getLogger(__name__)
+
+MANIFEST_VERSION = 2
+
+
+def source_hash(extension):
+    """Hash of an extension's source file, found without importing it."""
+    spec = importlib.util.find_spec(extension)
+    if spec is None or not spec.origin or not spec.has_location:
+        return None
+    with open(spec.origin, "rb") as file:
+        return hashlib.blake2b(file.read(), digest_size=16).hexdigest()
+
+
+def _dependencies(module):
+    """Modules an extension imports from, read from its globals."""
+    names = set()
+    for value in vars(module).values():
+        if inspect.ismodule(value):
+            names.add(value.__name__)
+        elif inspect.isclass(value) or inspect.isfunction(value):
+            names.add(value.__module__)
+    names.discard(module.__name__)
+    return sorted(name for name in names if isinstance(name, str) and name in sys.modules)
+
+
+def _import_dependencies(names):
+    for name in names:
+        if name in sys.modules:
+            continue
+        try:
+            importlib.import_module(name)
+        except Exception as e:
+            # load_extension reports it properly if the cog really needs it
+            log.debug("Preloading %s failed: %s", name, e)
+
+
+def describe_extension(extension):
+    """
+    Import an extension and describe its cogs for the manifest.
+
+    Command payloads are read the way nextcord reads them when a cog is
+    created, but without calling the cog's `__init__`, so no bot is needed.
+
+    A cog can't be loaded lazily if it does anything before its first
+    command: listeners, prefix commands, or work in `__init__` (set
+    `lazy_load = False` on the class for that).
+    """
+    started = time.perf_counter()
+    module = importlib.import_module(extension)
+    import_seconds = time.perf_counter() - started
+
+    entries = []
+    eager_reason = None
+    for _, cls in inspect.getmembers(module, inspect.isclass):
+        if not issubclass(cls, commands.Cog) or cls.__module__ != module.__name__:
+            continue
+        if not getattr(cls, "lazy_load", True):
+            eager_reason = eager_reason or f"{cls.__name__}.lazy_load is False"
+        elif cls.__cog_listeners__:
+            eager_reason = eager_reason or f"{cls.__name__} has listeners"
+        elif cls.__cog_commands__:
+            eager_reason = eager_reason or f"{cls.__name__} has prefix commands"
+
+        cog = cls.__new__(cls)
+        for command in cog.application_commands:
+            entries.append({
+                "payload": command.get_payload(None),
+                "guild_ids": sorted(command.guild_ids_to_rollout),
+                "default_guild_ids": command.use_default_guild_ids,
+                "force_global": command.force_global,
+            })
+
+    return {
+        "source": source_hash(extension),
+        "lazy": eager_reason is None,
+        "eager_reason": eager_reason,
+        "import_seconds": round(import_seconds, 4),
+        "dependencies": _dependencies(module),
+        "commands": entries,
+    }
+
+
+def build_manifest(extensions, path):
+    """
+    Describe every extension and write the manifest to `path`.
+    Rebuild it whenever a cog's commands change (e.g. in CI or on deploy).
+    """
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "extensions": {extension: describe_extension(extension) for extension in extensions},
+    }
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(manifest, file, indent=1, sort_keys=True)
+    return manifest
+
+
+class LazyCommand(nextcord.BaseApplicationCommand):
+    """
+    Stand-in for a command whose cog isn't loaded yet.
+
+    It has the exact payload of the real command, so syncing with Discord
+    sees no change, and it loads the cog when it is first invoked.
+    """
+
+    def __init__(self, loader, extension, entry):
+        payload = entry["payload"]
+        super().__init__(
+            name=payload["name"],
+            description=payload.get("description"),
+            cmd_type=nextcord.ApplicationCommandType(payload["type"]),
+            guild_ids=nextcord.utils.MISSING if entry["default_guild_ids"] else entry["guild_ids"],
+            force_global=entry["force_global"],
+        )
+        self.loader = loader
+        self.extension = extension
+        self._payload = payload
+
+    def get_payload(self, guild_id):
+        payload = dict(self._payload)
+        if guild_id:
+            payload["guild_id"] = guild_id
+            payload.pop("dm_permission", None)
+        return payload
+
+    async def _resolve(self, interaction):
+        await self.loader.ensure_loaded(self.extension)
+        bot = self.loader.bot
+        command = bot.get_application_command(int(interaction.data["id"]))
+        if command is None or command is self:
+            command = bot.get_application_command_from_signature(self.name, self.type, interaction.guild_id)
+        if command is None or command is self:
+            command = bot.get_application_command_from_signature(self.name, self.type, None)
+        if command is None or command is self:
+            raise RuntimeError(f"{self.extension} did not register /{self.name}")
+        return command
+
+    async def call_from_interaction(self, interaction):
+        command = await self._resolve(interaction)
+        await command.call_from_interaction(interaction)
+
+    async def call_autocomplete_from_interaction(self, interaction):
+        command = await self._resolve(interaction)
+        await command.call_autocomplete_from_interaction(interaction)
+
+
+class LazyCogLoader:
+    """
+    Loads cogs from a manifest built by `build_manifest`.
+
+    At startup each lazy cog costs one manifest lookup and a source hash:
+    its commands are registered as `LazyCommand` stand-ins and the module
+    is imported the first time one of them is used. The modules it imports
+    from (listed in the manifest) are imported in a worker thread first, so
+    the event loop only runs the cog module itself, once. Cogs that must run from the start (see
+    `describe_extension`), cogs listed in `eager`, and cogs whose source
+    changed since the manifest was built are loaded straight away.
+
+    Usage:
+        # Once per deploy
+        python -m cogs.utils.lazy_cogs cogs.moderation cogs.database -o cogs/manifest.json
+
+        # Startup
+        bot.cog_loader = LazyCogLoader(bot, "cogs/manifest.json")
+        bot.cog_loader.load(["cogs.moderation", "cogs.database"])
+        log.info(bot.cog_loader.report())
+
+    Args:
+        bot: The bot (commands.Bot)
+        manifest_path: Manifest written by `build_manifest`
+        eager: Extensions to always load at startup
+    """
+
+    def __init__(self, bot, manifest_path, eager=()):
+        self.bot = bot
+        self.eager = set(eager)
+        try:
+            with open(manifest_path, encoding="utf-8") as file:
+                manifest = json.load(file)
+        except (OSError, ValueError) as e:
+            log.warning("No usable cog manifest at %s, loading every cog eagerly: %s", manifest_path, e)
+            manifest = {}
+        if manifest and manifest.get("version") != MANIFEST_VERSION:
+            log.warning("Cog manifest %s is version %s, loading every cog eagerly", manifest_path, manifest.get("version"))
+            manifest = {}
+        self._manifest = manifest.get("extensions", {})
+
+        self._placeholders = {}  # extension -> [LazyCommand]
+        self._loading = {}       # extension -> Task, while it is being loaded
+        self._timings = {}       # extension -> timing dict, see stats()
+
+    def _eager_reason(self, extension):
+        entry = self._manifest.get(extension)
+        if extension in self.eager:
+            return "listed as eager"
+        if entry is None:
+            return "not in manifest"
+        if not entry["lazy"]:
+            return entry["eager_reason"]
+        if entry["source"] != source_hash(extension):
+            return "changed since the manifest was built"
+        return None
+
+    def load(self, extensions):
+        """Load or register every extension, in order."""
+        for extension in extensions:
+            started = time.perf_counter()
+            reason = self._eager_reason(extension)
+            if reason is None:
+                placeholders = [LazyCommand(self, extension, entry) for entry in self._manifest[extension]["commands"]]
+                for placeholder in placeholders:
+                    self.bot.add_application_command(placeholder, use_rollout=True)
+                self._placeholders[extension] = placeholders
+                mode = "lazy"
+            else:
+                self.bot.load_extension(extension)
+                mode = "eager"
+            self._timings[extension] = {
+                "mode": mode,
+                "reason": reason,
+                "startup": time.perf_counter() - started,
+                "first_use": None,
+                "commands": len(self._manifest.get(extension, {}).get("commands", ())),
+            }
+
+    def is_loaded(self, extension):
+        return extension not in self._placeholders
+
+    async def ensure_loaded(self, extension):
+        """Load a lazy extension now. Concurrent callers share one load."""
+        if extension not in self._placeholders:
+            return
+        task = self._loading.get(extension)
+        if task is None:
+            task = self._loading[extension] = asyncio.create_task(self._load(extension))
+            task.add_done_callback(lambda _: self._loading.pop(extension, None))
+        await asyncio.shield(task)
+
+    async def _load(self, extension):
+        started = time.perf_counter()
+        # Warms sys.modules with the cog's dependencies off the event loop.
+        # Not the cog module itself: load_extension executes a fresh copy
+        # of it anyway, so importing it here would run it twice.
+        await asyncio.to_thread(_import_dependencies, self._manifest[extension]["dependencies"])
+
+        placeholders = self._placeholders[extension]
+        for placeholder in placeholders:
+            # Client has no public remove; this is what Client.remove_cog does
+            self.bot._connection.remove_application_command(placeholder)
+        try:
+            self.bot.load_extension(extension)
+        except Exception:
+            for placeholder in placeholders:
+                self.bot.add_application_command(placeholder, use_rollout=True)
+            log.exception("Lazy load of %s failed", extension)
+            raise
+
+        # Hand the command IDs Discord gave the stand-ins to the real commands
+        for placeholder in placeholders:
+            for guild_id, command_id in placeholder.command_ids.items():
+                command = self.bot.get_application_command_from_signature(placeholder.name, placeholder.type, guild_id)
+                if command is not None:
+                    command.parse_discord_response(placeholder._state, {"id": command_id, "guild_id": guild_id})
+                    self.bot.add_application_command(command, use_rollout=True)
+
+        del self._placeholders[extension]
+        seconds = time.perf_counter() - started
+        self._timings[extension]["first_use"] = seconds
+        log.info("Lazy loaded %s in %.1fms", extension, seconds * 1000)
+
+    async def load_all(self):
+        """Load every remaining lazy extension (e.g. once the bot is idle)."""
+        for extension in list(self._placeholders):
+            await self.ensure_loaded(extension)
+
+    def stats(self):
+        """Per-extension mode, startup seconds and first-use load seconds."""
+        return {extension: dict(timing) for extension, timing in self._timings.items()}
+
+    def report(self):
+        """Startup timing report, one line per extension, slowest first."""
+        lines = [f"{'extension':<40} {'mode':<6} {'startup ms':>10} {'first use ms':>12}  note"]
+        timings = sorted(self._timings.items(), key=lambda item: item[1]["startup"], reverse=True)
+        for extension, timing in timings:
+            first_use = f"{timing['first_use'] * 1000:12.1f}" if timing["first_use"] is not None else f"{'-':>12}"
+            lines.append(
+                f"{extension:<40} {timing['mode']:<6} {timing['startup'] * 1000:10.2f} {first_use}  {timing['reason'] or ''}"
+            )
+        lazy = sum(1 for timing in self._timings.values() if timing["mode"] == "lazy")
+        total = sum(timing["startup"] for timing in self._timings.values())
+        lines.append(f"{len(self._timings)} cogs ({lazy} lazy) in {total * 1000:.1f}ms")
+        return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the lazy cog manifest")
+    parser.add_argument("extensions", nargs="+", help="Extension modules, e.g. cogs.moderation")
+    parser.add_argument("-o", "--output", default="cogs/manifest.json")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    manifest = build_manifest(args.extensions, args.output)
+    for extension, entry in manifest["extensions"].items():
+        note = "lazy" if entry["lazy"] else f"eager ({entry['eager_reason']})"
+        print(f"{extension}: {len(entry['commands'])} commands, {note}")
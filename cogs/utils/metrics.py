@@ -0,0 +1,340 @@
+"""
+Metrics Registry for Ryujin Bot
+Counters, gauges and histograms kept up to date from gateway events.
+"""
+
+import asyncio
+import logging
+import time
+from bisect import bisect_left
+
+log = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labelnames, labelvalues, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, labelvalues)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+
+    def _key(self, labels):
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(labels[name] for name in self.labelnames)
+
+    def _render_header(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    """A value that only goes up, e.g. commands run."""
+
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+    def total(self):
+        """Sum over every label combination."""
+        return sum(self._values.values())
+
+    def render(self):
+        lines = self._render_header()
+        for key, value in self._values.items():
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Gauge(_Metric):
+    """A value that goes up and down, e.g. guild count."""
+
+    kind = "gauge"
+
+    def __init__(self, name, help, labelnames=()):
+        super().__init__(name, help, labelnames)
+        self._functions = {}
+
+    def set(self, value, **labels):
+        self._values[self._key(labels)] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set_function(self, function, **labels):
+        """Compute the value when read, for things that are already O(1) to get (e.g. bot.latency)."""
+        self._functions[self._key(labels)] = function
+
+    def value(self, **labels):
+        key = self._key(labels)
+        function = self._functions.get(key)
+        if function is not None:
+            return function()
+        return self._values.get(key, 0)
+
+    def render(self):
+        lines = self._render_header()
+        values = dict(self._values)
+        for key, function in self._functions.items():
+            try:
+                values[key] = function()
+            except Exception as e:
+                log.warning("Gauge %s failed to compute: %s", self.name, e)
+        for key, value in values.items():
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram(_Metric):
+    """Distribution of observed values (e.g. latency) in fixed buckets."""
+
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        state = self._values.get(key)
+        if state is None:
+            # Per-bucket (non-cumulative) counts, then +Inf, sum, count
+            state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        state[0][bisect_left(self.buckets, value)] += 1
+        state[1] += value
+        state[2] += 1
+
+    def count(self, **labels):
+        state = self._values.get(self._key(labels))
+        return state[2] if state else 0
+
+    def mean(self, **labels):
+        state = self._values.get(self._key(labels))
+        return state[1] / state[2] if state and state[2] else 0.0
+
+    def quantile(self, q, **labels):
+        """
+        Estimate a quantile from the buckets, interpolating linearly inside
+        the bucket it falls in (like Prometheus' histogram_quantile).
+        """
+        state = self._values.get(self._key(labels))
+        if not state or not state[2]:
+            return 0.0
+        target = q * state[2]
+        seen = 0
+        lower = 0.0
+        for bound, count in zip(self.buckets, state[0]):
+            if count and seen + count >= target:
+                return lower + (bound - lower) * (target - seen) / count
+            seen += count
+            lower = bound
+        # Above the largest bucket: its bound is the best estimate available
+        return self.buckets[-1]
+
+    def render(self):
+        lines = self._render_header()
+        for key, (counts, total, count) in self._values.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(float(bound))}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Named metrics, readable in O(1) and exportable as Prometheus text.
+
+    `counter`, `gauge` and `histogram` return the existing metric if one
+    with that name was already registered, so cogs can call them freely.
+    """
+
+    def __init__(self):
+        self._metrics = {}
+
+    def _register(self, cls, name, help, labelnames, **kwargs):
+        metric = self._metrics.get(name)
+        if metric is None:
+            metric = self._metrics[name] = cls(name, help, labelnames, **kwargs)
+        elif not isinstance(metric, cls):
+            raise ValueError(f"Metric {name} is already registered as a {metric.kind}")
+        return metric
+
+    def counter(self, name, help, labelnames=()):
+        return self._register(Counter, name, help, labelnames)
+
+    def gauge(self, name, help, labelnames=()):
+        return self._register(Gauge, name, help, labelnames)
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram, name, help, labelnames, buckets=buckets)
+
+    def get(self, name):
+        return self._metrics.get(name)
+
+    def render(self):
+        """Return every metric in the Prometheus text exposition format."""
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+
+class GatewayMetrics:
+    """
+    Keeps bot-wide gauges and counters current from gateway events, so
+    `botstats` never walks the guild or user caches.
+
+    Guild and member counts are taken once per `on_ready` (O(guilds), not
+    O(users)) and then adjusted by join/leave events. Member counts need
+    the members intent for on_member_join/remove.
+
+    Usage:
+        bot.metrics = GatewayMetrics(bot)
+        await bot.metrics.start_http_server(port=9108)  # optional
+
+        bot.metrics.registry.get("ryujin_guilds").value()
+
+    Args:
+        bot: The bot to attach listeners to
+        registry: MetricsRegistry to record into
+    """
+
+    def __init__(self, bot, registry=registry):
+        self.bot = bot
+        self.registry = registry
+        self.start_time = time.time()
+        self._server = None
+
+        self.guilds = registry.gauge("ryujin_guilds", "Guilds the bot is in")
+        self.members = registry.gauge("ryujin_members", "Members across all guilds (sum of member counts)")
+        self.application_commands = registry.gauge("ryujin_application_commands", "Registered application commands")
+        self.cogs = registry.gauge("ryujin_cogs", "Loaded cogs")
+        self.latency = registry.gauge("ryujin_gateway_latency_seconds", "Gateway heartbeat latency")
+        self.uptime = registry.gauge("ryujin_uptime_seconds", "Seconds since the metrics were attached")
+        self.commands = registry.counter(
+            "ryujin_commands_total", "Application commands run", ("command", "status")
+        )
+        self.command_latency = registry.histogram(
+            "ryujin_command_latency_seconds", "Time from interaction creation to command completion", ("command",)
+        )
+        self.guild_events = registry.counter("ryujin_guild_events_total", "Guild joins and leaves", ("event",))
+
+        self.latency.set_function(lambda: bot.latency)
+        self.uptime.set_function(lambda: time.time() - self.start_time)
+        self.cogs.set_function(lambda: len(bot.cogs))
+
+        for listener in (
+            self.on_ready,
+            self.on_guild_join,
+            self.on_guild_remove,
+            self.on_member_join,
+            self.on_member_remove,
+            self.on_application_command_completion,
+            self.on_application_command_error,
+        ):
+            bot.add_listener(listener, listener.__name__)
+
+    async def on_ready(self):
+        # Fires again after a full reconnect, so always take absolute values
+        guilds = self.bot.guilds
+        self.guilds.set(len(guilds))
+        self.members.set(sum(guild.member_count or 0 for guild in guilds))
+        self.application_commands.set(len(self.bot.get_all_application_commands()))
+
+    async def on_guild_join(self, guild):
+        self.guild_events.inc(event="join")
+        self.guilds.inc()
+        self.members.inc(guild.member_count or 0)
+
+    async def on_guild_remove(self, guild):
+        self.guild_events.inc(event="leave")
+        self.guilds.dec()
+        self.members.dec(guild.member_count or 0)
+
+    async def on_member_join(self, member):
+        self.members.inc()
+
+    async def on_member_remove(self, member):
+        self.members.dec()
+
+    def _record_command(self, interaction, status):
+        command = interaction.application_command
+        name = getattr(command, "qualified_name", None) or getattr(command, "name", None) or "unknown"
+        self.commands.inc(command=name, status=status)
+        self.command_latency.observe(time.time() - interaction.created_at.timestamp(), command=name)
+
+    async def on_application_command_completion(self, interaction):
+        self._record_command(interaction, "ok")
+
+    async def on_application_command_error(self, interaction, error):
+        self._record_command(interaction, "error")
+
+    async def start_http_server(self, host="127.0.0.1", port=9108):
+        """Serve `GET /metrics` in Prometheus text format on a local port."""
+        self._server = await asyncio.start_server(self._handle_http, host, port)
+        log.info("Serving metrics on http://%s:%s/metrics", host, port)
+        return self._server
+
+    async def _handle_http(self, reader, writer):
+        try:
+            request = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), timeout=5)
+            method, path = request.split(b" ", 2)[:2]
+            if method == b"GET" and path.split(b"?")[0] == b"/metrics":
+                status, content_type = "200 OK", "text/plain; version=0.0.4; charset=utf-8"
+                body = self.registry.render().encode()
+            else:
+                status, content_type, body = "404 Not Found", "text/plain", b"Not Found\n"
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+            )
+            await writer.drain()
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
@@ -0,0 +1,340 @@
+"""
+Nightcore Engine for Ryujin Bot
+Speed and pitch processing in worker processes, streamed to voice.
+"""
+
+import asyncio
+import logging
+import math
+import os
+import queue
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import nextcord
+import numpy as np
+
+from cogs.utils.render_cache import render_key
+
+log = logging.getLogger(__name__)
+
+# Discord voice PCM: 48 kHz, 16-bit, stereo, 20 ms frames
+SAMPLE_RATE = 48000
+CHANNELS = 2
+FRAME_SAMPLES = 960
+FRAME_BYTES = FRAME_SAMPLES * CHANNELS * 2
+
+# Grain size for pitch shifting (~43 ms); grains overlap by half
+GRAIN = 2048
+HOP = GRAIN // 2
+_WINDOW = np.hanning(GRAIN + 1)[:-1].astype(np.float32)  # periodic Hann, sums to 1 at 50% overlap
+
+
+def _interpolate(samples, positions):
+    # Linear interpolation of (n, channels) samples at fractional positions
+    index = positions.astype(np.int64)
+    frac = (positions - index).astype(np.float32)[..., None]
+    np.clip(index, 0, len(samples) - 2, out=index)
+    left = samples[index]
+    right = samples[index + 1]
+    return left + (right - left) * frac
+
+
+def input_range(out_start, out_end, speed, pitch):
+    """
+    Return the input sample range [start, end) needed to render output
+    samples [out_start, out_end).
+    """
+    if speed == pitch:
+        return math.floor(out_start * speed), math.floor((out_end - 1) * speed) + 2
+
+    first_grain = max(0, (out_start - GRAIN) // HOP + 1)
+    last_grain = (out_end - 1) // HOP
+    start = math.floor(first_grain * HOP * speed)
+    end = math.floor(last_grain * HOP * speed + (GRAIN - 1) * pitch) + 2
+    return start, end
+
+
+def render_chunk(samples, offset, out_start, out_end, speed, pitch):
+    """
+    Render output samples [out_start, out_end) of a nightcore track.
+
+    Runs in a worker process. Every chunk is computed from global sample
+    positions, so chunks can be rendered in any order or in parallel and
+    still join without clicks.
+
+    Args:
+        samples: int16 array of shape (n, CHANNELS) covering `input_range`
+        offset: Input sample index of `samples[0]`
+        out_start: First output sample
+        out_end: Output sample to stop at (exclusive)
+        speed: Tempo multiplier
+        pitch: Pitch multiplier
+
+    Returns:
+        Tuple of (interleaved int16 PCM bytes, CPU seconds spent)
+    """
+    started = time.process_time()
+    audio = np.asarray(samples, dtype=np.float32)
+    # Pad so interpolation past the end of the track reads silence
+    audio = np.concatenate([audio, np.zeros((2, CHANNELS), dtype=np.float32)])
+
+    if speed == pitch:
+        # Classic nightcore: plain resampling, tempo and pitch move together
+        positions = np.arange(out_start, out_end, dtype=np.float64) * speed - offset
+        out = _interpolate(audio, positions)
+    else:
+        # Granular pitch shift: every grain is read `pitch` times faster,
+        # grains start `speed` times further apart than they are played
+        first_grain = max(0, (out_start - GRAIN) // HOP + 1)
+        last_grain = (out_end - 1) // HOP
+        grains = np.arange(first_grain, last_grain + 1, dtype=np.float64)
+        steps = np.arange(GRAIN, dtype=np.float64) * pitch
+        positions = (grains * HOP * speed - offset)[:, None] + steps[None, :]
+        windowed = _interpolate(audio, positions) * _WINDOW[None, :, None]
+
+        # 50% overlap: each hop is the first half of one grain plus the
+        # second half of the one before it
+        hops = len(grains) + 1
+        mixed = np.zeros((hops, HOP, CHANNELS), dtype=np.float32)
+        mixed[:-1] += windowed[:, :HOP]
+        mixed[1:] += windowed[:, HOP:]
+        mixed = mixed.reshape(-1, CHANNELS)
+
+        start = out_start - first_grain * HOP
+        out = mixed[start:start + (out_end - out_start)]
+
+    np.clip(out, -32768, 32767, out=out)
+    pcm = out.astype("<i2").tobytes()
+    return pcm, time.process_time() - started
+
+
+async def load_pcm(source, max_seconds=600):
+    """
+    Decode any file or URL ffmpeg can read into 48 kHz stereo int16 PCM.
+
+    Returns:
+        int16 array of shape (n, CHANNELS)
+    """
+    process = await asyncio.create_subprocess_exec(
+        "ffmpeg", "-nostdin", "-loglevel", "error",
+        "-i", source,
+        "-t", str(max_seconds),
+        "-f", "s16le", "-ar", str(SAMPLE_RATE), "-ac", str(CHANNELS),
+        "pipe:1",
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE
+    )
+    stdout, stderr = await process.communicate()
+    if process.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed: {stderr.decode(errors='replace').strip()}")
+    usable = len(stdout) - len(stdout) % (CHANNELS * 2)
+    return np.frombuffer(stdout[:usable], dtype="<i2").reshape(-1, CHANNELS)
+
+
+class NightcoreEngine:
+    """
+    Shared process pool for nightcore rendering.
+
+    Tracks are split into chunks that are rendered in worker processes, so
+    the event loop never does DSP work and several tracks can be processed
+    at once, one chunk per core.
+
+    With a RenderCache, finished renders are stored on disk and replayed
+    from there the next time the same source is requested with the same
+    settings.
+
+    Usage:
+        bot.nightcore = NightcoreEngine(cache=RenderCache("cache/renders"))
+
+        pcm = await load_pcm(attachment.url)
+        source_hash = await asyncio.to_thread(hash_source, pcm)
+        voice_client.play(bot.nightcore.stream(pcm, 1.25, 1.25, source_hash=source_hash))
+
+    Args:
+        max_workers: Worker processes (defaults to the CPU count)
+        chunk_seconds: Audio per chunk
+        max_buffered: Chunks per stream rendered ahead of playback
+        cache: Optional RenderCache for finished renders
+    """
+
+    def __init__(self, max_workers=None, chunk_seconds=1.0, max_buffered=4, cache=None):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.chunk_samples = int(chunk_seconds * SAMPLE_RATE) // FRAME_SAMPLES * FRAME_SAMPLES
+        self.max_buffered = max_buffered
+        self.cache = cache
+        self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+
+        # Metrics, see stats()
+        self.chunks = 0
+        self.audio_seconds = 0.0
+        self.cpu_seconds = 0.0
+        self.underruns = 0
+
+    def submit(self, pcm, out_start, out_end, speed, pitch):
+        """Render one chunk in the pool. Returns a concurrent.futures.Future."""
+        start, end = input_range(out_start, out_end, speed, pitch)
+        start = max(0, start)
+        return self._pool.submit(render_chunk, pcm[start:end], start, out_start, out_end, speed, pitch)
+
+    def stream(self, pcm, speed=1.25, pitch=None, source_hash=None):
+        """
+        Return an AudioSource that plays `pcm` as nightcore.
+
+        Playback starts as soon as the first chunk is rendered; the rest
+        are rendered while it plays. Pass `source_hash` (see
+        `render_cache.hash_source`) to use the engine's cache.
+        """
+        pitch = pitch or speed
+        writer = None
+        if self.cache is not None and source_hash is not None:
+            key = render_key(source_hash, speed, pitch)
+            render = self.cache.get(key)
+            if render is not None:
+                return CachedRenderSource(render)
+            writer = self.cache.writer(key)
+        return NightcoreSource(self, pcm, speed, pitch, writer)
+
+    def _record(self, seconds, cpu_seconds):
+        self.chunks += 1
+        self.audio_seconds += seconds
+        self.cpu_seconds += cpu_seconds
+
+    def close(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self):
+        return {
+            "workers": self.max_workers,
+            "chunks": self.chunks,
+            "audio_seconds": self.audio_seconds,
+            "cpu_seconds": self.cpu_seconds,
+            # Seconds of audio rendered per CPU second, i.e. per core
+            "realtime_factor": self.audio_seconds / self.cpu_seconds if self.cpu_seconds else 0.0,
+            "underruns": self.underruns,
+        }
+
+
+class NightcoreSource(nextcord.AudioSource):
+    """
+    Streams a nightcore track to a voice client.
+
+    A feeder task on the event loop submits chunks to the pool, but only
+    while fewer than `max_buffered` chunks are waiting to be played. The
+    voice thread's `read()` hands back a slot as it finishes each chunk,
+    so rendering never runs far ahead of playback (backpressure), and
+    only a few seconds of output are held in memory.
+
+    With a cache writer, every chunk is also written to the cache; the
+    entry is committed only if the whole track was rendered.
+    """
+
+    def __init__(self, engine, pcm, speed, pitch, writer=None):
+        self.engine = engine
+        self.pcm = pcm
+        self.speed = speed
+        self.pitch = pitch
+        self._writer = writer
+        self.total_samples = int(len(pcm) / speed)
+
+        self._loop = asyncio.get_running_loop()
+        self._slots = asyncio.Semaphore(engine.max_buffered)
+        self._chunks = queue.Queue()  # render futures in playback order, then None
+        self._current = b""
+        self._position = 0
+        self._finished = False
+        self._feeder = asyncio.create_task(self._feed())
+
+    async def _feed(self):
+        chunk = self.engine.chunk_samples
+        try:
+            for out_start in range(0, self.total_samples, chunk):
+                await self._slots.acquire()
+                out_end = min(out_start + chunk, self.total_samples)
+                self._chunks.put(self.engine.submit(self.pcm, out_start, out_end, self.speed, self.pitch))
+        finally:
+            self._chunks.put(None)
+
+    def _next_chunk(self):
+        future = self._chunks.get()
+        if future is None:
+            return None
+        if not future.done():
+            self.engine.underruns += 1
+        pcm, cpu_seconds = future.result()
+        self.engine._record(len(pcm) / (CHANNELS * 2 * SAMPLE_RATE), cpu_seconds)
+        self._loop.call_soon_threadsafe(self._slots.release)
+        if self._writer is not None:
+            self._writer.write(pcm)
+        return pcm
+
+    def _close_writer(self, complete):
+        writer, self._writer = self._writer, None
+        if writer is not None:
+            # The cache index belongs to the event loop
+            self._loop.call_soon_threadsafe(writer.commit if complete else writer.abort)
+
+    def read(self):
+        # Called from the voice thread every 20 ms
+        if self._finished:
+            return b""
+        while len(self._current) - self._position < FRAME_BYTES:
+            try:
+                pcm = self._next_chunk()
+                if pcm is None:
+                    self._close_writer(complete=True)
+            except Exception as e:
+                log.error("Nightcore render failed: %s", e)
+                self._close_writer(complete=False)
+                pcm = None
+            if pcm is None:
+                self._finished = True
+                frame = self._current[self._position:]
+                return frame + b"\x00" * (FRAME_BYTES - len(frame)) if frame else b""
+            self._current = self._current[self._position:] + pcm
+            self._position = 0
+
+        frame = self._current[self._position:self._position + FRAME_BYTES]
+        self._position += FRAME_BYTES
+        return frame
+
+    def is_opus(self):
+        return False
+
+    def cleanup(self):
+        self._finished = True
+        self._close_writer(complete=False)
+        self._loop.call_soon_threadsafe(self._feeder.cancel)
+        while True:
+            try:
+                future = self._chunks.get_nowait()
+            except queue.Empty:
+                break
+            if future is not None:
+                future.cancel()
+
+
+class CachedRenderSource(nextcord.AudioSource):
+    """Plays a render straight from the cache's memory map."""
+
+    def __init__(self, render):
+        self.render = render
+        self._loop = asyncio.get_running_loop()
+        self._position = 0
+
+    def read(self):
+        data = self.render.data
+        if self._position >= len(data):
+            return b""
+        frame = bytes(data[self._position:self._position + FRAME_BYTES])
+        self._position += FRAME_BYTES
+        if len(frame) < FRAME_BYTES:
+            frame += b"\x00" * (FRAME_BYTES - len(frame))
+        return frame
+
+    def is_opus(self):
+        return False
+
+    def cleanup(self):
+        # Unpins the entry; the cache index belongs to the event loop
+        self._loop.call_soon_threadsafe(self.render.close)
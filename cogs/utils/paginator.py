@@ -0,0 +1,90 @@
+"""
+Keyset Paginator for Ryujin Bot
+Button-driven paging over database rows, one page in memory at a time.
+"""
+
+import nextcord
+
+
+class KeysetPaginatorView(nextcord.ui.View):
+    """
+    Previous/Next buttons over a keyset-paginated query.
+
+    Args:
+        author_id: Only this user can press the buttons
+        fetch_page: Async callable `fetch_page(before_id)` returning
+            (rows, total_count), or None on error, e.g. a wrapper around
+            get_warnings_page
+        render_page: Async callable `render_page(rows, total_count, page_number)`
+            returning the embed to show
+        rows: Rows of the first page (already fetched by the command)
+        total_count: Total number of rows across all pages
+        page_size: Rows per page
+
+    Set `message` to the message the view was sent with, so the buttons
+    are disabled on it when the view times out.
+    """
+
+    def __init__(self, author_id, fetch_page, render_page, rows, total_count, page_size=10, timeout=120):
+        super().__init__(timeout=timeout)
+        self.author_id = author_id
+        self.fetch_page = fetch_page
+        self.render_page = render_page
+        self.rows = rows
+        self.total_count = total_count
+        self.page_size = page_size
+        self.message = None
+
+        # before_id used to load each visited page; the first page has none
+        self._cursors = [None]
+        self._update_buttons()
+
+    @property
+    def page_number(self):
+        return len(self._cursors)
+
+    @property
+    def page_count(self):
+        return max(1, -(-self.total_count // self.page_size))
+
+    def _update_buttons(self):
+        self.previous_page.disabled = self.page_number <= 1
+        self.next_page.disabled = self.page_number >= self.page_count or not self.rows
+
+    async def interaction_check(self, interaction: nextcord.Interaction):
+        if interaction.user.id != self.author_id:
+            await interaction.send("❌ Only the person who ran this command can change pages.", ephemeral=True)
+            return False
+        return True
+
+    async def _show(self, interaction, cursors):
+        page = await self.fetch_page(cursors[-1])
+        if page is None:
+            # Stay on the current page
+            await interaction.send("❌ Couldn't load that page. Please try again.", ephemeral=True)
+            return
+        rows, total_count = page
+        self._cursors = cursors
+        self.rows = rows
+        self.total_count = total_count
+        self._update_buttons()
+
+        embed = await self.render_page(rows, total_count, self.page_number)
+        await interaction.response.edit_message(embed=embed, view=self)
+
+    @nextcord.ui.button(label="◀ Previous", style=nextcord.ButtonStyle.grey)
+    async def previous_page(self, button: nextcord.ui.Button, interaction: nextcord.Interaction):
+        await self._show(interaction, self._cursors[:-1])
+
+    @nextcord.ui.button(label="Next ▶", style=nextcord.ButtonStyle.grey)
+    async def next_page(self, button: nextcord.ui.Button, interaction: nextcord.Interaction):
+        await self._show(interaction, self._cursors + [self.rows[-1][0]])
+
+    async def on_timeout(self):
+        for child in self.children:
+            child.disabled = True
+        if self.message is not None:
+            try:
+                await self.message.edit(view=self)
+            except nextcord.HTTPException:
+                pass  # deleted, or the interaction token expired
@@ -0,0 +1,190 @@
+"""
+Phase Timing for Ryujin Bot
+Per-phase latency of commands (blacklist, checks, database, ad, send).
+"""
+
+import contextvars
+import functools
+import time
+from collections import deque
+
+from cogs.utils.metrics import registry as default_registry
+
+# Finer than the default buckets: most phases take well under 100 ms
+PHASE_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+    0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+_current = contextvars.ContextVar("phase_trace", default=None)
+
+
+class Trace:
+    """Phase timings of one command invocation."""
+
+    __slots__ = ("command", "started", "phases")
+
+    def __init__(self, command):
+        self.command = command
+        self.started = time.perf_counter()
+        self.phases = []  # (name, seconds) in the order they finished
+
+
+class phase:
+    """
+    Time a block as one phase of the running command:
+
+        with phase("database"):
+            rows = await get_warnings_page(...)
+
+    Works with `with` and `async with`. Outside an instrumented command
+    it does nothing, so shared helpers can use it unconditionally.
+    Don't nest phases; the outer one would include the inner one's time.
+    """
+
+    __slots__ = ("name", "_trace", "_started")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self._trace = _current.get()
+        if self._trace is not None:
+            self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._trace is not None:
+            self._trace.phases.append((self.name, time.perf_counter() - self._started))
+        return False
+
+    async def __aenter__(self):
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return self.__exit__(exc_type, exc, tb)
+
+
+class PhaseProfiler:
+    """
+    Aggregates phase timings into per-command histograms.
+
+    Each phase is recorded in the `ryujin_command_phase_seconds` histogram
+    (labels: command, phase), which also makes it available on the
+    Prometheus endpoint. Time not covered by any phase is recorded as
+    "other", and the whole invocation as "total".
+
+    Invocations slower than `slow_threshold` are kept, with their full
+    phase breakdown, in a ring buffer of the last `ring_size` for
+    post-mortems (`slow_samples()`).
+
+    Args:
+        registry: MetricsRegistry for the histogram
+        slow_threshold: Seconds; None disables slow sampling
+        ring_size: Slow invocations kept
+    """
+
+    def __init__(self, registry=default_registry, slow_threshold=1.0, ring_size=100):
+        self.histogram = registry.histogram(
+            "ryujin_command_phase_seconds",
+            "Time spent per command phase",
+            ("command", "phase"),
+            buckets=PHASE_BUCKETS
+        )
+        self.slow_threshold = slow_threshold
+        self._slow = deque(maxlen=ring_size)
+        self._phases = {}  # command -> phase names seen, in first-seen order
+
+    def measure(self, command):
+        """Context manager that traces one invocation of `command`."""
+        return _Measure(self, command)
+
+    def instrument(self, name=None):
+        """
+        Decorator that traces every invocation of a command callback.
+        Put it below `@nextcord.slash_command`.
+        """
+        def decorator(func):
+            command = name or func.__name__
+
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                with self.measure(command):
+                    return await func(*args, **kwargs)
+
+            return wrapper
+        return decorator
+
+    def record(self, trace, total):
+        observe = self.histogram.observe
+        command = trace.command
+        seen = self._phases.setdefault(command, {})
+
+        covered = 0.0
+        for name, seconds in trace.phases:
+            observe(seconds, command=command, phase=name)
+            seen[name] = None
+            covered += seconds
+        observe(max(0.0, total - covered), command=command, phase="other")
+        observe(total, command=command, phase="total")
+
+        if self.slow_threshold is not None and total >= self.slow_threshold:
+            self._slow.append({
+                "command": command,
+                "at": time.time(),
+                "total": total,
+                "phases": list(trace.phases),
+            })
+
+    def summary(self):
+        """
+        Return {command: {phase: {"count", "mean", "p50", "p95", "p99"}}},
+        seconds, estimated from the histogram buckets.
+        """
+        histogram = self.histogram
+        result = {}
+        for command, seen in self._phases.items():
+            phases = {}
+            for name in (*seen, "other", "total"):
+                labels = {"command": command, "phase": name}
+                phases[name] = {
+                    "count": histogram.count(**labels),
+                    "mean": histogram.mean(**labels),
+                    "p50": histogram.quantile(0.5, **labels),
+                    "p95": histogram.quantile(0.95, **labels),
+                    "p99": histogram.quantile(0.99, **labels),
+                }
+            result[command] = phases
+        return result
+
+    def slow_samples(self):
+        """Slow invocations, oldest first."""
+        return list(self._slow)
+
+
+class _Measure:
+    __slots__ = ("_profiler", "_trace", "_token")
+
+    def __init__(self, profiler, command):
+        self._profiler = profiler
+        self._trace = Trace(command)
+
+    def __enter__(self):
+        self._token = _current.set(self._trace)
+        return self._trace
+
+    def __exit__(self, exc_type, exc, tb):
+        total = time.perf_counter() - self._trace.started
+        _current.reset(self._token)
+        self._profiler.record(self._trace, total)
+        return False
+
+    async def __aenter__(self):
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return self.__exit__(exc_type, exc, tb)
+
+
+profiler = PhaseProfiler()
+instrument = profiler.instrument
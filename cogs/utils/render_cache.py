@@ -0,0 +1,256 @@
+"""
+Render Cache for Ryujin Bot
+Content-addressed disk cache for processed audio.
+"""
+
+import hashlib
+import logging
+import mmap
+import os
+import tempfile
+from collections import OrderedDict
+
+log = logging.getLogger(__name__)
+
+
+def hash_source(data):
+    """
+    Return the content hash of a source track (any bytes-like object,
+    e.g. a decoded PCM array). Hashes the buffer in place, without copying.
+    """
+    return hashlib.blake2b(memoryview(data).cast("B"), digest_size=16).hexdigest()
+
+
+def render_key(source_hash, speed, pitch, fmt="pcm"):
+    """Cache key for one rendering of a source."""
+    # Rounded so 1.25 and 1.2500000001 share an entry
+    return f"{source_hash}-{speed:.3f}-{pitch:.3f}.{fmt}"
+
+
+class CachedRender:
+    """
+    A memory-mapped cache entry. `data` is a read-only memoryview of the
+    file: slicing it reads straight from the page cache, nothing is loaded
+    up front. The entry stays pinned (never evicted) until `close()`.
+    """
+
+    def __init__(self, cache, key, path):
+        self._cache = cache
+        self.key = key
+        with open(path, "rb") as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.data = memoryview(self._mmap)
+
+    def __len__(self):
+        return len(self.data)
+
+    def close(self):
+        if self._mmap is None:
+            return
+        self.data.release()
+        self._mmap.close()
+        self._mmap = None
+        self._cache._unpin(self.key)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class RenderWriter:
+    """
+    Writes a new entry incrementally (e.g. chunk by chunk while it plays).
+    Nothing is visible in the cache until `commit()`; `abort()` discards it.
+    """
+
+    def __init__(self, cache, key):
+        self._cache = cache
+        self.key = key
+        self.size = 0
+        fd, self._temp_path = tempfile.mkstemp(dir=cache.directory, suffix=".part")
+        self._file = os.fdopen(fd, "wb")
+
+    def write(self, data):
+        self._file.write(data)
+        self.size += len(data)
+
+    def commit(self):
+        if self._file is None:
+            return
+        self._file.close()
+        self._file = None
+        os.replace(self._temp_path, self._cache._path(self.key))
+        self._cache._added(self.key, self.size)
+
+    def abort(self):
+        if self._file is None:
+            return
+        self._file.close()
+        self._file = None
+        try:
+            os.unlink(self._temp_path)
+        except OSError:
+            pass
+
+
+class RenderCache:
+    """
+    Disk cache of rendered audio, keyed by (source hash, speed, pitch,
+    format), so the same track at the same settings is rendered once.
+
+    Entries are evicted least recently used first once the cache grows
+    past `max_bytes`. Entries that are being played (opened and not yet
+    closed) are pinned and skipped by eviction.
+
+    Usage:
+        cache = RenderCache("cache/renders", max_bytes=2 * 1024 ** 3)
+        key = render_key(hash_source(pcm), 1.25, 1.25)
+
+        render = cache.get(key)
+        if render is None:
+            writer = cache.writer(key)
+            ...  # writer.write(chunk) for every chunk, then writer.commit()
+
+    Args:
+        directory: Where entries are stored (created if missing)
+        max_bytes: Size limit for all entries together
+    """
+
+    def __init__(self, directory, max_bytes=2 * 1024 ** 3):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+        self._entries = OrderedDict()  # key -> size, least recently used first
+        self._pins = {}
+        self.total_bytes = 0
+
+        # Metrics, see stats()
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        self.evictions = 0
+
+        self._scan()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key)
+
+    def _scan(self):
+        # Rebuild the LRU order from modification times (touched on every hit)
+        entries = []
+        for entry in os.scandir(self.directory):
+            if not entry.is_file():
+                continue
+            if entry.name.endswith(".part"):
+                # Left behind by a crash mid-write
+                os.unlink(entry.path)
+                continue
+            stat = entry.stat()
+            entries.append((stat.st_mtime, entry.name, stat.st_size))
+
+        for _, key, size in sorted(entries):
+            self._entries[key] = size
+            self.total_bytes += size
+        self._evict()
+
+    def get(self, key):
+        """
+        Return a pinned CachedRender for `key`, or None on a miss.
+        Close it when playback ends.
+        """
+        size = self._entries.get(key)
+        if size is None:
+            self.misses += 1
+            return None
+
+        path = self._path(key)
+        try:
+            render = CachedRender(self, key, path)
+        except (OSError, ValueError) as e:
+            # Missing or empty file: drop the entry and treat it as a miss
+            log.warning("Dropping unreadable render cache entry %s: %s", key, e)
+            self._remove(key)
+            self.misses += 1
+            return None
+
+        self._pins[key] = self._pins.get(key, 0) + 1
+        self._entries.move_to_end(key)
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self.hits += 1
+        self.bytes_saved += size
+        return render
+
+    def writer(self, key):
+        """Start writing a new entry."""
+        return RenderWriter(self, key)
+
+    def put(self, key, data):
+        """Store a complete render in one go."""
+        writer = self.writer(key)
+        try:
+            writer.write(data)
+            writer.commit()
+        except Exception:
+            writer.abort()
+            raise
+
+    def _added(self, key, size):
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self.total_bytes -= old
+        self._entries[key] = size
+        self.total_bytes += size
+        self._evict()
+
+    def _unpin(self, key):
+        count = self._pins.get(key, 0) - 1
+        if count > 0:
+            self._pins[key] = count
+        else:
+            self._pins.pop(key, None)
+            if self.total_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        if self.total_bytes <= self.max_bytes:
+            return
+        for key in list(self._entries):
+            if self.total_bytes <= self.max_bytes:
+                break
+            if key in self._pins:
+                continue
+            self._remove(key)
+            self.evictions += 1
+
+    def _remove(self, key):
+        size = self._entries.pop(key, 0)
+        self.total_bytes -= size
+        try:
+            os.unlink(self._path(key))
+        except OSError:
+            pass
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.total_bytes,
+            "pinned": len(self._pins),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "bytes_saved": self.bytes_saved,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,250 @@
+"""
+Response Pipeline for Ryujin Bot
+Keeps slow commands inside Discord's 3-second interaction window.
+"""
+
+import asyncio
+import logging
+import time
+
+import nextcord
+
+from cogs.utils.phases import phase
+
+log = logging.getLogger(__name__)
+
+# Ad posts started by send(); kept referenced so one whose command was
+# cancelled still finishes (the event loop only keeps weak references)
+_posting = set()
+
+
+class ResponseMetrics:
+    """
+    Per-command response timings.
+
+    Tracks time-to-first-ack (defer or first message), total latency and
+    how often a command had to defer. Total latency also feeds an
+    exponentially weighted average used to predict whether the next run
+    will be slow.
+    """
+
+    def __init__(self, smoothing=0.2):
+        self.smoothing = smoothing
+        self._commands = {}
+
+    def _entry(self, command_name):
+        entry = self._commands.get(command_name)
+        if entry is None:
+            entry = self._commands[command_name] = {
+                "count": 0,
+                "deferred": 0,
+                "total_ack": 0.0,
+                "max_ack": 0.0,
+                "total_latency": 0.0,
+                "projected_latency": None,
+            }
+        return entry
+
+    def projected_latency(self, command_name):
+        entry = self._commands.get(command_name)
+        return entry["projected_latency"] if entry else None
+
+    def record(self, command_name, ack_time, latency, deferred):
+        entry = self._entry(command_name)
+        entry["count"] += 1
+        entry["deferred"] += deferred
+        entry["total_ack"] += ack_time
+        entry["max_ack"] = max(entry["max_ack"], ack_time)
+        entry["total_latency"] += latency
+
+        projected = entry["projected_latency"]
+        if projected is None:
+            entry["projected_latency"] = latency
+        else:
+            entry["projected_latency"] = projected + self.smoothing * (latency - projected)
+
+    def stats(self):
+        """Return per-command averages (seconds)."""
+        return {
+            name: {
+                "count": entry["count"],
+                "deferred": entry["deferred"],
+                "avg_time_to_ack": entry["total_ack"] / entry["count"],
+                "max_time_to_ack": entry["max_ack"],
+                "avg_latency": entry["total_latency"] / entry["count"],
+                "projected_latency": entry["projected_latency"],
+            }
+            for name, entry in self._commands.items()
+            if entry["count"]
+        }
+
+
+response_metrics = ResponseMetrics()
+
+
+class ResponsePipeline:
+    """
+    Replaces the `maybe_send_ad` + `interaction.send` pair for commands that
+    do slow work (database queries, REST calls) before answering.
+
+    On entry the ad decision (`bot.prepare_ad`, which must not change any
+    state) starts in the background so it runs alongside the command's
+    work. The ad itself is only posted by `send`, right before the result
+    (`bot.post_ad`, or `bot.maybe_send_ad` for a bot without the split), so
+    a command that fails never shows one. A post that has started is never
+    cancelled, so the ad is always recorded once Discord has it.
+
+    If the command is expected to take longer than `defer_after` seconds
+    (based on its recent runs) the interaction is deferred straight away;
+    otherwise a timer defers it once `defer_after` passes without a response.
+
+    Usage:
+        async with ResponsePipeline(self.bot, interaction) as response:
+            ...  # slow work
+            await response.send(embed=embed, ephemeral=True)
+
+    Args:
+        bot: The bot (for `prepare_ad`/`post_ad` or `maybe_send_ad`)
+        interaction: The command's interaction
+        defer_after: Seconds before the interaction is deferred
+        ephemeral: Whether a defer should be ephemeral
+        command_name: Name used for metrics (defaults to the slash command name)
+        metrics: ResponseMetrics to record into
+    """
+
+    def __init__(
+        self,
+        bot,
+        interaction,
+        defer_after=1.5,
+        ephemeral=True,
+        command_name=None,
+        metrics=response_metrics
+    ):
+        self.bot = bot
+        self.interaction = interaction
+        self.defer_after = defer_after
+        self.ephemeral = ephemeral
+        self.metrics = metrics
+
+        if command_name is None:
+            command = getattr(interaction, "application_command", None)
+            command_name = getattr(command, "qualified_name", None) or getattr(command, "name", None) or "unknown"
+        self.command_name = command_name
+
+        self.deferred = False
+        self._start = None
+        self._ack_at = None
+        self._ad_task = None
+        self._ad_post = None
+        self._defer_task = None
+        self._timer = None
+
+    async def __aenter__(self):
+        self._start = time.monotonic()
+        self._ad_task = asyncio.create_task(self._prepare_ad())
+
+        projected = self.metrics.projected_latency(self.command_name)
+        if projected is not None and projected >= self.defer_after:
+            await self._defer()
+        else:
+            self._timer = asyncio.get_running_loop().call_later(self.defer_after, self._start_defer)
+        return self
+
+    async def _prepare_ad(self):
+        prepare = getattr(self.bot, "prepare_ad", None)
+        if prepare is None:
+            return None
+        try:
+            return await prepare(self.interaction)
+        except Exception as e:
+            # An ad must never break the command it is attached to
+            log.warning("prepare_ad failed for /%s: %s", self.command_name, e)
+            return None
+
+    async def _post_ad(self, ad):
+        try:
+            if hasattr(self.bot, "prepare_ad"):
+                await self.bot.post_ad(self.interaction, ad)
+            else:
+                await self.bot.maybe_send_ad(self.interaction)
+        except Exception as e:
+            log.warning("Posting the ad failed for /%s: %s", self.command_name, e)
+        if self.interaction.response.is_done():
+            self._mark_ack()
+
+    def _start_defer(self):
+        self._timer = None
+        self._defer_task = asyncio.create_task(self._defer())
+
+    async def _defer(self):
+        if self.interaction.response.is_done():
+            return
+        try:
+            await self.interaction.response.defer(ephemeral=self.ephemeral)
+        except nextcord.InteractionResponded:
+            return  # the ad got there first, which acks the interaction too
+        except nextcord.HTTPException as e:
+            # Another initial response was already in flight (400/404);
+            # send() then goes out as a followup
+            log.warning("Deferring /%s failed: %s", self.command_name, e)
+            return
+        self.deferred = True
+        self._mark_ack()
+
+    def _mark_ack(self):
+        if self._ack_at is None:
+            self._ack_at = time.monotonic()
+
+    def _cancel_timer(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    async def send(self, *args, **kwargs):
+        """Send the command's result, after the ad."""
+        self._cancel_timer()
+        with phase("ad"):
+            ad = await self._ad_task
+            if self._defer_task is not None:
+                await asyncio.gather(self._defer_task, return_exceptions=True)
+            if self._ad_post is None:
+                # Shielded: if this command is cancelled now, the post
+                # still finishes and the ad is recorded
+                self._ad_post = asyncio.create_task(self._post_ad(ad))
+                _posting.add(self._ad_post)
+                self._ad_post.add_done_callback(_posting.discard)
+            await asyncio.shield(self._ad_post)
+
+        with phase("send"):
+            message = await self.interaction.send(*args, **kwargs)
+        self._mark_ack()
+        return message
+
+    async def send_error(self, *args, **kwargs):
+        """Send an error, without an ad."""
+        self._cancel_timer()
+        # The decision has no side effects, so dropping it is safe
+        if not self._ad_task.done():
+            self._ad_task.cancel()
+        await asyncio.gather(self._ad_task, return_exceptions=True)
+        if self._defer_task is not None:
+            # Never let a failed defer turn the error reply into another error
+            await asyncio.gather(self._defer_task, return_exceptions=True)
+
+        with phase("send"):
+            message = await self.interaction.send(*args, **kwargs)
+        self._mark_ack()
+        return message
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self._cancel_timer()
+        # No result was sent if the decision is still pending: no ad either
+        if not self._ad_task.done():
+            self._ad_task.cancel()
+        await asyncio.gather(self._ad_task, return_exceptions=True)
+
+        end = time.monotonic()
+        ack_at = self._ack_at if self._ack_at is not None else end
+        self.metrics.record(self.command_name, ack_at - self._start, end - self._start, self.deferred)
+        return False
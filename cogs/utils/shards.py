@@ -0,0 +1,335 @@
+"""
+Shard Runner for Ryujin Bot
+Runs shard groups in separate worker processes that share read-mostly state.
+"""
+
+import asyncio
+import importlib
+import inspect
+import logging
+import multiprocessing
+import os
+import threading
+
+from cogs.utils.shared_state import SharedBlacklistStore, SharedConfig
+
+log = logging.getLogger(__name__)
+
+
+def _load(path):
+    # "package.module:function"
+    module, _, name = path.partition(":")
+    return getattr(importlib.import_module(module), name)
+
+
+def shard_groups(shard_count, workers):
+    """Split shard IDs 0..shard_count-1 into `workers` contiguous groups."""
+    workers = max(1, min(workers, shard_count))
+    size, extra = divmod(shard_count, workers)
+    groups = []
+    start = 0
+    for index in range(workers):
+        end = start + size + (1 if index < extra else 0)
+        groups.append(list(range(start, end)))
+        start = end
+    return groups
+
+
+class _Channel:
+    """
+    One end of a worker pipe. A thread blocks on `recv` and hands each
+    message to `handler` on the event loop, so neither side polls.
+    """
+
+    def __init__(self, connection, handler, loop):
+        self.connection = connection
+        self._handler = handler
+        self._loop = loop
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._read, daemon=True)
+        self._thread.start()
+
+    def _read(self):
+        while True:
+            try:
+                message = self.connection.recv()
+            except (EOFError, OSError):
+                return
+            try:
+                self._loop.call_soon_threadsafe(self._handler, message)
+            except RuntimeError:
+                return  # the loop is closed
+
+    def send(self, message):
+        try:
+            with self._lock:
+                self.connection.send(message)
+            return True
+        except (BrokenPipeError, EOFError, OSError):
+            return False
+
+    def close(self):
+        self.connection.close()
+
+
+class WorkerIPC:
+    """
+    What a worker's bot sees of the launcher, as `bot.ipc`.
+
+    Attributes:
+        index: Worker number
+        shard_ids: Shards this worker runs
+        shard_count: Shards across all workers
+    """
+
+    def __init__(self, channel, index, shard_ids, shard_count):
+        self._channel = channel
+        self.index = index
+        self.shard_ids = shard_ids
+        self.shard_count = shard_count
+
+    def report(self, data):
+        """Send data (anything picklable) to the launcher's `reports`."""
+        self._channel.send(("report", self.index, data))
+
+
+async def _run_worker(spec, connection):
+    loop = asyncio.get_running_loop()
+    stopping = asyncio.Event()
+    early = []  # messages that arrive while the bot is still being built
+    bot = None
+
+    def on_message(message):
+        kind = message[0]
+        if kind == "stop":
+            stopping.set()
+        elif bot is None:
+            early.append(message)
+        elif kind == "blacklist":
+            bot.blacklist.apply(message[1], message[2])
+        elif kind == "blacklist_segment":
+            bot.blacklist.remap(message[1])
+        elif kind == "config":
+            bot.config.remap(message[1])
+
+    channel = _Channel(connection, on_message, loop)
+
+    built = _load(spec["factory"])(spec["shard_ids"], spec["shard_count"])
+    if inspect.isawaitable(built):
+        built = await built
+    built.ipc = WorkerIPC(channel, spec["index"], spec["shard_ids"], spec["shard_count"])
+    built.config = SharedConfig.attach(spec["config"])
+    built.blacklist = SharedBlacklistStore.attach(
+        spec["blacklist"], connection=getattr(built, "connection", None)
+    )
+    built.blacklist.notify = channel.send
+    bot = built
+    for message in early:
+        on_message(message)
+    early.clear()
+
+    for extension in spec["extensions"]:
+        # Calls the extension's setup(bot), as in the single-process bot
+        result = bot.load_extension(extension)
+        if inspect.isawaitable(result):
+            await result
+
+    token = os.environ.get(spec["token_env"]) if spec["token_env"] else None
+    run = asyncio.create_task(bot.start(token))
+    stop = asyncio.create_task(stopping.wait())
+    await asyncio.wait((run, stop), return_when=asyncio.FIRST_COMPLETED)
+    if not run.done():
+        await bot.close()
+    try:
+        await run
+    finally:
+        stop.cancel()
+        bot.blacklist.close()
+        channel.close()
+
+
+def _worker_main(spec, connection):
+    logging.basicConfig(level=spec["log_level"])
+    asyncio.run(_run_worker(spec, connection))
+
+
+class ShardLauncher:
+    """
+    Runs the bot's shards in `workers` processes, so the bot uses as many
+    cores as it has workers. Each worker builds its own bot with
+    `factory(shard_ids, shard_count)` (a "module:function" path, sync or
+    async), loads `extensions` with `bot.load_extension`, which calls
+    their `setup(bot)`, and runs `bot.start(token)`.
+
+    The blacklist and the config are published once into shared memory and
+    show up in every worker as `bot.blacklist` (SharedBlacklistStore) and
+    `bot.config` (SharedConfig); see cogs/utils/shared_state.py. Changes go
+    through the launcher, which broadcasts them to every worker over its
+    pipe: blacklist changes made in any process, the launcher's database
+    refresh, new blacklist segments and `config.update()`.
+
+    A worker that exits with an error is restarted after `restart_delay`
+    seconds with the current blacklist and config.
+
+    Usage:
+        blacklist = await SharedBlacklistStore(connection).load()
+        launcher = ShardLauncher(
+            "ryujin.bot:create_bot", ["cogs.moderation", "cogs.music"],
+            shard_count=16, workers=4, blacklist=blacklist, config=SharedConfig({"ad_rate": 0.2})
+        )
+        await launcher.start()
+        blacklist.start_refresh(interval=30)
+        await launcher.wait()
+
+    Args:
+        factory: "module:function" returning the bot for a shard group
+        extensions: Extension names to load in every worker
+        shard_count: Total number of shards
+        workers: Number of worker processes
+        blacklist: SharedBlacklistStore owned by the launcher (empty if omitted)
+        config: SharedConfig owned by the launcher (empty if omitted)
+        token_env: Environment variable holding the bot token
+        restart_delay: Seconds before a crashed worker is restarted
+    """
+
+    def __init__(
+        self,
+        factory,
+        extensions,
+        shard_count,
+        workers,
+        blacklist=None,
+        config=None,
+        token_env="DISCORD_TOKEN",
+        restart_delay=5.0
+    ):
+        self.factory = factory
+        self.extensions = list(extensions)
+        self.shard_count = shard_count
+        self.groups = shard_groups(shard_count, workers)
+        self.blacklist = blacklist if blacklist is not None else SharedBlacklistStore.from_ids(())
+        self.config = config if config is not None else SharedConfig()
+        self.token_env = token_env
+        self.restart_delay = restart_delay
+        self.reports = {}  # worker index -> last WorkerIPC.report() data
+
+        self._context = multiprocessing.get_context("spawn")
+        self._processes = {}  # index -> Process
+        self._restarting = set()
+        self._channels = {}   # index -> _Channel
+        self._watch_task = None
+        self._stopping = False
+        self._loop = None
+
+        # Metrics, see stats()
+        self.broadcasts = 0
+        self.restarts = 0
+
+    async def start(self):
+        """Publish the shared state and start every worker."""
+        self._loop = asyncio.get_running_loop()
+        if self.blacklist.handle is None:
+            self.blacklist.compact()
+        self.blacklist.notify = self.broadcast
+        self.config.notify = self.broadcast
+        for index in range(len(self.groups)):
+            self._spawn(index)
+        self._watch_task = asyncio.create_task(self._watch())
+        return self
+
+    def _spawn(self, index):
+        spec = {
+            "index": index,
+            "factory": self.factory,
+            "extensions": self.extensions,
+            "shard_ids": self.groups[index],
+            "shard_count": self.shard_count,
+            "blacklist": self.blacklist.handle,
+            "config": self.config.handle,
+            "token_env": self.token_env,
+            "log_level": logging.getLogger().level,
+        }
+        parent, child = self._context.Pipe()
+        process = self._context.Process(
+            target=_worker_main, args=(spec, child), name=f"ryujin-shards-{index}", daemon=True
+        )
+        process.start()
+        child.close()
+        self._processes[index] = process
+        self._channels[index] = _Channel(parent, self._on_message, self._loop)
+        log.info("Started worker %s (pid %s) for shards %s", index, process.pid, self.groups[index])
+
+    def _on_message(self, message):
+        kind = message[0]
+        if kind == "blacklist":
+            # From a worker: apply, then pass it on to everyone (the sender
+            # applying it twice is harmless)
+            _, user_id, blacklisted = message
+            if blacklisted:
+                self.blacklist.add(user_id)
+            else:
+                self.blacklist.discard(user_id)
+        elif kind == "report":
+            self.reports[message[1]] = message[2]
+
+    def broadcast(self, message):
+        """Send a message to every worker."""
+        self.broadcasts += 1
+        for channel in self._channels.values():
+            channel.send(message)
+
+    async def _watch(self):
+        while not self._stopping:
+            await asyncio.sleep(0.5)
+            for index, process in list(self._processes.items()):
+                if process.exitcode is None or self._stopping:
+                    continue
+                self._channels.pop(index).close()
+                del self._processes[index]
+                if process.exitcode == 0:
+                    log.info("Worker %s finished", index)
+                    continue
+                log.error("Worker %s exited with %s, restarting in %ss", index, process.exitcode, self.restart_delay)
+                self.restarts += 1
+                self._restarting.add(index)
+                self._loop.call_later(self.restart_delay, self._respawn, index)
+
+    def _respawn(self, index):
+        self._restarting.discard(index)
+        if not self._stopping and index not in self._processes:
+            self._spawn(index)
+
+    async def wait(self):
+        """Wait until every worker has exited."""
+        while self._processes or self._restarting:
+            await asyncio.sleep(0.5)
+
+    async def stop(self, timeout=10.0):
+        """Ask every worker to close its bot, then clean up the shared memory."""
+        self._stopping = True
+        self.broadcast(("stop",))
+        loop = asyncio.get_running_loop()
+        for process in self._processes.values():
+            await loop.run_in_executor(None, process.join, timeout)
+            if process.exitcode is None:
+                log.warning("Worker %s did not stop in time, terminating", process.name)
+                process.terminate()
+                await loop.run_in_executor(None, process.join)
+        for channel in self._channels.values():
+            channel.close()
+        self._processes.clear()
+        self._channels.clear()
+        if self._watch_task is not None:
+            self._watch_task.cancel()
+        self.blacklist.close()
+        self.config.close()
+
+    def stats(self):
+        return {
+            "workers": len(self.groups),
+            "alive": sum(1 for process in self._processes.values() if process.exitcode is None),
+            "shard_groups": self.groups,
+            "broadcasts": self.broadcasts,
+            "restarts": self.restarts,
+            "blacklist_segment_bytes": self.blacklist.shared_bytes(),
+        }
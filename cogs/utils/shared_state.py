@@ -0,0 +1,304 @@
+"""
+Shared State for Ryujin Bot
+Read-mostly state published once into shared memory for every shard worker.
+"""
+
+import json
+import logging
+import struct
+from array import array
+from collections.abc import Mapping
+from multiprocessing.shared_memory import SharedMemory
+
+from cogs.utils.blacklist import _FILTER_BITS, _FILTER_MASK, BlacklistStore, _filter_slot
+
+log = logging.getLogger(__name__)
+
+# Segment layout: header, filter bitmap, sorted int64 IDs
+_HEADER = struct.Struct("<q")  # number of IDs
+_FILTER_BYTES = 1 << (_FILTER_BITS - 3)
+_IDS_OFFSET = _HEADER.size + _FILTER_BYTES
+
+
+class SharedBlacklistStore(BlacklistStore):
+    """
+    BlacklistStore whose sorted ID array and filter live in a shared
+    memory segment, so every shard worker reads the same pages instead of
+    holding its own copy.
+
+    The launcher process owns the store: it loads it from the database,
+    applies every change and publishes a new segment whenever pending
+    changes pass `compact_threshold`. Workers attach to the published
+    segment read-only and keep changes since then in the usual `_added`
+    and `_removed` sets; nothing but the owner ever writes to a segment.
+
+    Changes travel through `notify(message)`. On the owner it is the
+    launcher's broadcast to all workers. On a worker it forwards the change
+    to the launcher, which applies it and broadcasts it to the others. See
+    cogs/utils/shards.py.
+
+    Usage:
+        # Launcher
+        blacklist = await SharedBlacklistStore(connection).load()
+
+        # Worker (done by the shard runner)
+        bot.blacklist = SharedBlacklistStore.attach(handle, connection=bot.connection)
+    """
+
+    def __init__(self, connection=None, compact_threshold=4096, reason_cache_size=1024):
+        super().__init__(connection, compact_threshold, reason_cache_size)
+        self.owner = True
+        self.notify = None
+        self.handle = None
+        self._segment = None
+        self._views = ()
+        self._retired = []  # owner: earlier segments, kept one generation for late attaches
+
+    @classmethod
+    def attach(cls, handle, **kwargs):
+        """Map a segment published by the owner (worker side)."""
+        store = cls(**kwargs)
+        store.owner = False
+        store._map(SharedMemory(name=handle))
+        store.handle = handle
+        return store
+
+    def _map(self, segment):
+        buf = segment.buf
+        (count,) = _HEADER.unpack_from(buf, 0)
+        flt = buf[_HEADER.size:_IDS_OFFSET]
+        ids_bytes = buf[_IDS_OFFSET:_IDS_OFFSET + count * 8]
+        ids = ids_bytes.cast("q")
+        old_segment, old_views = self._segment, self._views
+        self._segment = segment
+        self._views = (ids, ids_bytes, flt)
+        self._filter = flt
+        self._ids = ids
+        self._release(old_segment, old_views)
+
+    @staticmethod
+    def _release(segment, views):
+        # A segment can only be closed once no view of it is left
+        for view in views:
+            view.release()
+        if segment is not None:
+            segment.close()
+
+    def _rebuild(self, sorted_ids):
+        if not self.owner:
+            raise RuntimeError("Only the owning process rebuilds a shared blacklist")
+        ids = array("q", sorted_ids)
+        segment = SharedMemory(create=True, size=_IDS_OFFSET + ids.itemsize * len(ids))
+        buf = segment.buf
+        _HEADER.pack_into(buf, 0, len(ids))
+        flt = buf[_HEADER.size:_IDS_OFFSET]
+        for user_id in ids:
+            slot = _filter_slot(user_id)
+            flt[slot >> 3] |= 1 << (slot & 7)
+        flt.release()
+        buf[_IDS_OFFSET:] = memoryview(ids).cast("B")
+        del ids
+
+        if self._segment is not None:
+            self._retired.append(self._segment.name)
+        self._map(segment)
+        self._added.clear()
+        self._removed.clear()
+        self.handle = segment.name
+
+        # Keep the previous segment for a worker that is still attaching
+        # to it; older ones have been replaced everywhere
+        while len(self._retired) > 1:
+            self._unlink(self._retired.pop(0))
+        if self.notify is not None:
+            self.notify(("blacklist_segment", self.handle))
+
+    @staticmethod
+    def _unlink(name):
+        try:
+            segment = SharedMemory(name=name)
+        except FileNotFoundError:
+            return
+        segment.close()
+        segment.unlink()
+
+    def remap(self, handle):
+        """Switch to a newer segment (worker side), keeping changes it doesn't include yet."""
+        try:
+            segment = SharedMemory(name=handle)
+        except FileNotFoundError:
+            # Already replaced again; the newer segment's message follows
+            log.debug("Blacklist segment %s is gone, skipping", handle)
+            return
+        self._map(segment)
+        self.handle = handle
+        self._added = {user_id for user_id in self._added if not self._in_base(user_id)}
+        self._removed = {user_id for user_id in self._removed if self._in_base(user_id)}
+
+    def __contains__(self, user_id):
+        # The shared filter only covers the segment, so changes since then
+        # are checked in the sets
+        slot = (user_id ^ (user_id >> 22)) & _FILTER_MASK
+        if not self._filter[slot >> 3] >> (slot & 7) & 1:
+            return bool(self._added) and user_id in self._added
+        if user_id in self._added:
+            return True
+        if user_id in self._removed:
+            return False
+        return self._in_base(user_id)
+
+    def apply(self, user_id, blacklisted):
+        """Apply a change received from another process, without passing it on."""
+        if blacklisted:
+            if user_id in self._removed:
+                self._removed.discard(user_id)
+            elif not self._in_base(user_id):
+                self._added.add(user_id)
+        else:
+            if user_id in self._added:
+                self._added.discard(user_id)
+            elif self._in_base(user_id):
+                self._removed.add(user_id)
+            self._reasons.pop(user_id, None)
+        if self.owner:
+            self._maybe_compact()
+
+    def add(self, user_id, reason=None):
+        """Mark a user as blacklisted here and in every other process (the database is not written)."""
+        self._reasons.pop(user_id, None)
+        if reason is not None:
+            self._cache_reason(user_id, reason)
+        self._change(user_id, True)
+
+    def discard(self, user_id):
+        """Mark a user as no longer blacklisted here and in every other process."""
+        self._change(user_id, False)
+
+    def _change(self, user_id, blacklisted):
+        if self.owner:
+            # Broadcast first, so workers see the change before a segment
+            # that compaction might publish includes it
+            if self.notify is not None:
+                self.notify(("blacklist", user_id, blacklisted))
+            self.apply(user_id, blacklisted)
+        else:
+            self.apply(user_id, blacklisted)
+            if self.notify is not None:
+                self.notify(("blacklist", user_id, blacklisted))
+
+    def compact(self):
+        if self.owner:
+            super().compact()
+
+    def start_refresh(self, interval=30):
+        if not self.owner:
+            raise RuntimeError("The launcher refreshes the shared blacklist, not the workers")
+        super().start_refresh(interval)
+
+    def memory_usage(self):
+        """Approximate bytes of the shared segment plus this process's pending changes."""
+        return self.shared_bytes() + 64 * (len(self._added) + len(self._removed))
+
+    def shared_bytes(self):
+        return self._segment.size if self._segment is not None else 0
+
+    def close(self):
+        """Unmap the segment; the owner also removes it and any retired ones."""
+        self.stop_refresh()
+        name = self._segment.name if self._segment is not None else None
+        self._release(self._segment, self._views)
+        self._segment = None
+        self._views = ()
+        self._ids = array("q")
+        self._filter = bytearray(_FILTER_BYTES)
+        if self.owner:
+            for retired in self._retired + ([name] if name else []):
+                self._unlink(retired)
+            self._retired.clear()
+
+
+class SharedConfig(Mapping):
+    """
+    Read-only settings for every shard worker, e.g. feature flags or ad
+    rates. The launcher publishes them as JSON in a shared memory segment
+    and republishes on every `update`; workers decode a segment once when
+    it is announced, so reads are plain dict lookups.
+
+    Usage:
+        # Launcher
+        config = SharedConfig({"ad_rate": 0.2})
+        config.update(ad_rate=0.1)
+
+        # Worker (done by the shard runner)
+        if bot.config.get("nightcore_enabled", True):
+    """
+
+    def __init__(self, values=None):
+        self.owner = True
+        self.notify = None
+        self.handle = None
+        self._values = {}
+        self._segment = None
+        self._publish(dict(values or {}))
+
+    @classmethod
+    def attach(cls, handle):
+        """Read a published segment (worker side)."""
+        config = cls.__new__(cls)
+        config.owner = False
+        config.notify = None
+        config.handle = None
+        config._segment = None
+        config._values = {}
+        config.remap(handle)
+        return config
+
+    def _publish(self, values):
+        data = json.dumps(values, separators=(",", ":")).encode()
+        segment = SharedMemory(create=True, size=max(1, len(data)))
+        segment.buf[:len(data)] = data
+        old = self._segment
+        self._segment = segment
+        self._values = values
+        self.handle = (segment.name, len(data))
+        if self.notify is not None:
+            self.notify(("config", self.handle))
+        if old is not None:
+            # Workers read a segment as soon as it is announced and never
+            # keep it mapped, so the old one can go
+            old.close()
+            old.unlink()
+
+    def remap(self, handle):
+        name, size = handle
+        try:
+            segment = SharedMemory(name=name)
+        except FileNotFoundError:
+            log.debug("Config segment %s is gone, skipping", name)
+            return
+        try:
+            self._values = json.loads(bytes(segment.buf[:size]))
+        finally:
+            segment.close()
+        self.handle = handle
+
+    def update(self, **values):
+        """Change settings and publish them to every worker (launcher only)."""
+        if not self.owner:
+            raise RuntimeError("Shared config is read-only in shard workers")
+        self._publish({**self._values, **values})
+
+    def __getitem__(self, key):
+        return self._values[key]
+
+    def __iter__(self):
+        return iter(self._values)
+
+    def __len__(self):
+        return len(self._values)
+
+    def close(self):
+        if self.owner and self._segment is not None:
+            self._segment.close()
+            self._segment.unlink()
+            self._segment = None
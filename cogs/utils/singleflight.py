@@ -0,0 +1,165 @@
+"""
+Single-Flight for Ryujin Bot
+Collapses identical concurrent lookups into one call.
+"""
+
+import asyncio
+import functools
+import time
+from collections import OrderedDict
+
+from cogs.utils.metrics import registry as default_registry
+
+
+class _Flight:
+    __slots__ = ("task", "waiters", "forgotten")
+
+    def __init__(self, task):
+        self.task = task
+        self.waiters = 0
+        self.forgotten = False
+
+
+class SingleFlight:
+    """
+    Runs one call per key at a time. A caller asking for a key that is
+    already being looked up waits for that call instead of starting its
+    own, and gets the same result (or exception). With `reuse_for` set,
+    a successful result also answers callers for that many seconds after
+    it arrived. Exceptions and failure results are only shared with the
+    callers already waiting, never reused: by default a None result counts
+    as failed, as the db helpers return None on error (see `reuse_if`).
+
+    The call runs as its own task, so a waiter that is cancelled (e.g. its
+    interaction timed out) doesn't cancel it for the others. Once every
+    waiter is gone the call is cancelled, since nobody needs its result.
+
+    Results are shared, not copied: treat them as read-only. After a write
+    that changes what a key would return, call `forget(key)` so later
+    callers don't get the old result, either reused or from a lookup that
+    started before the write.
+
+    Duplicate calls answered by another call are counted in `stats()` and
+    in the `ryujin_singleflight_collapsed_total` counter (label: name).
+
+    Usage:
+        self.history_lookups = SingleFlight("warnings_page", reuse_for=1.0)
+
+        rows, total = await self.history_lookups.do(
+            (guild_id, user_id), get_warnings_page, self.bot.connection, guild_id, user_id
+        )
+
+    Args:
+        name: Label for the counter
+        reuse_for: Seconds a result is reused after it arrived (0 to only
+            share calls in flight)
+        reuse_if: Optional `def predicate(result)` telling whether a result
+            may be reused (defaults to any result except None)
+        max_reused: Most results kept for reuse at once
+        registry: MetricsRegistry for the counter
+    """
+
+    def __init__(self, name, reuse_for=0.0, reuse_if=None, max_reused=10000, registry=default_registry):
+        self.name = name
+        self.reuse_for = reuse_for
+        self.reuse_if = reuse_if
+        self.max_reused = max_reused
+        self._flights = {}              # key -> _Flight in progress
+        self._results = OrderedDict()   # key -> (result, expires_at), oldest first
+        self.counter = registry.counter(
+            "ryujin_singleflight_collapsed_total", "Duplicate lookups answered by another call", ("name",)
+        )
+
+        # Metrics, see stats()
+        self.calls = 0
+        self.executions = 0
+        self.collapsed = 0
+        self.reused = 0
+        self.abandoned = 0
+
+    async def do(self, key, func, *args, **kwargs):
+        """
+        Return `await func(*args, **kwargs)`, sharing the call with every
+        concurrent caller that passes the same `key`.
+        """
+        self.calls += 1
+        if self.reuse_for:
+            entry = self._results.get(key)
+            if entry is not None:
+                if entry[1] > time.monotonic():
+                    self.reused += 1
+                    self.counter.inc(name=self.name)
+                    return entry[0]
+                del self._results[key]
+
+        flight = self._flights.get(key)
+        if flight is None:
+            self.executions += 1
+            flight = _Flight(asyncio.ensure_future(func(*args, **kwargs)))
+            self._flights[key] = flight
+            flight.task.add_done_callback(functools.partial(self._landed, key, flight))
+        else:
+            self.collapsed += 1
+            self.counter.inc(name=self.name)
+
+        flight.waiters += 1
+        try:
+            # Shielded: cancelling one waiter must not cancel the others' call
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if not flight.waiters and not flight.task.done():
+                # Every waiter went away; nobody needs the result
+                self.abandoned += 1
+                self._detach(key, flight)
+                flight.task.cancel()
+
+    def _detach(self, key, flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    def _landed(self, key, flight, task):
+        self._detach(key, flight)
+        if task.cancelled() or task.exception() is not None:
+            # Exceptions go to the waiters and are never reused
+            return
+        if self.reuse_for and not flight.forgotten:
+            result = task.result()
+            if result is None if self.reuse_if is None else not self.reuse_if(result):
+                # A failed lookup; the next caller should try again
+                return
+            now = time.monotonic()
+            results = self._results
+            results[key] = (result, now + self.reuse_for)
+            results.move_to_end(key)
+            # Every result lives equally long, so the oldest expire first
+            while results and (len(results) > self.max_reused or next(iter(results.values()))[1] <= now):
+                results.popitem(last=False)
+
+    def forget(self, key):
+        """
+        Drop a reusable result and detach a call in flight, so the next
+        caller for `key` starts a new one.
+        """
+        self._results.pop(key, None)
+        flight = self._flights.pop(key, None)
+        if flight is not None:
+            flight.forgotten = True
+
+    def clear(self):
+        self._results.clear()
+        for flight in self._flights.values():
+            flight.forgotten = True
+        self._flights.clear()
+
+    def stats(self):
+        return {
+            "calls": self.calls,
+            "executions": self.executions,
+            "collapsed": self.collapsed,
+            "reused": self.reused,
+            "saved_ratio": (self.collapsed + self.reused) / self.calls if self.calls else 0.0,
+            "abandoned": self.abandoned,
+            "in_flight": len(self._flights),
+            "reusable": len(self._results),
+        }
@@ -0,0 +1,307 @@
+"""
+Interaction Traces for Ryujin Bot
+Anonymized recordings of slash command traffic, for replaying as load tests.
+"""
+
+import asyncio
+import gzip
+import hashlib
+import json
+import logging
+import os
+import random
+import time
+
+import nextcord
+
+log = logging.getLogger(__name__)
+
+# Discord application command option types
+_SUB_COMMAND = 1
+_SUB_COMMAND_GROUP = 2
+_STRING = 3
+_ID_TYPES = {6, 7, 8, 9}  # user, channel, role, mentionable
+_ATTACHMENT = 11
+
+# Seconds before an unfinished invocation is given up on
+# (an interaction token is only valid for 15 minutes anyway)
+PENDING_TIMEOUT = 900
+
+
+def pseudonym(value, salt):
+    """
+    Map an ID to a stable pseudonymous ID: the same input and salt always
+    give the same result, so repeat users and hot guilds stay visible in a
+    trace, but the real ID can't be recovered without the salt.
+    """
+    digest = hashlib.blake2b(str(value).encode(), key=salt, digest_size=8).digest()
+    return int.from_bytes(digest, "big") >> 1  # fits a signed 64-bit column
+
+
+def salt_id(salt):
+    """Identifies a salt in a trace header without revealing it."""
+    return hashlib.blake2b(salt, digest_size=8).hexdigest()
+
+
+def _trace_salt_id(path):
+    # The first header's salt id, "" for a trace without headers, or None
+    # if there is no trace yet. Every session in a file shares one salt.
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as file:
+            line = file.readline()
+    except FileNotFoundError:
+        return None
+    if not line.strip():
+        return None
+    return json.loads(line).get("session", {}).get("salt", "")
+
+
+def write_trace(path, records):
+    """Append records to a gzip-compressed JSONL trace (one gzip member per call)."""
+    lines = "".join(json.dumps(record, separators=(",", ":")) + "\n" for record in records)
+    with gzip.open(path, "at", encoding="utf-8") as file:
+        file.write(lines)
+
+
+def read_trace(path):
+    """
+    Return every record in a trace, ordered by arrival time.
+
+    A trace can hold several recording sessions, each starting with a
+    header (`{"session": {"epoch": ..., "salt": ...}}`) and timing its
+    records from its own start. Sessions are laid end to end in wall-clock
+    order, so they replay one after another instead of on top of each
+    other; the idle time between them is left out. Within a session,
+    records are written when a command finishes, so the file is only
+    roughly in arrival order.
+    """
+    sessions = []  # (epoch, records)
+    records = None
+    with gzip.open(path, "rt", encoding="utf-8") as file:
+        for line in file:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if "session" in record:
+                records = []
+                sessions.append((record["session"]["epoch"], records))
+                continue
+            if records is None:
+                # Recorded before traces had session headers
+                records = []
+                sessions.append((0.0, records))
+            records.append(record)
+
+    ordered = []
+    offset = 0.0
+    for _, records in sorted(sessions, key=lambda session: session[0]):
+        records.sort(key=lambda record: record["t"])
+        if offset:
+            for record in records:
+                record["t"] = round(record["t"] + offset, 3)
+        ordered.extend(records)
+        if records:
+            offset = records[-1]["t"]
+    return ordered
+
+
+class TraceRecorder:
+    """
+    Records slash command invocations (command, options, arrival time,
+    duration and outcome) to a compact gzip-compressed JSONL file.
+
+    Nothing identifying is written: guild, user and ID options (members,
+    channels, roles) are replaced by keyed pseudonyms, and free-text
+    options by their length, except options named in `keep_options` (such
+    as durations) whose values matter for replaying.
+
+    Records are kept in memory and appended to the file in the
+    background, one gzip member per flush. Each recorder starts its part
+    of the file with a session header holding its wall-clock start and an
+    id of its salt (not the salt itself), so `read_trace` can tell
+    sessions apart. A file only takes sessions recorded with the same
+    salt, so a user has one pseudonym throughout it.
+
+    Usage:
+        bot.traces = TraceRecorder(bot, "traces/interactions.jsonl.gz", sample_rate=0.1)
+        bot.traces.start_flush(interval=10)
+
+        # Replay: python -m benchmarks.bench_replay traces/interactions.jsonl.gz
+
+    One record looks like:
+        {"t":12.503,"c":"get_data","g":81..,"u":40..,"o":{"user":{"id":77..}},"d":84.1,"s":"ok"}
+
+    Args:
+        bot: The bot to attach listeners to
+        path: Trace file (appended to if it exists; raises ValueError if it
+            was recorded with another salt)
+        sample_rate: Fraction of invocations to record
+        salt: Key for the pseudonyms; random per recorder by default, so
+            two recordings can't be joined on user IDs. To append several
+            sessions to one file, pass the same salt (kept out of the trace)
+        keep_options: Option names whose string values are recorded as-is
+        max_pending: Unfinished invocations tracked at once
+    """
+
+    def __init__(
+        self,
+        bot,
+        path,
+        sample_rate=1.0,
+        salt=None,
+        keep_options=("duration",),
+        max_pending=10000
+    ):
+        self.bot = bot
+        self.path = path
+        self.sample_rate = sample_rate
+        self.salt = salt if salt is not None else os.urandom(16)
+        self.keep_options = set(keep_options)
+        self.max_pending = max_pending
+
+        existing = _trace_salt_id(path)
+        if existing is not None and existing != salt_id(self.salt):
+            raise ValueError(
+                f"{path} was recorded with another salt; pass the same salt or record to a new file"
+            )
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._started = time.monotonic()
+        self._header = {"session": {"epoch": round(time.time(), 3), "salt": salt_id(self.salt)}}
+        self._pending = {}  # interaction id -> (record, monotonic start)
+        self._buffer = []
+        self._flush_lock = asyncio.Lock()
+        self._flush_task = None
+
+        # Metrics, see stats()
+        self.recorded = 0
+        self.dropped = 0
+        self.written = 0
+
+        for listener in (
+            self.on_interaction,
+            self.on_application_command_completion,
+            self.on_application_command_error,
+        ):
+            bot.add_listener(listener, listener.__name__)
+
+    def _anonymize_options(self, options, result):
+        for option in options:
+            kind = option.get("type")
+            name = option["name"]
+            if kind in (_SUB_COMMAND, _SUB_COMMAND_GROUP):
+                self._anonymize_options(option.get("options", ()), result)
+            elif kind in _ID_TYPES:
+                result[name] = {"id": pseudonym(option["value"], self.salt)}
+            elif kind == _STRING and name not in self.keep_options:
+                result[name] = {"len": len(option["value"])}
+            elif kind == _ATTACHMENT:
+                result[name] = {"attachment": True}
+            else:
+                result[name] = option.get("value")
+        return result
+
+    @staticmethod
+    def _command_name(data):
+        # "group sub" for subcommands, like qualified_name
+        parts = [data["name"]]
+        options = data.get("options") or ()
+        while options and options[0].get("type") in (_SUB_COMMAND, _SUB_COMMAND_GROUP):
+            parts.append(options[0]["name"])
+            options = options[0].get("options") or ()
+        return " ".join(parts)
+
+    async def on_interaction(self, interaction):
+        if interaction.type != nextcord.InteractionType.application_command:
+            return
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return
+        now = time.monotonic()
+        if len(self._pending) >= self.max_pending:
+            self._prune(now)
+            if len(self._pending) >= self.max_pending:
+                self.dropped += 1
+                return
+
+        data = interaction.data or {}
+        record = {
+            "t": round(now - self._started, 3),
+            "c": self._command_name(data),
+            "g": pseudonym(interaction.guild_id, self.salt) if interaction.guild_id else None,
+            "u": pseudonym(interaction.user.id, self.salt) if interaction.user else None,
+            "o": self._anonymize_options(data.get("options") or (), {}),
+        }
+        self._pending[interaction.id] = (record, now)
+
+    def _prune(self, now):
+        # Invocations that never got a completion or error event
+        for interaction_id, (_, started) in list(self._pending.items()):
+            if now - started < PENDING_TIMEOUT:
+                break  # oldest first
+            del self._pending[interaction_id]
+            self.dropped += 1
+
+    def _finish(self, interaction, status):
+        entry = self._pending.pop(interaction.id, None)
+        if entry is None:
+            return
+        record, started = entry
+        record["d"] = round((time.monotonic() - started) * 1000, 1)
+        record["s"] = status
+        self._buffer.append(record)
+        self.recorded += 1
+
+    async def on_application_command_completion(self, interaction):
+        self._finish(interaction, "ok")
+
+    async def on_application_command_error(self, interaction, error):
+        self._finish(interaction, "error")
+
+    async def flush(self):
+        """Append buffered records to the trace file."""
+        async with self._flush_lock:
+            if not self._buffer:
+                return
+            records, self._buffer = self._buffer, []
+            # The session header goes before this recorder's first record
+            lines = records if self._header is None else [self._header] + records
+            try:
+                await asyncio.to_thread(write_trace, self.path, lines)
+            except OSError as e:
+                log.error("Failed to write %s trace records: %s", len(records), e)
+                self.dropped += len(records)
+                return
+            self._header = None
+            self.written += len(records)
+
+    async def _flush_loop(self, interval):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                log.error("Trace flush failed: %s", e)
+
+    def start_flush(self, interval=10):
+        """Write buffered records every `interval` seconds in the background."""
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_loop(interval))
+
+    async def close(self):
+        """Stop the background task and write what is left."""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            await asyncio.gather(self._flush_task, return_exceptions=True)
+            self._flush_task = None
+        await self.flush()
+
+    def stats(self):
+        return {
+            "pending": len(self._pending),
+            "buffered": len(self._buffer),
+            "recorded": self.recorded,
+            "written": self.written,
+            "dropped": self.dropped,
+        }
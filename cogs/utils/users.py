@@ -0,0 +1,145 @@
+"""
+User Resolution Utilities for Ryujin Bot
+Resolve user IDs to display names without one REST round trip per ID.
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+
+from cogs.utils.singleflight import SingleFlight
+
+
+class UserResolver:
+    """
+    Resolves user IDs to names in three tiers:
+
+    1. The gateway cache (`bot.get_user`), which costs nothing.
+    2. An LRU name cache with a TTL, filled by earlier REST fetches.
+    3. `bot.fetch_user` for whatever is left, run concurrently with a
+       bounded number of requests in flight.
+
+    Repeated IDs in one call are only resolved once, and concurrent calls
+    (e.g. several moderators opening the same history) share one fetch
+    per ID.
+    """
+
+    def __init__(self, bot, max_size=10000, ttl=3600, max_concurrency=5):
+        self.bot = bot
+        self.max_size = max_size
+        self.ttl = ttl
+        self.max_concurrency = max_concurrency
+        self._names = OrderedDict()  # user_id -> (name, expires_at)
+        self._fetches = SingleFlight("fetch_user")
+
+        # Counters, see stats()
+        self.gateway_hits = 0
+        self.cache_hits = 0
+        self.misses = 0
+        self.fetches = 0
+        self.failures = 0
+
+    def _get_cached(self, user_id):
+        entry = self._names.get(user_id)
+        if entry is None:
+            return None
+
+        name, expires_at = entry
+        if expires_at <= time.monotonic():
+            del self._names[user_id]
+            return None
+
+        self._names.move_to_end(user_id)
+        return name
+
+    def _store(self, user_id, name):
+        self._names[user_id] = (name, time.monotonic() + self.ttl)
+        self._names.move_to_end(user_id)
+        while len(self._names) > self.max_size:
+            self._names.popitem(last=False)
+
+    def invalidate(self, user_id=None):
+        """Drop one cached name, or the whole cache if no ID is given."""
+        if user_id is None:
+            self._names.clear()
+        else:
+            self._names.pop(user_id, None)
+
+    async def _fetch(self, user_id, semaphore):
+        async with semaphore:
+            self.fetches += 1
+            try:
+                user = await self.bot.fetch_user(user_id)
+            except Exception:
+                self.failures += 1
+                raise
+
+        self._store(user_id, user.name)
+        return user.name
+
+    async def _fetch_name(self, user_id, semaphore):
+        try:
+            # Joins a fetch of the same ID already running for another call
+            name = await self._fetches.do(user_id, self._fetch, user_id, semaphore)
+        except Exception:
+            return user_id, None
+        return user_id, name
+
+    async def resolve_names(self, user_ids):
+        """
+        Resolve a batch of user IDs to names.
+
+        Args:
+            user_ids: Iterable of user IDs, duplicates allowed
+
+        Returns:
+            Dict mapping each distinct user ID to its name. IDs that could
+            not be fetched map to "Unknown User (<id>)".
+        """
+        names = {}
+        missing = []
+
+        for user_id in dict.fromkeys(user_ids):
+            user = self.bot.get_user(user_id)
+            if user is not None:
+                self.gateway_hits += 1
+                names[user_id] = user.name
+                continue
+
+            name = self._get_cached(user_id)
+            if name is not None:
+                self.cache_hits += 1
+                names[user_id] = name
+                continue
+
+            self.misses += 1
+            missing.append(user_id)
+
+        if missing:
+            semaphore = asyncio.Semaphore(self.max_concurrency)
+            results = await asyncio.gather(
+                *(self._fetch_name(user_id, semaphore) for user_id in missing)
+            )
+            for user_id, name in results:
+                names[user_id] = name or f"Unknown User ({user_id})"
+
+        return names
+
+    async def resolve_name(self, user_id):
+        """Resolve a single user ID to a name."""
+        names = await self.resolve_names((user_id,))
+        return names[user_id]
+
+    def stats(self):
+        """Return the hit/miss counters and current cache size."""
+        lookups = self.gateway_hits + self.cache_hits + self.misses
+        return {
+            "gateway_hits": self.gateway_hits,
+            "cache_hits": self.cache_hits,
+            "misses": self.misses,
+            "fetches": self.fetches,
+            "failures": self.failures,
+            "hit_ratio": (self.gateway_hits + self.cache_hits) / lookups if lookups else 0.0,
+            "cached_names": len(self._names),
+            "collapsed_fetches": self._fetches.collapsed,
+        }
@@ -0,0 +1,255 @@
+"""
+Warning Counts for Ryujin Bot
+Read-through cache of per-user warning counts, updated in place on writes.
+"""
+
+import asyncio
+import logging
+import random
+from collections import OrderedDict
+
+from cogs.utils.db import count_warnings
+from cogs.utils.db_pool import acquire_connection
+
+log = logging.getLogger(__name__)
+
+# Approximate memory per cached count (packed int key, small int value and
+# its OrderedDict entry), measured with tracemalloc on CPython 3.11;
+# see benchmarks/bench_warning_counts.py
+ENTRY_BYTES = 136
+
+# Drifted counts listed in a verify() report
+MAX_DRIFT_EXAMPLES = 10
+
+
+def _key(guild_id, user_id):
+    # One int instead of a tuple of two; snowflakes fit in 64 bits
+    return guild_id << 64 | user_id
+
+
+def _unpack(key):
+    return key >> 64, key & 0xFFFFFFFFFFFFFFFF
+
+
+class WarningCountCache:
+    """
+    Per-(guild, user) warning counts, filled on read and kept current by
+    the code that writes warnings: `add_warning`, `delete_warning` and
+    `clear_warnings` in cogs/utils/db.py and `WarningWriteQueue` all take
+    it and update the cached count after their transaction commits.
+
+    A count loaded from the database is only cached if no write to the
+    same user happened while it was being loaded, so a slow read can't
+    overwrite a newer count. The least recently used counts are evicted
+    once the cache would use more than `max_bytes`.
+
+    `verify()` compares a random sample of cached counts with the database
+    and reports (and by default repairs) any drift, e.g. from warnings
+    deleted by hand. `start_verify()` runs it periodically.
+
+    Usage:
+        bot.warning_counts = WarningCountCache(max_bytes=16 * 2**20)
+        bot.warning_counts.start_verify(bot.connection, interval=300)
+
+        count = await get_warning_count(bot.connection, guild_id, user_id, cache=bot.warning_counts)
+
+    Args:
+        max_bytes: Approximate memory limit (see ENTRY_BYTES)
+    """
+
+    def __init__(self, max_bytes=16 * 2**20):
+        self.max_entries = max(1, max_bytes // ENTRY_BYTES)
+        self._counts = OrderedDict()  # packed key -> count, least recently used first
+        self._loading = {}            # packed key -> loads in flight
+        self._stale = set()           # loading keys written to since their load started
+        self._verify_task = None
+
+        # Metrics, see stats()
+        self.hits = 0
+        self.misses = 0
+        self.updates = 0
+        self.evictions = 0
+        self.discarded_loads = 0
+        self.verify_runs = 0
+        self.verified = 0
+        self.drifted = 0
+
+    def __len__(self):
+        return len(self._counts)
+
+    def get(self, guild_id, user_id):
+        """Return the cached count, or None."""
+        key = _key(guild_id, user_id)
+        count = self._counts.get(key)
+        if count is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._counts.move_to_end(key)
+        return count
+
+    def begin_load(self, guild_id, user_id):
+        """
+        Call before reading a count from the database, then pass the
+        returned token and the count (None if the read failed) to
+        `end_load`.
+        """
+        key = _key(guild_id, user_id)
+        self._loading[key] = self._loading.get(key, 0) + 1
+        return key
+
+    def end_load(self, token, count):
+        """Cache a loaded count unless the user was written to meanwhile. Returns True if cached."""
+        key = token
+        remaining = self._loading[key] - 1
+        stale = key in self._stale
+        if remaining:
+            self._loading[key] = remaining
+        else:
+            del self._loading[key]
+            self._stale.discard(key)
+
+        if count is None:
+            return False
+        if stale:
+            self.discarded_loads += 1
+            return False
+        self._store(key, count)
+        return True
+
+    async def read(self, guild_id, user_id, load):
+        """Return the cached count, or `await load()` and cache it."""
+        count = self.get(guild_id, user_id)
+        if count is not None:
+            return count
+        token = self.begin_load(guild_id, user_id)
+        count = None
+        try:
+            count = await load()
+        finally:
+            self.end_load(token, count)
+        return count
+
+    def _store(self, key, count):
+        counts = self._counts
+        counts[key] = count
+        counts.move_to_end(key)
+        while len(counts) > self.max_entries:
+            counts.popitem(last=False)
+            self.evictions += 1
+
+    def _written(self, key):
+        if key in self._loading:
+            self._stale.add(key)
+        self.updates += 1
+
+    def add(self, guild_id, user_id, delta=1):
+        """Adjust a cached count after a committed insert (+n) or delete (-n)."""
+        key = _key(guild_id, user_id)
+        self._written(key)
+        count = self._counts.get(key)
+        if count is not None:
+            self._counts[key] = max(0, count + delta)
+
+    def set(self, guild_id, user_id, count):
+        """Cache a count known from a committed write (e.g. 0 after clearing)."""
+        key = _key(guild_id, user_id)
+        self._written(key)
+        self._store(key, count)
+
+    def forget(self, guild_id, user_id):
+        """Drop a cached count, e.g. when a write's outcome is unknown."""
+        key = _key(guild_id, user_id)
+        self._written(key)
+        self._counts.pop(key, None)
+
+    def clear(self):
+        for key in self._loading:
+            self._stale.add(key)
+        self._counts.clear()
+
+    async def verify(self, connection, sample_size=100, repair=True):
+        """
+        Compare a random sample of cached counts with the database.
+
+        Counts written to while being checked, or that fail to load, are
+        skipped.
+
+        Returns:
+            Dict with "checked", "skipped", "drifted" and "examples", a list
+            of (guild_id, user_id, cached, actual) for drifted counts
+        """
+        keys = list(self._counts)
+        sample = random.sample(keys, min(sample_size, len(keys)))
+        checked = skipped = drifted = 0
+        examples = []
+
+        async with acquire_connection(connection) as conn:
+            for key in sample:
+                guild_id, user_id = _unpack(key)
+                self._loading[key] = self._loading.get(key, 0) + 1
+                try:
+                    # Counts the archive too, like get_warning_count
+                    actual = await count_warnings(conn, guild_id, user_id)
+                finally:
+                    stale = key in self._stale
+                    self.end_load(key, None)
+
+                cached = self._counts.get(key)
+                if actual is None or stale or cached is None:
+                    skipped += 1
+                    continue
+                checked += 1
+                if cached != actual:
+                    drifted += 1
+                    if len(examples) < MAX_DRIFT_EXAMPLES:
+                        examples.append((guild_id, user_id, cached, actual))
+                    if repair:
+                        self._counts[key] = actual
+
+        self.verify_runs += 1
+        self.verified += checked
+        self.drifted += drifted
+        if drifted:
+            log.warning(
+                "%s of %s cached warning counts drifted from the database%s: %s",
+                drifted, checked, " (repaired)" if repair else "", examples
+            )
+        return {"checked": checked, "skipped": skipped, "drifted": drifted, "examples": examples}
+
+    async def _verify_loop(self, connection, interval, sample_size):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.verify(connection, sample_size)
+            except Exception as e:
+                log.error("Warning count verification failed: %s", e)
+
+    def start_verify(self, connection, interval=300, sample_size=100):
+        """Run `verify()` every `interval` seconds in the background."""
+        if self._verify_task is None or self._verify_task.done():
+            self._verify_task = asyncio.create_task(self._verify_loop(connection, interval, sample_size))
+
+    async def close(self):
+        """Stop the background verification."""
+        if self._verify_task is not None:
+            self._verify_task.cancel()
+            await asyncio.gather(self._verify_task, return_exceptions=True)
+            self._verify_task = None
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._counts),
+            "max_entries": self.max_entries,
+            "approx_bytes": len(self._counts) * ENTRY_BYTES,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "updates": self.updates,
+            "evictions": self.evictions,
+            "discarded_loads": self.discarded_loads,
+            "verify_runs": self.verify_runs,
+            "verified": self.verified,
+            "drifted": self.drifted,
+        }
@@ -0,0 +1,175 @@
+"""
+Warning Write Queue for Ryujin Bot
+Coalesces add_warning calls into batched multi-row transactions.
+"""
+
+import asyncio
+import logging
+
+from cogs.utils.db import current_timestamp, get_warning_count
+from cogs.utils.db_pool import acquire_connection
+from cogs.utils.warning_counts import WarningCountCache
+
+log = logging.getLogger(__name__)
+
+# close() tasks started by close_soon(); the event loop only keeps weak
+# references to tasks, so an unreferenced one could vanish mid-flush
+_closing = set()
+
+
+class WarningWriteQueue:
+    """
+    Write-behind queue for warnings.
+
+    `add_warning` queues the row and waits; the queue writes everything
+    pending as one multi-row INSERT + COMMIT once `max_batch` rows are
+    queued or `max_delay` seconds have passed, whichever comes first.
+    A caller only gets its ID back after the batch has committed, so an
+    acknowledged warning is never lost, even if the process dies.
+
+    Warning counts read through `get_warning_count` are cached and
+    incremented as batches commit, so the count read that follows an
+    add doesn't hit the database.
+
+    Args:
+        connection: `self.bot.connection` (connection or ConnectionPool)
+        max_batch: Rows per transaction
+        max_delay: Longest a queued row waits before being written
+        counts: WarningCountCache to keep current, normally
+            `self.bot.warning_counts`; a private one if omitted
+    """
+
+    def __init__(self, connection, max_batch=100, max_delay=0.05, counts=None):
+        self.connection = connection
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.counts = counts if counts is not None else WarningCountCache()
+
+        self._pending = []  # ((guild_id, user_id, moderator_id, reason, date), future)
+        self._lock = asyncio.Lock()
+        self._timer = None
+        self._flush_task = None
+        self._closed = False
+
+        # Metrics, see stats()
+        self.batches = 0
+        self.rows_written = 0
+        self.failed_rows = 0
+
+    async def add_warning(self, guild_id, user_id, moderator_id, reason):
+        """
+        Queue a warning and wait until it is committed.
+
+        Returns:
+            The new warning ID, or None if the write failed (same contract
+            as `cogs.utils.db.add_warning`)
+        """
+        if self._closed:
+            raise RuntimeError("Warning queue is closed")
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append(((guild_id, user_id, moderator_id, reason, current_timestamp()), future))
+
+        if len(self._pending) >= self.max_batch:
+            self._start_flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.max_delay, self._start_flush)
+
+        # Shielded: a cancelled command must not cancel a write that may
+        # already be part of an in-flight transaction
+        return await asyncio.shield(future)
+
+    def _start_flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        # A running flush keeps going until the queue is empty
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self.flush())
+
+    async def flush(self):
+        """Write everything queued so far."""
+        async with self._lock:
+            while self._pending:
+                batch = self._pending[:self.max_batch]
+                del self._pending[:self.max_batch]
+                await self._write_batch(batch)
+
+    async def _write_batch(self, batch):
+        rows = [row for row, _ in batch]
+        placeholders = ", ".join(["(?, ?, ?, ?, ?)"] * len(rows))
+        parameters = [value for row in rows for value in row]
+
+        try:
+            async with acquire_connection(self.connection) as conn:
+                try:
+                    cursor = await conn.execute(
+                        f"INSERT INTO warnings (guild_id, user_id, moderator_id, reason, date) VALUES {placeholders}",
+                        parameters
+                    )
+                    await conn.commit()
+                except Exception:
+                    await conn.rollback()
+                    raise
+        except Exception as e:
+            log.error("Failed to write a batch of %s warnings: %s", len(batch), e)
+            self.failed_rows += len(batch)
+            for _, future in batch:
+                if not future.done():
+                    future.set_result(None)
+            return
+
+        # SQLite assigns consecutive AUTOINCREMENT IDs within one INSERT,
+        # and lastrowid is the ID of the last row
+        first_id = cursor.lastrowid - len(rows) + 1
+        self.batches += 1
+        self.rows_written += len(rows)
+
+        for offset, (row, future) in enumerate(batch):
+            self.counts.add(row[0], row[1], 1)
+            if not future.done():
+                future.set_result(first_id + offset)
+
+    async def get_warning_count(self, guild_id, user_id):
+        """
+        Return a user's warning count, counting only committed warnings.
+
+        Cached counts are kept up to date as batches commit.
+        """
+        return await get_warning_count(self.connection, guild_id, user_id, cache=self.counts)
+
+    def forget_count(self, guild_id, user_id):
+        """Drop a cached count, e.g. after warnings are deleted by hand."""
+        self.counts.forget(guild_id, user_id)
+
+    async def close(self):
+        """Stop accepting warnings and write everything still queued."""
+        self._closed = True
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        await self.flush()
+        if self._flush_task is not None:
+            await asyncio.gather(self._flush_task, return_exceptions=True)
+
+    def close_soon(self):
+        """
+        Start `close()` in the background, for callers that can't await it
+        (nextcord's `cog_unload` must be a regular function). The task is
+        kept referenced until the last batch is written.
+        """
+        task = asyncio.get_running_loop().create_task(self.close())
+        _closing.add(task)
+        task.add_done_callback(_closing.discard)
+        return task
+
+    def stats(self):
+        return {
+            "pending": len(self._pending),
+            "batches": self.batches,
+            "rows_written": self.rows_written,
+            "failed_rows": self.failed_rows,
+            "avg_batch_size": self.rows_written / self.batches if self.batches else 0.0,
+            "count_hits": self.counts.hits,
+            "count_misses": self.counts.misses,
+        }
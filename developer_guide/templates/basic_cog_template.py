@@ -5,34 +5,22 @@ Use this template as a starting point for creating new cogs.
 
 import nextcord
 from nextcord.ext import commands
+from cogs.utils.embeds import RYUJIN_LOGO, blacklist_embed, create_embed
 
 class BasicCogTemplate(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.RYUJIN_LOGO = "https://cdn.discordapp.com/avatars/1059400568805785620/63a77f852ea29f37961f458c53fb5a97.png"
+        self.RYUJIN_LOGO = RYUJIN_LOGO
 
     # REQUIRED: Blacklist check methods
-    def check_blacklist(self, user_id):
+    async def check_blacklist(self, user_id):
         if hasattr(self.bot, 'blacklist') and user_id in self.bot.blacklist:
-            return True, self.bot.blacklist[user_id]
+            return True, await self.bot.blacklist.get_reason(user_id)
         return False, None
 
     def create_blacklist_embed(self, reason):
-        embed = nextcord.Embed(
-            title="You are blacklisted!",
-            description=f"**You can't use Ryujin's commands anymore because you have been blacklisted for `{reason}`.**",
-            color=nextcord.Color.red()
-        )
-        embed.set_footer(
-            text="© Ryujin Bot (2023-2025) | Blacklist System",
-            icon_url=self.RYUJIN_LOGO
-        )
-        
-        embed.set_author(
-            name="Ryujin",
-            icon_url=self.RYUJIN_LOGO
-        )
-        return embed
+        # Prebuilt and cached per reason, see cogs/utils/embeds.py
+        return blacklist_embed(reason)
 
     # EXAMPLE: Simple command with no parameters
     @nextcord.slash_command(
@@ -42,7 +30,7 @@ class BasicCogTemplate(commands.Cog):
     async def example(self, interaction: nextcord.Interaction):
         # 1. ALWAYS check blacklist first
         user_id = interaction.user.id
-        is_blacklisted, blacklist_reason = self.check_blacklist(user_id)
+        is_blacklisted, blacklist_reason = await self.check_blacklist(user_id)
         
         if is_blacklisted:
             embed = self.create_blacklist_embed(blacklist_reason)
@@ -54,25 +42,15 @@ class BasicCogTemplate(commands.Cog):
             # Replace this with your actual command logic
             result = "This is an example response!"
             
-            # 3. Create response embed
-            embed = nextcord.Embed(
+            # 3. Create response embed (footer and author are added for you)
+            embed = create_embed(
+                "Information",  # Change category as needed
                 title="✅ Example Command",
                 description=f"**Result:** {result}",
                 color=nextcord.Color.green()
             )
-            
-            # 4. Set footer and author (REQUIRED)
-            embed.set_footer(
-                text="© Ryujin Bot (2023-2025) | Information System",  # Change category as needed
-                icon_url=self.RYUJIN_LOGO
-            )
-            
-            embed.set_author(
-                name="Ryujin",
-                icon_url=self.RYUJIN_LOGO
-            )
 
-            # 5. Send response (ORDER MATTERS!)
+            # 4. Send response (ORDER MATTERS!)
             await self.bot.maybe_send_ad(interaction)
             await interaction.send(embed=embed, ephemeral=True)
 
@@ -100,7 +78,7 @@ class BasicCogTemplate(commands.Cog):
     ):
         # 1. Blacklist check
         user_id = interaction.user.id
-        is_blacklisted, blacklist_reason = self.check_blacklist(user_id)
+        is_blacklisted, blacklist_reason = await self.check_blacklist(user_id)
         
         if is_blacklisted:
             embed = self.create_blacklist_embed(blacklist_reason)
@@ -118,17 +96,12 @@ class BasicCogTemplate(commands.Cog):
             if number:
                 result += f"\nNumber: {number}"
             
-            embed = nextcord.Embed(
+            embed = create_embed(
+                "Information",
                 title="✅ Parameters Example",
                 description=f"**Result:**\n{result}",
                 color=nextcord.Color.green()
             )
-            
-            embed.set_footer(
-                text="© Ryujin Bot (2023-2025) | Information System",
-                icon_url=self.RYUJIN_LOGO
-            )
-            embed.set_author(name="Ryujin", icon_url=self.RYUJIN_LOGO)
 
             await self.bot.maybe_send_ad(interaction)
             await interaction.send(embed=embed, ephemeral=True)
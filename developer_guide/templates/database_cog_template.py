@@ -5,33 +5,75 @@ Use this template for creating cogs that need database integration.
 
 import nextcord
 from nextcord.ext import commands
-from cogs.utils.db import add_warning, get_warning_count, get_user_warnings
+from cogs.utils.checks import cooldown, has_permissions, not_blacklisted, require
+from cogs.utils.cooldowns import Cooldown
+from cogs.utils.db import get_warnings_page
+from cogs.utils.embeds import RYUJIN_LOGO, blacklist_embed, create_embed
+from cogs.utils.paginator import KeysetPaginatorView
+from cogs.utils.phases import instrument, phase
+from cogs.utils.responses import ResponsePipeline
+from cogs.utils.singleflight import SingleFlight
+from cogs.utils.users import UserResolver
+from cogs.utils.warning_queue import WarningWriteQueue
+
+# Shared by both commands, so together they can't flood the database:
+# 5 uses per user and 60 per server every 10 seconds, 200 per second overall
+DATABASE_COOLDOWN = Cooldown(user=(5, 10), guild=(60, 10), total=(200, 1))
 
 class DatabaseCogTemplate(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.RYUJIN_LOGO = "https://cdn.discordapp.com/avatars/1059400568805785620/63a77f852ea29f37961f458c53fb5a97.png"
+        self.RYUJIN_LOGO = RYUJIN_LOGO
+        self.PAGE_SIZE = 10
+        self.user_resolver = UserResolver(bot)
+        # Moderators opening the same history at once share one query,
+        # and its result answers repeats for a second
+        self.history_lookups = SingleFlight("warnings_page", reuse_for=1.0)
+        # Batches inserts from concurrent commands into one transaction and
+        # keeps the bot-wide warning count cache (bot.warning_counts) current
+        self.warning_queue = WarningWriteQueue(bot.connection, counts=bot.warning_counts)
+
+    def cog_unload(self):
+        # Write out anything still queued before the cog goes away
+        # (cog_unload can't be async, so the queue closes in the background)
+        self.warning_queue.close_soon()
 
     # REQUIRED: Blacklist check methods
-    def check_blacklist(self, user_id):
+    async def check_blacklist(self, user_id):
         if hasattr(self.bot, 'blacklist') and user_id in self.bot.blacklist:
-            return True, self.bot.blacklist[user_id]
+            return True, await self.bot.blacklist.get_reason(user_id)
         return False, None
 
     def create_blacklist_embed(self, reason):
-        embed = nextcord.Embed(
-            title="You are blacklisted!",
-            description=f"**You can't use Ryujin's commands anymore because you have been blacklisted for `{reason}`.**",
-            color=nextcord.Color.red()
+        # Prebuilt and cached per reason, see cogs/utils/embeds.py
+        return blacklist_embed(reason)
+
+    # HELPER: Build one page of the data history embed
+    async def create_history_embed(self, user, data_list, total_count, page_number):
+        # Resolve all moderator names at once (cache first, then concurrent fetches)
+        moderator_names = await self.user_resolver.resolve_names(
+            moderator_id for _, moderator_id, _, _ in data_list
         )
-        embed.set_footer(
-            text="© Ryujin Bot (2023-2025) | Blacklist System",
-            icon_url=self.RYUJIN_LOGO
+
+        data_text = ""
+        for data_id, moderator_id, reason, date in data_list:
+            moderator_name = moderator_names[moderator_id]
+            data_text += f"**#{data_id}** | {moderator_name} | {date}\n└ {reason}\n\n"
+
+        page_count = max(1, -(-total_count // self.PAGE_SIZE))
+
+        embed = create_embed(
+            "Database",
+            title="📋 Data History",
+            description=f"**{user.mention}** has **{total_count}** data entries in this server.",
+            color=nextcord.Color.blue()
         )
-        
-        embed.set_author(
-            name="Ryujin",
-            icon_url=self.RYUJIN_LOGO
+        embed.add_field(name="User", value=f"{user.mention} ({user.name})", inline=True)
+        embed.add_field(name="Total Count", value=f"{total_count}", inline=True)
+        embed.add_field(
+            name=f"Recent Data (Page {page_number}/{page_count})",
+            value=data_text or "*No more items*",
+            inline=False
         )
         return embed
 
@@ -40,6 +82,8 @@ class DatabaseCogTemplate(commands.Cog):
         name="add_data",
         description="An example command that adds data to the database."
     )
+    @instrument()  # per-phase timings, see cogs/utils/phases.py
+    @require(not_blacklisted(), has_permissions(manage_messages=True), cooldown(DATABASE_COOLDOWN))
     async def add_data(
         self,
         interaction: nextcord.Interaction,
@@ -54,81 +98,65 @@ class DatabaseCogTemplate(commands.Cog):
             required=True
         )
     ):
-        # 1. Blacklist check
-        user_id = interaction.user.id
-        is_blacklisted, blacklist_reason = self.check_blacklist(user_id)
-        
-        if is_blacklisted:
-            embed = self.create_blacklist_embed(blacklist_reason)
-            await interaction.send(embed=embed, ephemeral=True)
-            return
-
-        # 2. Permission check
-        if not interaction.user.guild_permissions.manage_messages:
-            await interaction.send(
-                "❌ You don't have permission to use this command.",
-                ephemeral=True
-            )
-            return
-
-        try:
-            # 3. Database operation
-            # Replace this with your actual database function
-            # Example using warning system:
-            warning_id = await add_warning(
-                self.bot.connection,
-                interaction.guild.id,
-                user.id,
-                interaction.user.id,
-                data
-            )
-
-            if warning_id is None:
-                await interaction.send(
-                    "❌ Failed to add data to database.",
+        # Ad runs alongside the work below; slow runs are deferred automatically
+        async with ResponsePipeline(self.bot, interaction) as response:
+            try:
+                # 1. Database operation
+                # Replace this with your actual database function
+                # Example using warning system (batched, see cogs/utils/warning_queue.py):
+                with phase("database"):
+                    warning_id = await self.warning_queue.add_warning(
+                        interaction.guild.id,
+                        user.id,
+                        interaction.user.id,
+                        data
+                    )
+                # The user's history changed; don't serve the old first page
+                self.history_lookups.forget((interaction.guild.id, user.id))
+
+                if warning_id is None:
+                    await response.send_error(
+                        "❌ Failed to add data to database.",
+                        ephemeral=True
+                    )
+                    return
+
+                # 2. Get updated data
+                # (read through bot.warning_counts, usually no query)
+                with phase("database"):
+                    total_count = await self.warning_queue.get_warning_count(
+                        interaction.guild.id,
+                        user.id
+                    )
+
+                # 3. Create success embed
+                embed = create_embed(
+                    "Database",
+                    title="✅ Data Added",
+                    description=f"Data has been added for **{user.mention}**.",
+                    color=nextcord.Color.green()
+                )
+                embed.add_field(name="User", value=f"{user.mention} ({user.name})", inline=True)
+                embed.add_field(name="Added by", value=f"{interaction.user.mention} ({interaction.user.name})", inline=True)
+                embed.add_field(name="Data", value=data, inline=False)
+                embed.add_field(name="ID", value=f"#{warning_id}", inline=True)
+                embed.add_field(name="Total Count", value=f"{total_count}", inline=True)
+
+                await response.send(embed=embed, ephemeral=True)
+
+            except Exception as e:
+                await response.send_error(
+                    f"❌ An error occurred: `{e}`",
                     ephemeral=True
                 )
-                return
-
-            # 4. Get updated data
-            total_count = await get_warning_count(
-                self.bot.connection,
-                interaction.guild.id,
-                user.id
-            )
-
-            # 5. Create success embed
-            embed = nextcord.Embed(
-                title="✅ Data Added",
-                description=f"Data has been added for **{user.mention}**.",
-                color=nextcord.Color.green()
-            )
-            embed.add_field(name="User", value=f"{user.mention} ({user.name})", inline=True)
-            embed.add_field(name="Added by", value=f"{interaction.user.mention} ({interaction.user.name})", inline=True)
-            embed.add_field(name="Data", value=data, inline=False)
-            embed.add_field(name="ID", value=f"#{warning_id}", inline=True)
-            embed.add_field(name="Total Count", value=f"{total_count}", inline=True)
-            
-            embed.set_footer(
-                text="© Ryujin Bot (2023-2025) | Database System",
-                icon_url=self.RYUJIN_LOGO
-            )
-            embed.set_author(name="Ryujin", icon_url=self.RYUJIN_LOGO)
-
-            await self.bot.maybe_send_ad(interaction)
-            await interaction.send(embed=embed, ephemeral=True)
-
-        except Exception as e:
-            await interaction.send(
-                f"❌ An error occurred: `{e}`",
-                ephemeral=True
-            )
 
     # EXAMPLE: Command that retrieves data from database
     @nextcord.slash_command(
         name="get_data",
         description="An example command that retrieves data from the database."
     )
+    @instrument()  # per-phase timings, see cogs/utils/phases.py
+    @require(not_blacklisted(), has_permissions(manage_messages=True), cooldown(DATABASE_COOLDOWN))
     async def get_data(
         self,
         interaction: nextcord.Interaction,
@@ -138,100 +166,88 @@ class DatabaseCogTemplate(commands.Cog):
             required=True
         )
     ):
-        # 1. Blacklist check
-        user_id = interaction.user.id
-        is_blacklisted, blacklist_reason = self.check_blacklist(user_id)
-        
-        if is_blacklisted:
-            embed = self.create_blacklist_embed(blacklist_reason)
-            await interaction.send(embed=embed, ephemeral=True)
-            return
-
-        # 2. Permission check
-        if not interaction.user.guild_permissions.manage_messages:
-            await interaction.send(
-                "❌ You don't have permission to use this command.",
-                ephemeral=True
-            )
-            return
-
-        try:
-            # 3. Database retrieval
-            # Replace with your actual database function
-            data_list = await get_user_warnings(
-                self.bot.connection,
-                interaction.guild.id,
-                user.id
-            )
-
-            total_count = await get_warning_count(
-                self.bot.connection,
-                interaction.guild.id,
-                user.id
-            )
-
-            if not data_list:
-                # No data found
-                embed = nextcord.Embed(
-                    title="📋 Data History",
-                    description=f"**{user.mention}** has no data in this server.",
-                    color=nextcord.Color.green()
-                )
-                embed.add_field(name="User", value=f"{user.mention} ({user.name})", inline=True)
-                embed.add_field(name="Total Count", value="0", inline=True)
-                embed.add_field(name="Status", value="✅ Clean record", inline=True)
-                
-                embed.set_footer(
-                    text="© Ryujin Bot (2023-2025) | Database System",
-                    icon_url=self.RYUJIN_LOGO
+        # Ad runs alongside the work below; slow runs are deferred automatically
+        async with ResponsePipeline(self.bot, interaction) as response:
+            try:
+                # 1. Database retrieval (first page + total count in one query,
+                # or only the page when the count is cached), shared with
+                # concurrent /get_data calls for the same user
+                # Replace with your actual database function
+                with phase("database"):
+                    page = await self.history_lookups.do(
+                        (interaction.guild.id, user.id),
+                        get_warnings_page,
+                        self.bot.connection,
+                        interaction.guild.id,
+                        user.id,
+                        limit=self.PAGE_SIZE,
+                        cache=self.bot.warning_counts
+                    )
+
+                if page is None:
+                    # The query failed; don't report a clean record
+                    await response.send_error(
+                        "❌ Couldn't load the history right now. Please try again later.",
+                        ephemeral=True
+                    )
+                    return
+                data_list, total_count = page
+
+                if not data_list:
+                    # No data found
+                    embed = create_embed(
+                        "Database",
+                        title="📋 Data History",
+                        description=f"**{user.mention}** has no data in this server.",
+                        color=nextcord.Color.green()
+                    )
+                    embed.add_field(name="User", value=f"{user.mention} ({user.name})", inline=True)
+                    embed.add_field(name="Total Count", value="0", inline=True)
+                    embed.add_field(name="Status", value="✅ Clean record", inline=True)
+
+                    await response.send(embed=embed, ephemeral=True)
+                    return
+
+                # 2. Create embed for the first page
+                with phase("render"):
+                    embed = await self.create_history_embed(user, data_list, total_count, 1)
+
+                # 3. Add page buttons when there is more than one page.
+                # Later pages are loaded on demand, never the full history.
+                view = None
+                if total_count > self.PAGE_SIZE:
+                    async def fetch_page(before_id):
+                        return await get_warnings_page(
+                            self.bot.connection,
+                            interaction.guild.id,
+                            user.id,
+                            limit=self.PAGE_SIZE,
+                            before_id=before_id,
+                            cache=self.bot.warning_counts
+                        )
+
+                    async def render_page(rows, count, page_number):
+                        return await self.create_history_embed(user, rows, count, page_number)
+
+                    view = KeysetPaginatorView(
+                        interaction.user.id,
+                        fetch_page,
+                        render_page,
+                        data_list,
+                        total_count,
+                        page_size=self.PAGE_SIZE
+                    )
+
+                message = await response.send(embed=embed, view=view, ephemeral=True)
+                if view is not None:
+                    # Lets the view disable its buttons on the message when it times out
+                    view.message = message
+
+            except Exception as e:
+                await response.send_error(
+                    f"❌ An error occurred: `{e}`",
+                    ephemeral=True
                 )
-                embed.set_author(name="Ryujin", icon_url=self.RYUJIN_LOGO)
-
-                await self.bot.maybe_send_ad(interaction)
-                await interaction.send(embed=embed, ephemeral=True)
-                return
-
-            # 4. Format data for display
-            data_text = ""
-            for i, data_item in enumerate(data_list[:10], 1):  # Limit to 10 items
-                data_id, moderator_id, reason, date = data_item
-                
-                # Try to get moderator name
-                try:
-                    moderator = await self.bot.fetch_user(moderator_id)
-                    moderator_name = moderator.name
-                except:
-                    moderator_name = f"Unknown User ({moderator_id})"
-                
-                data_text += f"**#{data_id}** | {moderator_name} | {date}\n└ {reason}\n\n"
-
-            if len(data_list) > 10:
-                data_text += f"*... and {len(data_list) - 10} more items*"
-
-            # 5. Create embed
-            embed = nextcord.Embed(
-                title="📋 Data History",
-                description=f"**{user.mention}** has **{total_count}** data entries in this server.",
-                color=nextcord.Color.blue()
-            )
-            embed.add_field(name="User", value=f"{user.mention} ({user.name})", inline=True)
-            embed.add_field(name="Total Count", value=f"{total_count}", inline=True)
-            embed.add_field(name="Recent Data", value=data_text, inline=False)
-            
-            embed.set_footer(
-                text="© Ryujin Bot (2023-2025) | Database System",
-                icon_url=self.RYUJIN_LOGO
-            )
-            embed.set_author(name="Ryujin", icon_url=self.RYUJIN_LOGO)
-
-            await self.bot.maybe_send_ad(interaction)
-            await interaction.send(embed=embed, ephemeral=True)
-
-        except Exception as e:
-            await interaction.send(
-                f"❌ An error occurred: `{e}`",
-                ephemeral=True
-            )
 
 def setup(bot):
     bot.add_cog(DatabaseCogTemplate(bot)) 
\ No newline at end of file
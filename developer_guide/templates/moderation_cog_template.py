@@ -3,36 +3,50 @@ Moderation Cog Template for Ryujin Bot
 Use this template for creating moderation commands.
 """
 
+import time
+
 import nextcord
 from nextcord.ext import commands
+from cogs.utils.checks import (
+    above_target,
+    bot_above_target,
+    bot_has_permissions,
+    has_permissions,
+    not_blacklisted,
+    not_bot,
+    not_self,
+    require,
+)
+from cogs.utils.dm_queue import FORBIDDEN, MODERATION, SENT
+from cogs.utils.durations import DurationError, parse_duration
+from cogs.utils.embeds import RYUJIN_LOGO, blacklist_embed, create_embed
+from cogs.utils.responses import ResponsePipeline
 
 class ModerationCogTemplate(commands.Cog):
+    # The expiry handler registered below must exist before any timer fires,
+    # so this cog is always loaded at startup (see cogs/utils/lazy_cogs.py)
+    lazy_load = False
+
     def __init__(self, bot):
         self.bot = bot
-        self.RYUJIN_LOGO = "https://cdn.discordapp.com/avatars/1059400568805785620/63a77f852ea29f37961f458c53fb5a97.png"
+        self.RYUJIN_LOGO = RYUJIN_LOGO
+        # Called with due timers scheduled by temporary_action
+        bot.expiry.register("temporary_action", self.revert_temporary_actions)
+
+    def cog_unload(self):
+        # Don't leave the scheduler calling into an unloaded cog; due timers
+        # wait until the cog is loaded again
+        self.bot.expiry.unregister("temporary_action")
 
     # REQUIRED: Blacklist check methods
-    def check_blacklist(self, user_id):
+    async def check_blacklist(self, user_id):
         if hasattr(self.bot, 'blacklist') and user_id in self.bot.blacklist:
-            return True, self.bot.blacklist[user_id]
+            return True, await self.bot.blacklist.get_reason(user_id)
         return False, None
 
     def create_blacklist_embed(self, reason):
-        embed = nextcord.Embed(
-            title="You are blacklisted!",
-            description=f"**You can't use Ryujin's commands anymore because you have been blacklisted for `{reason}`.**",
-            color=nextcord.Color.red()
-        )
-        embed.set_footer(
-            text="© Ryujin Bot (2023-2025) | Blacklist System",
-            icon_url=self.RYUJIN_LOGO
-        )
-        
-        embed.set_author(
-            name="Ryujin",
-            icon_url=self.RYUJIN_LOGO
-        )
-        return embed
+        # Prebuilt and cached per reason, see cogs/utils/embeds.py
+        return blacklist_embed(reason)
 
     # EXAMPLE: Moderation command with user parameter
     @nextcord.slash_command(
@@ -40,6 +54,16 @@ class ModerationCogTemplate(commands.Cog):
         description="An example moderation command.",
         default_member_permissions=nextcord.Permissions(manage_messages=True)
     )
+    # ALWAYS check the blacklist first; the rest run cheapest first (cogs/utils/checks.py)
+    @require(
+        not_blacklisted(),
+        has_permissions(manage_messages=True),
+        bot_has_permissions(manage_messages=True),
+        above_target("user"),
+        bot_above_target("user"),
+        not_self("user"),
+        not_bot("user")
+    )
     async def moderate_user(
         self,
         interaction: nextcord.Interaction,
@@ -54,124 +78,71 @@ class ModerationCogTemplate(commands.Cog):
             required=False
         )
     ):
-        # 1. ALWAYS check blacklist first
-        user_id = interaction.user.id
-        is_blacklisted, blacklist_reason = self.check_blacklist(user_id)
-        
-        if is_blacklisted:
-            embed = self.create_blacklist_embed(blacklist_reason)
-            await interaction.send(embed=embed, ephemeral=True)
-            return
-
-        # 2. Check permissions
-        if not interaction.user.guild_permissions.manage_messages:
-            await interaction.send(
-                "❌ You don't have permission to use this command.",
-                ephemeral=True
-            )
-            return
-
-        if not interaction.guild.me.guild_permissions.manage_messages:
-            await interaction.send(
-                "❌ I don't have permission to use this command.",
-                ephemeral=True
-            )
-            return
-
-        # 3. Check role hierarchy
-        if user.top_role >= interaction.user.top_role:
-            await interaction.send(
-                "❌ You can't moderate this user due to role hierarchy.",
-                ephemeral=True
-            )
-            return
-
-        if user.top_role >= interaction.guild.me.top_role:
-            await interaction.send(
-                "❌ I can't moderate this user due to role hierarchy.",
-                ephemeral=True
-            )
-            return
-
-        # 4. Additional checks
-        if user.id == interaction.user.id:
-            await interaction.send(
-                "❌ You can't moderate yourself.",
-                ephemeral=True
-            )
-            return
-
-        if user.id == self.bot.user.id:
-            await interaction.send(
-                "❌ You can't moderate the bot.",
-                ephemeral=True
-            )
-            return
-
-        # 5. Your moderation logic here
-        try:
-            # Replace this with your actual moderation logic
-            action_reason = reason or "No reason provided"
-            
-            # Example: Send DM to user (if possible)
+        # 1. Your moderation logic here (the checks in @require have passed)
+        # (the ad runs alongside it; slow runs are deferred automatically)
+        async with ResponsePipeline(self.bot, interaction) as response:
             try:
-                dm_embed = nextcord.Embed(
+                # Replace this with your actual moderation logic
+                action_reason = reason or "No reason provided"
+            
+                # Example: DM the user. The DM goes through the shared DM queue
+                # (cogs/utils/dm_queue.py) so it never delays the response.
+                dm_embed = create_embed(
+                    "Moderation",
                     title="⚠️ You have been moderated",
                     description=f"You have been moderated in **{interaction.guild.name}**",
-                    color=nextcord.Color.yellow()
+                    color=nextcord.Color.yellow(),
+                    author=False  # DMs have no author line
                 )
                 dm_embed.add_field(name="Reason", value=action_reason, inline=False)
                 dm_embed.add_field(name="Moderated by", value=f"{interaction.user.mention} ({interaction.user.name})", inline=False)
-                
-                dm_embed.set_footer(
-                    text="© Ryujin Bot (2023-2025) | Moderation System",
-                    icon_url=self.RYUJIN_LOGO
-                )
-                
-                await user.send(embed=dm_embed)
-                dm_sent = True
-            except:
-                dm_sent = False
 
-            # 6. Create success embed
-            embed = nextcord.Embed(
-                title="✅ User Moderated",
-                description=f"**{user.mention}** has been moderated successfully.",
-                color=nextcord.Color.green()
-            )
-            embed.add_field(name="User", value=f"{user.mention} ({user.name})", inline=True)
-            embed.add_field(name="Moderated by", value=f"{interaction.user.mention} ({interaction.user.name})", inline=True)
-            embed.add_field(name="Reason", value=action_reason, inline=False)
-            
-            if dm_sent:
-                embed.add_field(name="DM Status", value="✅ DM sent to user", inline=True)
-            else:
-                embed.add_field(name="DM Status", value="❌ Could not send DM (DMs closed)", inline=True)
-            
-            embed.set_footer(
-                text="© Ryujin Bot (2023-2025) | Moderation System",
-                icon_url=self.RYUJIN_LOGO
-            )
-            
-            embed.set_author(
-                name="Ryujin",
-                icon_url=self.RYUJIN_LOGO
-            )
-
-            # 7. Send response (ORDER MATTERS!)
-            await self.bot.maybe_send_ad(interaction)
-            await interaction.send(embed=embed, ephemeral=True)
+                # 2. Create success embed
+                embed = create_embed(
+                    "Moderation",
+                    title="✅ User Moderated",
+                    description=f"**{user.mention}** has been moderated successfully.",
+                    color=nextcord.Color.green()
+                )
+                embed.add_field(name="User", value=f"{user.mention} ({user.name})", inline=True)
+                embed.add_field(name="Moderated by", value=f"{interaction.user.mention} ({interaction.user.name})", inline=True)
+                embed.add_field(name="Reason", value=action_reason, inline=False)
+                embed.add_field(name="DM Status", value="⏳ Sending DM...", inline=True)
+                dm_status_index = len(embed.fields) - 1
+
+                # 3. Send response (ORDER MATTERS!)
+                message = await response.send(embed=embed, ephemeral=True)
+
+                # 4. Queue the DM; "DM Status" is updated once it is delivered (or not)
+                async def update_dm_status(status, error):
+                    if status == SENT:
+                        value = "✅ DM sent to user"
+                    elif status == FORBIDDEN:
+                        value = "❌ Could not send DM (DMs closed)"
+                    else:
+                        value = "❌ Could not send DM"
+                    embed.set_field_at(dm_status_index, name="DM Status", value=value, inline=True)
+                    await message.edit(embed=embed)
+
+                # For kicks and bans, await this before removing the user:
+                # once they share no server with the bot the DM can't be delivered
+                self.bot.dm_queue.send(
+                    user,
+                    priority=MODERATION,
+                    on_status=update_dm_status,
+                    embed=dm_embed
+                )
 
-        except nextcord.Forbidden:
-            await interaction.send(
-                "❌ I don't have permission to moderate this user.",
-                ephemeral=True
-            )
-        except Exception as e:
-            await interaction.send(
-                f"❌ An error occurred while moderating the user: `{e}`",
-                ephemeral=True
-            )
+            except nextcord.Forbidden:
+                await response.send_error(
+                    "❌ I don't have permission to moderate this user.",
+                    ephemeral=True
+                )
+            except Exception as e:
+                await response.send_error(
+                    f"❌ An error occurred while moderating the user: `{e}`",
+                    ephemeral=True
+                )
 
     # EXAMPLE: Command with duration parsing
     @nextcord.slash_command(
@@ -179,6 +150,7 @@ class ModerationCogTemplate(commands.Cog):
         description="An example command with duration parsing.",
         default_member_permissions=nextcord.Permissions(manage_messages=True)
     )
+    @require(not_blacklisted(), has_permissions(manage_messages=True), above_target("user"))
     async def temporary_action(
         self,
         interaction: nextcord.Interaction,
@@ -189,7 +161,7 @@ class ModerationCogTemplate(commands.Cog):
         ),
         duration: str = nextcord.SlashOption(
             name="duration",
-            description="Duration (e.g., 1d, 2h, 30m, permanent)",
+            description="Duration (e.g., 1d, 2h, 30m, 1d12h, permanent)",
             required=False
         ),
         reason: str = nextcord.SlashOption(
@@ -198,90 +170,80 @@ class ModerationCogTemplate(commands.Cog):
             required=False
         )
     ):
-        # 1. Blacklist check
-        user_id = interaction.user.id
-        is_blacklisted, blacklist_reason = self.check_blacklist(user_id)
-        
-        if is_blacklisted:
-            embed = self.create_blacklist_embed(blacklist_reason)
-            await interaction.send(embed=embed, ephemeral=True)
-            return
-
-        # 2. Permission checks (same as above)
-        if not interaction.user.guild_permissions.manage_messages:
-            await interaction.send("❌ You don't have permission to use this command.", ephemeral=True)
-            return
-
-        if user.top_role >= interaction.user.top_role:
-            await interaction.send("❌ You can't moderate this user due to role hierarchy.", ephemeral=True)
+        # 1. Duration parsing (invalid input is an error, never "permanent")
+        try:
+            duration_delta = parse_duration(duration)
+        except DurationError as e:
+            await interaction.send(f"❌ {e}", ephemeral=True)
             return
 
-        # 3. Duration parsing
-        from datetime import datetime, timedelta
+        is_permanent = duration_delta is None
         
-        def parse_duration(duration_str):
-            if not duration_str:
-                return None
-            
-            duration_str = duration_str.lower()
-            if duration_str == "permanent" or duration_str == "perm":
-                return None
-            
+        # 2. Your logic here
+        # (it writes the expiry timer, so it runs inside the response pipeline)
+        async with ResponsePipeline(self.bot, interaction) as response:
             try:
-                if duration_str.endswith('d'):
-                    days = int(duration_str[:-1])
-                    return timedelta(days=days)
-                elif duration_str.endswith('h'):
-                    hours = int(duration_str[:-1])
-                    return timedelta(hours=hours)
-                elif duration_str.endswith('m'):
-                    minutes = int(duration_str[:-1])
-                    return timedelta(minutes=minutes)
-                elif duration_str.endswith('s'):
-                    seconds = int(duration_str[:-1])
-                    return timedelta(seconds=seconds)
+                action_reason = reason or "No reason provided"
+                if duration and not is_permanent:
+                    action_reason += f" (Duration: {duration})"
+
+                # 3. Track the expiry; revert_temporary_actions runs when it is due.
+                # Timers are stored in the database and survive restarts.
+                if is_permanent:
+                    pending = self.bot.expiry.get("temporary_action", interaction.guild.id, user.id)
+                    if pending is not None and not await self.bot.expiry.cancel(
+                        "temporary_action", interaction.guild.id, user.id
+                    ):
+                        # Otherwise the old timer would revert this after a restart
+                        await response.send_error("❌ Failed to remove the pending expiry.", ephemeral=True)
+                        return
                 else:
-                    hours = int(duration_str)
-                    return timedelta(hours=hours)
-            except ValueError:
-                return None
+                    expires_at = time.time() + duration_delta.total_seconds()
+                    timer = await self.bot.expiry.schedule(
+                        "temporary_action",
+                        interaction.guild.id,
+                        user.id,
+                        expires_at,
+                        data=action_reason
+                    )
+                    if timer is None:
+                        await response.send_error("❌ Failed to schedule the expiry.", ephemeral=True)
+                        return
+
+                # Create embed with duration info
+                embed = create_embed(
+                    "Moderation",
+                    title="⏰ Temporary Action",
+                    description=f"**{user.mention}** has been acted upon.",
+                    color=nextcord.Color.blue()
+                )
+                embed.add_field(name="User", value=f"{user.mention} ({user.name})", inline=True)
+                embed.add_field(name="Action by", value=f"{interaction.user.mention} ({interaction.user.name})", inline=True)
+                embed.add_field(name="Reason", value=action_reason, inline=False)
 
-        duration_delta = parse_duration(duration) if duration else None
-        is_permanent = duration_delta is None
-        
-        # 4. Your logic here
-        try:
-            action_reason = reason or "No reason provided"
-            if duration and not is_permanent:
-                action_reason += f" (Duration: {duration})"
+                if not is_permanent:
+                    embed.add_field(name="Duration", value=duration, inline=True)
+                    embed.add_field(name="Expires", value=f"<t:{int(expires_at)}:R>", inline=True)
+                else:
+                    embed.add_field(name="Duration", value="Permanent", inline=True)
 
-            # Create embed with duration info
-            embed = nextcord.Embed(
-                title="⏰ Temporary Action",
-                description=f"**{user.mention}** has been acted upon.",
-                color=nextcord.Color.blue()
-            )
-            embed.add_field(name="User", value=f"{user.mention} ({user.name})", inline=True)
-            embed.add_field(name="Action by", value=f"{interaction.user.mention} ({interaction.user.name})", inline=True)
-            embed.add_field(name="Reason", value=action_reason, inline=False)
-            
-            if not is_permanent and duration_delta:
-                embed.add_field(name="Duration", value=duration, inline=True)
-                embed.add_field(name="Expires", value=f"<t:{int((datetime.now() + duration_delta).timestamp())}:R>", inline=True)
-            else:
-                embed.add_field(name="Duration", value="Permanent", inline=True)
-            
-            embed.set_footer(
-                text="© Ryujin Bot (2023-2025) | Moderation System",
-                icon_url=self.RYUJIN_LOGO
-            )
-            embed.set_author(name="Ryujin", icon_url=self.RYUJIN_LOGO)
+                await response.send(embed=embed, ephemeral=True)
+
+            except Exception as e:
+                await response.send_error(f"❌ An error occurred: `{e}`", ephemeral=True)
 
-            await self.bot.maybe_send_ad(interaction)
-            await interaction.send(embed=embed, ephemeral=True)
+    # EXAMPLE: Reverting temporary actions when they expire
+    async def revert_temporary_actions(self, timers):
+        # Called by the expiry scheduler (cogs/utils/expiry.py) with every
+        # timer that is due, possibly hundreds at once after a restart.
+        # Raising makes the scheduler retry the whole batch later.
+        for timer in timers:
+            guild = self.bot.get_guild(timer.guild_id)
+            member = guild.get_member(timer.user_id) if guild else None
+            if member is None:
+                continue  # Left the server, nothing to revert
 
-        except Exception as e:
-            await interaction.send(f"❌ An error occurred: `{e}`", ephemeral=True)
+            # Revert your action here (e.g. remove the role you added)
 
 def setup(bot):
     bot.add_cog(ModerationCogTemplate(bot)) 
\ No newline at end of file
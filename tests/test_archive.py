@@ -0,0 +1,81 @@
+"""
+Tests for archive_warnings in cogs/utils/db.py
+Each batch copies rows into warnings_archive and deletes them from
+warnings in one transaction; a batch that fails halfway must leave both
+tables as they were.
+
+    python -m pytest tests
+"""
+
+import asyncio
+import sqlite3
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+aiosqlite = pytest.importorskip("aiosqlite")
+
+from cogs.utils.db import archive_warnings, create_tables, get_user_warnings
+
+
+def seed(path, old, recent):
+    """Insert `old` warnings from two years ago (oldest first) and `recent` from today."""
+    now = datetime.now(timezone.utc)
+    start = now - timedelta(days=730)
+    dates = [start + timedelta(minutes=n) for n in range(old)] + [now] * recent
+    db = sqlite3.connect(path)
+    db.executemany(
+        "INSERT INTO warnings (guild_id, user_id, moderator_id, reason, date) VALUES (?, ?, ?, ?, ?)",
+        [(1, n % 3, 2, f"reason {n}", date.strftime("%Y-%m-%d %H:%M:%S")) for n, date in enumerate(dates)]
+    )
+    db.commit()
+    db.close()
+
+
+def table_ids(path):
+    db = sqlite3.connect(path)
+    try:
+        live = [row[0] for row in db.execute("SELECT id FROM warnings")]
+        archived = [row[0] for row in db.execute("SELECT id FROM warnings_archive")]
+        return live, archived
+    finally:
+        db.close()
+
+
+def test_failed_batch_is_rolled_back(tmp_path):
+    path = str(tmp_path / "warnings.db")
+
+    async def main():
+        conn = await aiosqlite.connect(path)
+        try:
+            await create_tables(conn)
+            seed(path, old=35, recent=5)
+            # The 15th oldest row can't be deleted, so the second batch fails
+            # after its rows were already copied into warnings_archive
+            await conn.execute(
+                "CREATE TEMP TRIGGER fail_delete BEFORE DELETE ON warnings WHEN OLD.id = 15 "
+                "BEGIN SELECT RAISE(ABORT, 'disk on fire'); END"
+            )
+            first = await archive_warnings(conn, batch_size=10)
+            after_failure = table_ids(path)
+
+            await conn.execute("DROP TRIGGER fail_delete")
+            second = await archive_warnings(conn, batch_size=10)
+            history = await get_user_warnings(conn, 1, 0)
+            return first, after_failure, second, history
+        finally:
+            await conn.close()
+
+    first, (live, archived), second, history = asyncio.run(main())
+
+    # The first batch stays committed; nothing from the second one leaked
+    assert first == 10
+    assert sorted(archived) == list(range(1, 11))
+    assert sorted(live) == list(range(11, 41))
+
+    assert second == 25
+    live, archived = table_ids(path)
+    assert sorted(live) == list(range(36, 41))
+    assert sorted(archived) == list(range(1, 36))
+    # Every warning is still in the history exactly once
+    assert sorted(row[0] for row in history) == list(range(1, 41, 3))
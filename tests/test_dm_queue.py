@@ -0,0 +1,84 @@
+"""
+Tests for cogs/utils/dm_queue.py
+Every DM handed to the queue resolves exactly once, including those
+still queued, parked or in flight when it is closed.
+
+    python -m pytest tests
+"""
+
+import asyncio
+
+from cogs.utils.dm_queue import FAILED, SENT, DMQueue
+
+
+class HTTPError(Exception):
+    def __init__(self, status):
+        super().__init__(f"HTTP {status}")
+        self.status = status
+
+
+class User:
+    def __init__(self, id, hang=False, failures=0):
+        self.id = id
+        self.hang = hang
+        self.failures = failures
+        self.received = 0
+
+    async def send(self, **kwargs):
+        if self.hang:
+            await asyncio.Event().wait()
+        if self.failures:
+            self.failures -= 1
+            raise HTTPError(500)
+        self.received += 1
+
+
+def test_close_reports_leftover_dms_as_failed():
+    async def main():
+        queue = DMQueue(concurrency=2)
+        queue.start()
+        reports = {}
+
+        def send(user, name):
+            async def on_status(status, error):
+                reports.setdefault(name, []).append(status)
+            return queue.send(user, on_status=on_status, content=name)
+
+        hung = User(1, hang=True)
+        futures = {
+            "delivered": send(User(0), "delivered"),
+            "in flight": send(hung, "in flight"),
+            "in flight 2": send(User(2, hang=True), "in flight 2"),
+            "parked": send(hung, "parked"),  # same route, waits for a token
+        }
+        for n in range(3, 8):
+            futures[f"queued {n}"] = send(User(n), f"queued {n}")
+        await asyncio.sleep(0.05)
+
+        await queue.close(timeout=0.2)
+        statuses = {name: future.result() for name, future in futures.items()}
+        return statuses, reports, queue.stats()
+
+    statuses, reports, stats = asyncio.run(main())
+    assert statuses.pop("delivered") == SENT
+    assert set(statuses.values()) == {FAILED}
+    assert reports.pop("delivered") == [SENT]
+    assert reports == {name: [FAILED] for name in statuses}
+    assert stats["failed"] == len(statuses)
+    assert stats["in_flight"] == 0
+    assert stats["queued"] == [0, 0, 0] and stats["delayed"] == 0
+
+
+def test_transient_failure_is_retried():
+    async def main():
+        queue = DMQueue(base_delay=0.01)
+        queue.start()
+        user = User(1, failures=2)
+        status = await queue.send(user, content="hi")
+        await queue.close(timeout=1)
+        return status, user.received, queue.stats()
+
+    status, received, stats = asyncio.run(main())
+    assert status == SENT
+    assert received == 1
+    assert stats["retries"] == 2
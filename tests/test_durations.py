@@ -0,0 +1,185 @@
+"""
+Property tests for cogs/utils/durations.py
+Each test checks a property over a few hundred seeded random inputs, so a
+failure is reproducible and names the input that broke it.
+
+    python -m pytest tests
+"""
+
+import random
+from datetime import timedelta
+
+import pytest
+
+from cogs.utils.durations import MAX_LENGTH, PERMANENT, DurationError, parse_duration, parse_durations
+
+CASES = 500
+
+UNIT_SECONDS = {"w": 604800, "d": 86400, "h": 3600, "m": 60, "s": 1}
+SPELLINGS = {
+    "w": ("w", "week", "weeks"),
+    "d": ("d", "day", "days"),
+    "h": ("h", "hr", "hrs", "hour", "hours"),
+    "m": ("m", "min", "mins", "minute", "minutes"),
+    "s": ("s", "sec", "secs", "second", "seconds"),
+}
+
+
+def random_case(rng, text):
+    return "".join(char.upper() if rng.random() < 0.5 else char for char in text)
+
+
+def random_padding(rng):
+    return rng.choice(("", " ", "  ", "\t", "\n"))
+
+
+def compound(rng, parts):
+    """Spell (amount, unit) pairs in a random mix of the accepted forms."""
+    pieces = []
+    for amount, unit in parts:
+        spacing = rng.choice(("", " "))
+        pieces.append(f"{amount}{spacing}{rng.choice(SPELLINGS[unit])}")
+    text = pieces[0]
+    for piece in pieces[1:]:
+        text += rng.choice(("", " ", ", ", ",")) + piece
+    return text
+
+
+def random_parts(rng, max_amount=500):
+    units = rng.sample(list(UNIT_SECONDS), rng.randint(1, len(UNIT_SECONDS)))
+    return [(rng.randint(1, max_amount), unit) for unit in units]
+
+
+def total(parts):
+    return timedelta(seconds=sum(amount * UNIT_SECONDS[unit] for amount, unit in parts))
+
+
+def fits(text):
+    return len(text.strip()) <= MAX_LENGTH
+
+
+def test_compound_round_trip():
+    rng = random.Random(1)
+    for _ in range(CASES):
+        parts = random_parts(rng)
+        text = compound(rng, parts)
+        if fits(text):
+            assert parse_duration(text) == total(parts), text
+
+
+def test_iso_round_trip():
+    rng = random.Random(2)
+    for _ in range(CASES):
+        w, d, h, m, s = (rng.randint(0, 300) for _ in range(5))
+        if not any((w, d, h, m, s)):
+            continue
+        text = "P"
+        text += f"{w}W" if w else ""
+        text += f"{d}D" if d else ""
+        if h or m or s:
+            text += "T" + (f"{h}H" if h else "") + (f"{m}M" if m else "") + (f"{s}S" if s else "")
+        expected = timedelta(weeks=w, days=d, hours=h, minutes=m, seconds=s)
+        assert parse_duration(text) == expected, text
+        assert parse_duration(text.lower()) == expected, text
+
+
+def test_bare_numbers_use_the_default_unit():
+    rng = random.Random(3)
+    for _ in range(CASES):
+        amount = rng.randint(1, 10**6)
+        unit = rng.choice(list(UNIT_SECONDS))
+        assert parse_duration(str(amount), default_unit=unit) == timedelta(seconds=amount * UNIT_SECONDS[unit])
+
+
+def test_totals_are_additive_and_monotonic():
+    rng = random.Random(4)
+    for _ in range(CASES):
+        first = compound(rng, random_parts(rng))
+        second = compound(rng, random_parts(rng))
+        joined = f"{first} {second}"
+        if not fits(joined):
+            continue
+        # Repeated units add up, so appending more time never shortens it
+        assert parse_duration(joined) == parse_duration(first) + parse_duration(second), joined
+        assert parse_duration(joined) > parse_duration(first), joined
+
+
+def test_larger_amounts_are_longer():
+    rng = random.Random(5)
+    for _ in range(CASES):
+        unit = rng.choice(list(UNIT_SECONDS))
+        low, high = sorted(rng.sample(range(1, 10**5), 2))
+        assert parse_duration(f"{low}{unit}") < parse_duration(f"{high}{unit}"), (low, high, unit)
+
+
+def test_overflow_is_rejected():
+    rng = random.Random(6)
+    limit = timedelta.max.total_seconds()
+    for _ in range(CASES):
+        unit = rng.choice(list(UNIT_SECONDS))
+        amount = int(limit // UNIT_SECONDS[unit]) + rng.randint(1, 10**12)
+        text = f"{amount}{rng.choice(SPELLINGS[unit])}"
+        with pytest.raises(DurationError, match="too long"):
+            parse_duration(text)
+
+
+def test_overlong_input_is_rejected():
+    rng = random.Random(7)
+    for _ in range(CASES):
+        text = "1h" * rng.randint(MAX_LENGTH // 2 + 1, MAX_LENGTH * 2)
+        with pytest.raises(DurationError, match="too long"):
+            parse_duration(text)
+
+
+def test_zero_is_rejected():
+    rng = random.Random(8)
+    for _ in range(CASES):
+        text = compound(rng, [(0, unit) for unit in rng.sample(list(UNIT_SECONDS), rng.randint(1, 5))])
+        with pytest.raises(DurationError, match="longer than zero"):
+            parse_duration(text)
+
+
+def test_whitespace_and_case_are_ignored():
+    rng = random.Random(9)
+    for _ in range(CASES):
+        parts = random_parts(rng)
+        text = compound(rng, parts)
+        if not fits(text):
+            continue
+        noisy = random_padding(rng) + random_case(rng, text) + random_padding(rng)
+        assert parse_duration(noisy) == total(parts), repr(noisy)
+
+
+def test_permanent_and_empty_inputs():
+    rng = random.Random(10)
+    for _ in range(CASES):
+        word = rng.choice(sorted(PERMANENT))
+        assert parse_duration(random_padding(rng) + random_case(rng, word) + random_padding(rng)) is None
+        assert parse_duration(random_padding(rng) * rng.randint(0, 3)) is None
+    assert parse_duration(None) is None
+
+
+def test_garbage_is_rejected():
+    rng = random.Random(11)
+    alphabet = "abcxyz!?-+./"
+    for _ in range(CASES):
+        text = "".join(rng.choice(alphabet) for _ in range(rng.randint(1, 12)))
+        if text.strip().lower() in PERMANENT:
+            continue
+        with pytest.raises(DurationError):
+            parse_duration(text)
+
+
+def test_bulk_parsing_lists_every_invalid_entry():
+    rng = random.Random(12)
+    for _ in range(50):
+        valid = [compound(rng, random_parts(rng, 50)) for _ in range(rng.randint(0, 5))]
+        valid = [text for text in valid if fits(text)]
+        invalid = [f"bad{n}" for n in range(rng.randint(1, 3))]
+        texts = valid + invalid
+        rng.shuffle(texts)
+        with pytest.raises(DurationError) as raised:
+            parse_durations(texts)
+        for text in invalid:
+            assert f"`{text}`" in str(raised.value)
+        assert parse_durations(valid) == [parse_duration(text) for text in valid]
@@ -0,0 +1,130 @@
+"""
+Tests for cogs/utils/expiry.py
+Timers are stored in a real aiosqlite database: a timer leaves
+scheduled_actions only once its handler succeeded, was given up on, or
+was cancelled.
+
+    python -m pytest tests
+"""
+
+import asyncio
+import time
+
+import pytest
+
+aiosqlite = pytest.importorskip("aiosqlite")
+
+from cogs.utils.db import create_tables
+from cogs.utils.expiry import ExpiryScheduler
+
+
+async def stored_ids(conn):
+    cursor = await conn.execute("SELECT id FROM scheduled_actions ORDER BY id")
+    return [row[0] for row in await cursor.fetchall()]
+
+
+async def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        await asyncio.sleep(0.01)
+
+
+def test_handler_that_raises_is_retried_until_it_succeeds(tmp_path):
+    async def main():
+        conn = await aiosqlite.connect(str(tmp_path / "expiry.db"))
+        try:
+            await create_tables(conn)
+            expiry = ExpiryScheduler(conn, retry_delay=0.05)
+            calls = []
+
+            async def unmute(timers):
+                # The failed attempt must not have deleted the rows
+                calls.append(([timer.id for timer in timers], await stored_ids(conn)))
+                if len(calls) == 1:
+                    raise RuntimeError("Discord is down")
+
+            expiry.register("mute", unmute)
+            now = time.time()
+            timers = await expiry.schedule_many([("mute", 1, 10, now, None), ("mute", 1, 11, now, None)])
+            ids = [timer.id for timer in timers]
+            expiry.start()
+            try:
+                await wait_until(lambda: expiry.fired == 2)
+            finally:
+                await expiry.stop()
+            return ids, calls, expiry.stats(), await stored_ids(conn), len(expiry)
+        finally:
+            await conn.close()
+
+    ids, calls, stats, left, pending = asyncio.run(main())
+    assert calls == [(ids, ids), (ids, ids)]
+    assert stats["failed_batches"] == 1
+    assert stats["dropped"] == 0
+    assert left == []
+    assert pending == 0
+
+
+def test_timer_is_dropped_after_max_attempts(tmp_path):
+    async def main():
+        conn = await aiosqlite.connect(str(tmp_path / "expiry.db"))
+        try:
+            await create_tables(conn)
+            expiry = ExpiryScheduler(conn, retry_delay=0.01, max_attempts=3)
+            calls = []
+
+            async def unban(timers):
+                calls.append(len(timers))
+                raise RuntimeError("missing permissions")
+
+            expiry.register("ban", unban)
+            await expiry.schedule("ban", 1, 10, time.time())
+            expiry.start()
+            try:
+                await wait_until(lambda: expiry.dropped == 1)
+            finally:
+                await expiry.stop()
+            return calls, expiry.stats(), await stored_ids(conn), len(expiry)
+        finally:
+            await conn.close()
+
+    calls, stats, left, pending = asyncio.run(main())
+    assert calls == [1, 1, 1]
+    assert stats["fired"] == 0
+    assert left == []
+    assert pending == 0
+
+
+def test_cancel_keeps_the_timer_when_the_delete_fails(tmp_path):
+    path = str(tmp_path / "expiry.db")
+
+    async def main():
+        conn = await aiosqlite.connect(path)
+        try:
+            await create_tables(conn)
+            expiry = ExpiryScheduler(conn)
+            timer = await expiry.schedule("mute", 1, 10, time.time() + 3600)
+
+            await conn.execute(
+                "CREATE TEMP TRIGGER fail_delete BEFORE DELETE ON scheduled_actions "
+                "BEGIN SELECT RAISE(ABORT, 'disk on fire'); END"
+            )
+            failed = await expiry.cancel("mute", 1, 10)
+            still_pending = expiry.get("mute", 1, 10)
+            # After a restart it's still there to fire
+            reloaded = await ExpiryScheduler(conn).load()
+            restored = reloaded.get("mute", 1, 10)
+
+            await conn.execute("DROP TRIGGER fail_delete")
+            cancelled = await expiry.cancel("mute", 1, 10)
+            return timer, failed, still_pending, restored, cancelled, expiry.get("mute", 1, 10), await stored_ids(conn)
+        finally:
+            await conn.close()
+
+    timer, failed, still_pending, restored, cancelled, after, left = asyncio.run(main())
+    assert failed is False
+    assert still_pending is timer
+    assert restored.id == timer.id
+    assert cancelled is True
+    assert after is None
+    assert left == []
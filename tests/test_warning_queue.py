@@ -0,0 +1,124 @@
+"""
+Durability tests for cogs/utils/warning_queue.py
+Run against a real aiosqlite connection (not the autocommit benchmark
+fake), so the queue's transactions behave as they do in the bot.
+
+    python -m pytest tests
+"""
+
+import asyncio
+import os
+import sqlite3
+import subprocess
+import sys
+
+import pytest
+
+aiosqlite = pytest.importorskip("aiosqlite")
+
+from cogs.utils.db import create_tables
+from cogs.utils.warning_queue import WarningWriteQueue
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Queues warnings in batches of 20 and dies (no cleanup, like a crash)
+# right after the 50th acknowledgement, with later batches queued or
+# in the middle of their transaction
+CRASHING_WRITER = """
+import asyncio, os, sys
+import aiosqlite
+from cogs.utils.db import create_tables
+from cogs.utils.warning_queue import WarningWriteQueue
+
+async def main(path):
+    conn = await aiosqlite.connect(path)
+    await create_tables(conn)
+    queue = WarningWriteQueue(conn, max_batch=20, max_delay=0.01)
+    acked = 0
+
+    async def add(n):
+        nonlocal acked
+        warning_id = await queue.add_warning(1, n % 7, 2, f"reason {n}")
+        print(warning_id, flush=True)
+        acked += 1
+        if acked == 50:
+            os._exit(1)
+
+    await asyncio.gather(*(add(n) for n in range(500)))
+
+asyncio.run(main(sys.argv[1]))
+"""
+
+
+def stored_ids(path):
+    db = sqlite3.connect(path)
+    try:
+        assert db.execute("PRAGMA integrity_check").fetchone()[0] == "ok"
+        return {row[0] for row in db.execute("SELECT id FROM warnings")}
+    finally:
+        db.close()
+
+
+def test_acknowledged_warnings_survive_a_crash(tmp_path):
+    path = str(tmp_path / "warnings.db")
+    child = subprocess.run(
+        [sys.executable, "-c", CRASHING_WRITER, path],
+        cwd=ROOT, capture_output=True, text=True, timeout=60
+    )
+    assert child.returncode == 1, child.stderr
+    acked = {int(line) for line in child.stdout.split()}
+    assert len(acked) == 50
+
+    stored = stored_ids(path)
+    assert acked <= stored
+    # Batches commit whole or not at all
+    assert len(stored) % 20 == 0
+
+
+def test_close_writes_everything_queued(tmp_path):
+    path = str(tmp_path / "warnings.db")
+
+    async def main():
+        conn = await aiosqlite.connect(path)
+        try:
+            await create_tables(conn)
+            # Long enough that only close() can trigger the write
+            queue = WarningWriteQueue(conn, max_batch=20, max_delay=60)
+            adds = [asyncio.create_task(queue.add_warning(1, n, 2, "spam")) for n in range(45)]
+            await asyncio.sleep(0)
+            await queue.close()
+            ids = await asyncio.gather(*adds)
+            with pytest.raises(RuntimeError):
+                await queue.add_warning(1, 1, 2, "late")
+            return ids
+        finally:
+            await conn.close()
+
+    ids = asyncio.run(main())
+    assert None not in ids
+    assert stored_ids(path) == set(ids)
+
+
+def test_failed_batch_is_rolled_back_as_a_whole(tmp_path):
+    path = str(tmp_path / "warnings.db")
+
+    async def main():
+        conn = await aiosqlite.connect(path)
+        try:
+            await create_tables(conn)
+            queue = WarningWriteQueue(conn, max_batch=10, max_delay=60)
+            good = [queue.add_warning(1, n, 2, "spam") for n in range(10)]
+            # reason is NOT NULL, so this batch's INSERT fails
+            bad = [queue.add_warning(2, n, 2, None if n == 5 else "spam") for n in range(10)]
+            results = await asyncio.gather(*good, *bad)
+            count = await queue.get_warning_count(2, 0)
+            return results[:10], results[10:], count, queue.stats()
+        finally:
+            await conn.close()
+
+    good, bad, count, stats = asyncio.run(main())
+    assert None not in good
+    assert bad == [None] * 10
+    assert count == 0
+    assert stats["failed_rows"] == 10
+    assert stored_ids(path) == set(good)